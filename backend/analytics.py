@@ -0,0 +1,503 @@
+import base64
+import bisect
+import datetime
+import heapq
+import threading
+from collections import Counter, defaultdict
+
+from columnar import EventColumns, SymbolTable
+from hyperloglog import HyperLogLog
+from leaderboards import EVENT_METRICS, Leaderboards
+
+# Event kinds recorded by the tracking endpoints and the timestamp field each
+# one carries
+EVENT_TIME_FIELDS = {
+    'view': 'timestamp',
+    'message': 'received_at',
+    'appointment': 'created_at',
+    'link_click': 'clicked_at',
+}
+
+# Event kinds kept as per-card feeds, read newest first a page at a time
+FEED_KINDS = ('message', 'appointment', 'link_click')
+
+# How each kind of event is stored in memory (see columnar.EventColumns), in
+# the key order of the event dicts built by the tracking endpoints
+EVENT_SCHEMAS = {
+    'view': (
+        ('card_id', 'int'), ('visit_date', 'date'), ('visitor_ip_hash', 'digest'), ('timestamp', 'datetime'),
+    ),
+    'message': (
+        ('card_id', 'int'), ('sender_name', 'text'), ('sender_email', 'text'),
+        ('message_content', 'text'), ('received_at', 'datetime'),
+    ),
+    'appointment': (
+        ('card_id', 'int'), ('requester_name', 'text'), ('requester_email', 'text'),
+        ('proposed_time', 'text'), ('created_at', 'datetime'),
+    ),
+    'link_click': (
+        ('card_id', 'int'), ('link_type', 'symbol'), ('link_url', 'symbol'), ('clicked_at', 'datetime'),
+    ),
+}
+
+
+class AnalyticsStore:
+    """Raw analytics rows plus the rollups derived from them.
+
+    All state changes go through ``apply`` so that live recording and
+    replaying a durable event log rebuild exactly the same state. Raw rows
+    are kept in compact columnar tables that share one table of interned
+    strings.
+    """
+
+    def __init__(self, visitor_rollups, keep_visitor_rows=True, leaderboards=None):
+        self.symbols = SymbolTable()
+        self.visitors = EventColumns(EVENT_SCHEMAS['view'], self.symbols)
+        self.visitor_rollups = visitor_rollups
+        self.keep_visitor_rows = keep_visitor_rows
+        self.link_click_counters = LinkClickCounters()
+        self.message_counts = DailyCounts()
+        self.appointment_counts = DailyCounts()
+        self.leaderboards = leaderboards if leaderboards is not None else Leaderboards()
+        # kind -> card_id -> EventColumns in recording order. An event's
+        # sequence number is its 1-based position in its card's stream.
+        self._streams = {kind: {} for kind in FEED_KINDS}
+        self._lock = threading.Lock()
+
+    def apply(self, kind, event):
+        if kind == 'view':
+            if self.keep_visitor_rows:
+                self.visitors.append(event)
+            added = self.visitor_rollups.record(event['card_id'], event['visit_date'], event['visitor_ip_hash'])
+            if added:
+                self.leaderboards.record('unique_visitors', event['card_id'], event['visit_date'], added)
+        elif kind in self._streams:
+            with self._lock:
+                stream = self._streams[kind].get(event['card_id'])
+                if stream is None:
+                    stream = self._streams[kind][event['card_id']] = EventColumns(EVENT_SCHEMAS[kind], self.symbols)
+            stream.append(event)
+            day = event_date(kind, event)
+            if kind == 'link_click':
+                self.link_click_counters.record(event['card_id'], day, event['link_type'], event['link_url'])
+            elif kind == 'message':
+                self.message_counts.record(event['card_id'], day)
+            else:
+                self.appointment_counts.record(event['card_id'], day)
+            self.leaderboards.record(EVENT_METRICS[kind], event['card_id'], day)
+        elif kind == 'visitor_day':
+            # A day of views already folded into a rollup by log compaction
+            added = self.visitor_rollups.merge_day(
+                event['card_id'], event['visit_date'], decode_visitor_counter(event['visitors'])
+            )
+            if added:
+                self.leaderboards.record('unique_visitors', event['card_id'], event['visit_date'], added)
+        else:
+            raise ValueError(f'Unknown analytics event kind: {kind}')
+
+    # Queries. ``sqlite_storage.SQLiteAnalyticsStore`` answers the same ones
+    # from the database.
+
+    def daily_unique_visitors(self, card_id, date_from=None, date_to=None):
+        return self.visitor_rollups.daily_unique_visitors(card_id, date_from, date_to)
+
+    def unique_visitors_by_period(self, card_id, interval, date_from=None, date_to=None):
+        return self.visitor_rollups.unique_visitors_by_period(card_id, interval, date_from, date_to)
+
+    def view_count(self):
+        return len(self.visitors)
+
+    def link_click_summary(self, card_id, date_from=None, date_to=None, top=None):
+        return self.link_click_counters.summary(card_id, date_from, date_to, top)
+
+    def row_counts(self):
+        """Raw rows held per event kind (views are not kept in approximate
+        unique-visitor mode)."""
+        counts = {'view': len(self.visitors)}
+        for kind, streams in self._streams.items():
+            counts[kind] = sum(len(stream) for stream in list(streams.values()))
+        return counts
+
+    def dashboard_summary(self, card_ids, date_from=None, date_to=None):
+        """Headline numbers per card for a date range, read from the rollups.
+
+        Returns ``{card_id: {'unique_visitors', 'messages', 'appointments',
+        'link_clicks_by_type'}}``, where unique visitors are distinct over
+        the whole range.
+        """
+        return {
+            card_id: {
+                'unique_visitors': self.visitor_rollups.unique_visitors(card_id, date_from, date_to),
+                'messages': self.message_counts.total(card_id, date_from, date_to),
+                'appointments': self.appointment_counts.total(card_id, date_from, date_to),
+                'link_clicks_by_type': self.link_click_counters.clicks_by_type(card_id, date_from, date_to),
+            }
+            for card_id in card_ids
+        }
+
+    def top_cards(self, metric, window, limit):
+        """The ``limit`` cards with the highest ``metric`` over the rolling
+        ``window`` (see ``leaderboards.LEADERBOARD_WINDOWS``), across all
+        cards. Returns ``(date_from, date_to, [(card_id, count), ...])``."""
+        return self.leaderboards.top(metric, window, limit)
+
+    def feed(self, kind, card_id, limit, before=None):
+        """A page of a card's ``kind`` events, newest first.
+
+        Returns up to ``limit`` events (all of them if None) with a sequence
+        number below ``before`` (or the newest ones), and the sequence number
+        to pass as ``before`` for the next page, or None on the last page.
+        Streams are only appended to, so a page boundary never moves.
+        """
+        stream = self._streams[kind].get(card_id)
+        if stream is None:
+            return [], None
+        end = len(stream) if before is None else min(before - 1, len(stream))
+        start = 0 if limit is None else max(0, end - limit)
+        page = stream.rows(start, end)
+        page.reverse()
+        return page, (start + 1 if start > 0 else None)
+
+    def export_events(self, kind, card_id, date_from=None, date_to=None):
+        """A card's ``kind`` events recorded from ``date_from`` to ``date_to``
+        (inclusive), oldest first.
+
+        A generator that reads the stream a chunk of rows at a time, so an
+        export of any size uses the same memory. Events recorded while it
+        runs are not included.
+        """
+        stream = self._streams[kind].get(card_id)
+        if stream is None:
+            return
+        for event in stream:
+            day = event_date(kind, event)
+            if (date_from and day < date_from) or (date_to and day > date_to):
+                continue
+            yield event
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class VisitorRollups:
+    """Per-card, per-day unique visitor sets maintained as views arrive.
+
+    Recording a view is O(1) amortised (visits nearly always land on the
+    newest day, so the sorted day list is appended to), and reading a date
+    range is O(log days + days in range) instead of a pass over every view
+    ever recorded.
+
+    ``counter_factory`` builds the per-day distinct counter. The default
+    ``set`` counts exactly; a ``HyperLogLog`` factory bounds memory per card
+    per day at the cost of a small, configurable error.
+
+    A single lock guards the rollups, so they can be shared between threads.
+    """
+
+    def __init__(self, counter_factory=set):
+        self._counter_factory = counter_factory
+        self._lock = threading.Lock()
+        self._daily = defaultdict(dict)         # card_id -> {visit_date: distinct counter}
+        self._sorted_days = defaultdict(list)   # card_id -> visit dates in order
+
+    def _day_counter(self, card_id, visit_date):
+        days = self._daily[card_id]
+        visitors = days.get(visit_date)
+        if visitors is None:
+            visitors = days[visit_date] = self._counter_factory()
+            _insert_day(self._sorted_days[card_id], visit_date)
+        return visitors
+
+    def record(self, card_id, visit_date, ip_hash):
+        """Count a view; returns how much the day's unique visitor count
+        grew (1 for a first visit that day in exact mode)."""
+        with self._lock:
+            visitors = self._day_counter(card_id, visit_date)
+            before = len(visitors)
+            visitors.add(ip_hash)
+            return len(visitors) - before
+
+    def merge_day(self, card_id, visit_date, counter):
+        """Merge a day's visitors; returns how much its count grew."""
+        with self._lock:
+            visitors = self._day_counter(card_id, visit_date)
+            if isinstance(counter, HyperLogLog) and not isinstance(visitors, HyperLogLog):
+                raise ValueError('Cannot load approximate visitor counts in exact mode')
+            before = len(visitors)
+            if isinstance(visitors, HyperLogLog) and not isinstance(counter, HyperLogLog):
+                for ip_hash in counter:
+                    visitors.add(ip_hash)
+            else:
+                visitors.update(counter)
+            return len(visitors) - before
+
+    def iter_days(self):
+        with self._lock:
+            days = [
+                (card_id, visit_date, self._daily[card_id][visit_date])
+                for card_id, sorted_days in self._sorted_days.items()
+                for visit_date in sorted_days
+            ]
+        return iter(days)
+
+    def days_in_range(self, card_id, date_from=None, date_to=None):
+        return _days_in_range(self._sorted_days.get(card_id, []), date_from, date_to)
+
+    def daily_unique_visitors(self, card_id, date_from=None, date_to=None):
+        with self._lock:
+            days = self._daily.get(card_id, {})
+            return [
+                {'date': visit_date, 'unique_visitors': len(days[visit_date])}
+                for visit_date in self.days_in_range(card_id, date_from, date_to)
+            ]
+
+    def unique_visitors(self, card_id, date_from=None, date_to=None):
+        """Distinct visitors over the whole range; someone seen on several
+        days is counted once."""
+        with self._lock:
+            days = self._daily.get(card_id, {})
+            in_range = self.days_in_range(card_id, date_from, date_to)
+            if len(in_range) == 1:
+                return len(days[in_range[0]])
+            total = self._counter_factory()
+            for visit_date in in_range:
+                total.update(days[visit_date])
+        return len(total)
+
+    def unique_visitors_by_period(self, card_id, interval, date_from=None, date_to=None):
+        """Unique visitors per ``week`` (starting Monday) or ``month``.
+
+        Daily counters are merged per period, so a visitor seen on several
+        days of the same week is counted once for that week.
+        """
+        period_start = PERIOD_START[interval]
+        merged = {}
+        with self._lock:
+            days = self._daily.get(card_id, {})
+            for visit_date in self.days_in_range(card_id, date_from, date_to):
+                period = period_start(visit_date)
+                total = merged.get(period)
+                if total is None:
+                    total = merged[period] = self._counter_factory()
+                total.update(days[visit_date])
+        return [
+            {'date': period, 'unique_visitors': len(total)}
+            for period, total in merged.items()
+        ]
+
+
+class LinkClickCounters:
+    """Per-card link click counts per day and per ``(link_type, link_url)``,
+    updated as clicks are recorded.
+
+    A card's all-time counts are kept alongside the daily ones, so a summary
+    without a date range costs O(distinct links) and one with a range
+    O(days in range x links clicked per day), however many clicks the card
+    has had. Safe to share between threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = defaultdict(Counter)     # card_id -> Counter((link_type, link_url))
+        self._daily = defaultdict(dict)         # card_id -> {click_date: Counter((link_type, link_url))}
+        self._sorted_days = defaultdict(list)   # card_id -> click dates in order
+
+    def record(self, card_id, click_date, link_type, link_url, clicks=1):
+        link = (link_type, link_url)
+        with self._lock:
+            self._totals[card_id][link] += clicks
+            days = self._daily[card_id]
+            day = days.get(click_date)
+            if day is None:
+                day = days[click_date] = Counter()
+                _insert_day(self._sorted_days[card_id], click_date)
+            day[link] += clicks
+
+    def _links(self, card_id, in_range, date_from, date_to):
+        if not (date_from or date_to):
+            return Counter(self._totals.get(card_id, {}))
+        days = self._daily.get(card_id, {})
+        links = Counter()
+        for click_date in in_range:
+            links.update(days[click_date])
+        return links
+
+    def summary(self, card_id, date_from=None, date_to=None, top=None):
+        with self._lock:
+            days = self._daily.get(card_id, {})
+            in_range = _days_in_range(self._sorted_days.get(card_id, []), date_from, date_to)
+            daily = [(click_date, sum(days[click_date].values())) for click_date in in_range]
+            links = self._links(card_id, in_range, date_from, date_to)
+        return summarize_link_clicks(links, daily, top)
+
+    def clicks_by_type(self, card_id, date_from=None, date_to=None):
+        with self._lock:
+            in_range = _days_in_range(self._sorted_days.get(card_id, []), date_from, date_to)
+            links = self._links(card_id, in_range, date_from, date_to)
+        by_type = Counter()
+        for (link_type, _), clicks in links.items():
+            by_type[link_type] += clicks
+        return dict(by_type)
+
+
+class DailyCounts:
+    """Number of events per card per day, for counting a card's messages or
+    appointment requests in a date range in O(days in range)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._daily = defaultdict(dict)         # card_id -> {date: count}
+        self._sorted_days = defaultdict(list)   # card_id -> dates in order
+
+    def record(self, card_id, day, count=1):
+        with self._lock:
+            days = self._daily[card_id]
+            if day not in days:
+                days[day] = 0
+                _insert_day(self._sorted_days[card_id], day)
+            days[day] += count
+
+    def total(self, card_id, date_from=None, date_to=None):
+        with self._lock:
+            days = self._daily.get(card_id, {})
+            return sum(days[day] for day in _days_in_range(self._sorted_days.get(card_id, []), date_from, date_to))
+
+
+def summarize_link_clicks(links, daily, top=None):
+    """Build the link click summary from clicks per ``(link_type, link_url)``
+    and ``(date, clicks)`` pairs in date order; ``top`` keeps only the most
+    clicked link types and URLs."""
+    by_type = Counter()
+    by_url = Counter()
+    for (link_type, link_url), clicks in links.items():
+        by_type[link_type] += clicks
+        by_url[link_url] += clicks
+    return {
+        'total_clicks': sum(by_type.values()),
+        'by_link_type': [{'link_type': link_type, 'clicks': clicks} for link_type, clicks in _most_clicked(by_type, top)],
+        'by_link_url': [{'link_url': link_url, 'clicks': clicks} for link_url, clicks in _most_clicked(by_url, top)],
+        'daily': [{'date': click_date, 'clicks': clicks} for click_date, clicks in daily],
+    }
+
+
+def _most_clicked(counter, top):
+    # Most clicked first, ties broken by name so the order is stable
+    ranked = [(-clicks, name) for name, clicks in counter.items()]
+    chosen = sorted(ranked) if top is None else heapq.nsmallest(top, ranked)
+    return [(name, -negated) for negated, name in chosen]
+
+
+def event_date(kind, event):
+    """The day (YYYY-MM-DD, UTC) an event was recorded on."""
+    return event[EVENT_TIME_FIELDS[kind]].date().isoformat()
+
+
+def click_date(event):
+    return event_date('link_click', event)
+
+
+def _insert_day(sorted_days, day):
+    # Events nearly always land on the newest day, so this is usually an append
+    if not sorted_days or sorted_days[-1] < day:
+        sorted_days.append(day)
+    else:
+        bisect.insort(sorted_days, day)
+
+
+def _days_in_range(sorted_days, date_from=None, date_to=None):
+    start = bisect.bisect_left(sorted_days, date_from) if date_from else 0
+    end = bisect.bisect_right(sorted_days, date_to) if date_to else len(sorted_days)
+    return sorted_days[start:end]
+
+
+def _week_start(visit_date):
+    day = datetime.date.fromisoformat(visit_date)
+    return (day - datetime.timedelta(days=day.weekday())).isoformat()
+
+
+def _month_start(visit_date):
+    return visit_date[:8] + '01'
+
+
+PERIOD_START = {
+    'week': _week_start,
+    'month': _month_start,
+}
+
+
+def parse_date_range(args):
+    """Read optional ``from``/``to`` (YYYY-MM-DD) query parameters.
+
+    Returns ``(date_from, date_to, error_message)`` with the dates normalised
+    to ISO strings so they compare correctly against stored visit dates.
+    """
+    bounds = []
+    for name in ('from', 'to'):
+        value = args.get(name)
+        if not value:
+            bounds.append(None)
+            continue
+        try:
+            bounds.append(datetime.date.fromisoformat(value).isoformat())
+        except ValueError:
+            return None, None, f"Invalid '{name}' date, expected YYYY-MM-DD"
+    date_from, date_to = bounds
+    if date_from and date_to and date_from > date_to:
+        return None, None, "'from' must not be after 'to'"
+    return date_from, date_to, None
+
+
+def encode_feed_cursor(card_id, sequence):
+    """Opaque cursor for the feed page that starts below ``sequence``."""
+    return base64.urlsafe_b64encode(f'{card_id}:{sequence}'.encode('ascii')).decode('ascii').rstrip('=')
+
+
+def decode_feed_cursor(cursor, card_id):
+    """Returns ``(sequence, error_message)`` for a cursor from ``encode_feed_cursor``."""
+    try:
+        decoded = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('ascii')
+        cursor_card_id, sequence = (int(part) for part in decoded.split(':'))
+    except ValueError:
+        return None, "Invalid 'cursor'"
+    if cursor_card_id != card_id or sequence < 1:
+        return None, "Invalid 'cursor'"
+    return sequence, None
+
+
+def encode_visitor_counter(counter):
+    if isinstance(counter, HyperLogLog):
+        return {'sketch': base64.b64encode(counter.to_bytes()).decode('ascii')}
+    return {'ip_hashes': sorted(counter)}
+
+
+def decode_visitor_counter(data):
+    if 'sketch' in data:
+        return HyperLogLog.from_bytes(base64.b64decode(data['sketch']))
+    return set(data['ip_hashes'])
+
+
+def fold_events(events, counter_factory):
+    """Fold view events into per-card, per-day ``visitor_day`` rollups.
+
+    Messages, appointments and link clicks are passed through unchanged
+    (in order), since the query endpoints return them row by row. Used by
+    log compaction; ``visitor_day`` records from an earlier compaction are
+    merged back in, so compacting twice is the same as compacting once.
+    """
+    rollups = VisitorRollups(counter_factory)
+    for kind, event in events:
+        if kind == 'view':
+            rollups.record(event['card_id'], event['visit_date'], event['visitor_ip_hash'])
+        elif kind == 'visitor_day':
+            rollups.merge_day(event['card_id'], event['visit_date'], decode_visitor_counter(event['visitors']))
+        else:
+            yield kind, event
+    for card_id, visit_date, counter in rollups.iter_days():
+        yield 'visitor_day', {
+            'card_id': card_id,
+            'visit_date': visit_date,
+            'visitors': encode_visitor_counter(counter),
+        }
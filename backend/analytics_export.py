@@ -0,0 +1,99 @@
+import csv
+import io
+import json
+
+from analytics import EVENT_SCHEMAS, EVENT_TIME_FIELDS
+
+# What can be exported, named as in the analytics URLs -> the event kind, or
+# None for the daily unique visitor counts
+EXPORT_TYPES = {
+    'visitors': None,
+    'messages': 'message',
+    'appointments': 'appointment',
+    'link_clicks': 'link_click',
+}
+
+EXPORT_MIMETYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+VISITOR_FIELDS = ('card_id', 'date', 'unique_visitors')
+
+# Encoded rows are sent in chunks of about this many bytes
+CHUNK_BYTES = 64 * 1024
+
+
+def export_fields(export_type):
+    """Column names, in order, of the rows of an export."""
+    kind = EXPORT_TYPES[export_type]
+    if kind is None:
+        return VISITOR_FIELDS
+    return tuple(field for field, _ in EVENT_SCHEMAS[kind])
+
+
+def export_rows(analytics_store, export_type, card_ids, date_from=None, date_to=None):
+    """The rows of an export, card by card and oldest first within a card,
+    with timestamps as ISO 8601 strings (UTC).
+
+    Events are pulled from the store as they are needed, so the export is
+    never held in memory as a whole.
+    """
+    kind = EXPORT_TYPES[export_type]
+    for card_id in card_ids:
+        if kind is None:
+            # One row per day, so small enough to read at once
+            for day in analytics_store.daily_unique_visitors(card_id, date_from, date_to):
+                yield {'card_id': card_id, **day}
+            continue
+        time_field = EVENT_TIME_FIELDS[kind]
+        for event in analytics_store.export_events(kind, card_id, date_from, date_to):
+            event[time_field] = event[time_field].isoformat()
+            yield event
+
+
+def encode_ndjson(rows):
+    """Rows as newline-delimited JSON, in byte chunks."""
+    return _chunked(json.dumps(row) + '\n' for row in rows)
+
+
+def encode_csv(rows, fields):
+    """Rows as CSV with a header line, in byte chunks."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fields)
+
+    def lines():
+        writer.writeheader()
+        yield _take(buffer)
+        for row in rows:
+            writer.writerow(row)
+            yield _take(buffer)
+
+    return _chunked(lines())
+
+
+def _take(buffer):
+    text = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return text
+
+
+def _chunked(pieces):
+    # The first piece goes out on its own so the client gets bytes straight
+    # away; later ones are joined to save a write per row
+    pieces = iter(pieces)
+    for piece in pieces:
+        yield piece.encode('utf-8')
+        break
+    chunk = []
+    size = 0
+    for piece in pieces:
+        chunk.append(piece)
+        size += len(piece)
+        if size >= CHUNK_BYTES:
+            yield ''.join(chunk).encode('utf-8')
+            chunk = []
+            size = 0
+    if chunk:
+        yield ''.join(chunk).encode('utf-8')
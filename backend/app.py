@@ -1,31 +1,193 @@
 import os
+import atexit
 import datetime
+import functools
+import hmac
+import time
+import json
 import hashlib # Added for IP hashing
-from collections import defaultdict # Added for visitor analytics
-from flask import Flask, request, jsonify
-from werkzeug.security import generate_password_hash, check_password_hash
+import click
+from flask import Flask, Response, g, request, jsonify, url_for
+from werkzeug.security import generate_password_hash
 import jwt
 
+from hyperloglog import HyperLogLog, precision_for_error_rate
+
+from analytics import (
+    PERIOD_START, AnalyticsStore, VisitorRollups, decode_feed_cursor, encode_feed_cursor, fold_events,
+    parse_date_range,
+)
+from analytics_export import EXPORT_MIMETYPES, encode_csv, encode_ndjson, export_fields, export_rows
+from event_log import AppendOnlyLogSink, NullSink
+from leaderboards import LEADERBOARD_METRICS, LEADERBOARD_WINDOWS
+from metrics import (
+    PROMETHEUS_CONTENT_TYPE, LabeledCounter, MetricsMiddleware, RequestMetrics, SlowRequestProfiler, format_metric,
+)
+from password_hashing import PasswordHasher, PasswordHasherBusy
+from public_cards import PublicCardCache
+from token_cache import VerifiedTokenCache
+from templating import RenderedCardCache, TemplateCompiler
+from sqlite_storage import SQLiteAnalyticsStore, SQLiteCardStore, SQLiteDatabase, SQLiteUserStore
+from stores import CardStore, DuplicateUserError, SlugConflictError, UserStore
+
 app = Flask(__name__)
 
 # Configuration
 app.config['SECRET_KEY'] = 'your-super-secret-key' # Change this in production!
 app.config['JWT_ALGORITHM'] = 'HS256'
 app.config['JWT_EXPIRATION_DELTA'] = datetime.timedelta(hours=1)
-
-# In-memory user store (for demonstration purposes)
-users = {} # Stores user_id -> {username, email, password_hash}
-user_id_counter = 1
-
-# In-memory card store
-user_cards = [] # List of card objects
-next_card_id = 1
-
-# In-memory analytics stores
-analytics_visitors = []
-analytics_messages = []
-analytics_appointments = []
-analytics_link_clicks = []
+# Where users, cards and analytics live: 'memory' (per process) or 'sqlite'
+# (a database file in WAL mode that several worker processes can share)
+app.config['STORAGE_BACKEND'] = os.environ.get('CARDIFY_STORAGE_BACKEND', 'memory')
+app.config['DATABASE_PATH'] = os.environ.get('CARDIFY_DATABASE_PATH', 'cardify.db')
+# Treat emails/usernames that differ only in case as the same account
+app.config['USER_LOOKUP_CASE_INSENSITIVE'] = os.environ.get('CARDIFY_USER_LOOKUP_CASE_INSENSITIVE', '') == '1'
+# 'exact' keeps every visitor IP hash; 'approx' keeps a fixed-size HyperLogLog
+# sketch per card per day and stops storing raw view rows
+app.config['UNIQUE_VISITORS_MODE'] = os.environ.get('CARDIFY_UNIQUE_VISITORS_MODE', 'exact')
+app.config['UNIQUE_VISITORS_ERROR_RATE'] = float(os.environ.get('CARDIFY_UNIQUE_VISITORS_ERROR_RATE', '0.01'))
+# Durable analytics event log; analytics are kept in memory only when unset
+app.config['ANALYTICS_LOG_DIR'] = os.environ.get('CARDIFY_ANALYTICS_LOG_DIR')
+app.config['ANALYTICS_LOG_FLUSH_INTERVAL'] = float(os.environ.get('CARDIFY_ANALYTICS_LOG_FLUSH_INTERVAL', '0.2'))
+app.config['ANALYTICS_LOG_SEGMENT_MAX_BYTES'] = int(os.environ.get('CARDIFY_ANALYTICS_LOG_SEGMENT_MAX_BYTES', str(64 * 1024 * 1024)))
+app.config['ANALYTICS_LOG_SEGMENT_MAX_AGE'] = int(os.environ.get('CARDIFY_ANALYTICS_LOG_SEGMENT_MAX_AGE', '3600'))
+app.config['ANALYTICS_LOG_COMPACT_AFTER'] = int(os.environ.get('CARDIFY_ANALYTICS_LOG_COMPACT_AFTER', '8'))
+# Seconds between batched analytics inserts with the 'sqlite' backend
+app.config['ANALYTICS_WRITE_INTERVAL'] = float(os.environ.get('CARDIFY_ANALYTICS_WRITE_INTERVAL', '0.2'))
+# Password hashing: werkzeug method with its cost parameters, and the worker
+# processes that run it (0 hashes on the request thread). Requests beyond the
+# workers plus the queue limit, or waiting longer than the timeout, get a 503.
+app.config['PASSWORD_HASH_METHOD'] = os.environ.get('CARDIFY_PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('CARDIFY_PASSWORD_HASH_WORKERS', str(os.cpu_count() or 1)))
+app.config['PASSWORD_HASH_QUEUE_LIMIT'] = int(os.environ.get('CARDIFY_PASSWORD_HASH_QUEUE_LIMIT', '32'))
+app.config['PASSWORD_HASH_TIMEOUT'] = float(os.environ.get('CARDIFY_PASSWORD_HASH_TIMEOUT', '5'))
+# Number of verified JWTs whose claims are cached (0 disables the cache)
+app.config['TOKEN_CACHE_SIZE'] = int(os.environ.get('CARDIFY_TOKEN_CACHE_SIZE', '10000'))
+# Number of rendered public card pages kept in memory
+app.config['RENDERED_CARD_CACHE_SIZE'] = int(os.environ.get('CARDIFY_RENDERED_CARD_CACHE_SIZE', '10000'))
+# Public card JSON kept serialized in memory, and unknown slugs remembered
+# (how many, and for how many seconds) so repeated probes skip the store
+app.config['PUBLIC_CARD_CACHE_SIZE'] = int(os.environ.get('CARDIFY_PUBLIC_CARD_CACHE_SIZE', '10000'))
+app.config['PUBLIC_CARD_MISS_CACHE_SIZE'] = int(os.environ.get('CARDIFY_PUBLIC_CARD_MISS_CACHE_SIZE', '100000'))
+app.config['PUBLIC_CARD_MISS_TTL'] = float(os.environ.get('CARDIFY_PUBLIC_CARD_MISS_TTL', '10'))
+# Largest number of cards accepted by POST and PATCH /cards/bulk
+app.config['BULK_CARDS_MAX_ITEMS'] = int(os.environ.get('CARDIFY_BULK_CARDS_MAX_ITEMS', '10000'))
+# Largest number of events accepted by POST /events/batch
+app.config['BEACON_BATCH_MAX_EVENTS'] = int(os.environ.get('CARDIFY_BEACON_BATCH_MAX_EVENTS', '500'))
+# Page size of the message/appointment/link-click feeds when a 'cursor' comes
+# without a 'limit', and the largest 'limit' accepted
+app.config['ANALYTICS_FEED_DEFAULT_LIMIT'] = int(os.environ.get('CARDIFY_ANALYTICS_FEED_DEFAULT_LIMIT', '50'))
+app.config['ANALYTICS_FEED_MAX_LIMIT'] = int(os.environ.get('CARDIFY_ANALYTICS_FEED_MAX_LIMIT', '500'))
+# Users allowed to call the /admin endpoints (comma-separated user ids)
+app.config['ADMIN_USER_IDS'] = frozenset(
+    int(user_id) for user_id in os.environ.get('CARDIFY_ADMIN_USER_IDS', '').split(',') if user_id.strip()
+)
+# Cards in a leaderboard when no 'limit' is given, and the largest 'limit' accepted
+app.config['LEADERBOARD_DEFAULT_LIMIT'] = int(os.environ.get('CARDIFY_LEADERBOARD_DEFAULT_LIMIT', '100'))
+app.config['LEADERBOARD_MAX_LIMIT'] = int(os.environ.get('CARDIFY_LEADERBOARD_MAX_LIMIT', '1000'))
+# Request metrics served at GET /metrics ('0' turns off both), and a bearer
+# token the scraper must send (unset leaves the endpoint open)
+app.config['METRICS_ENABLED'] = os.environ.get('CARDIFY_METRICS_ENABLED', '1') == '1'
+app.config['METRICS_TOKEN'] = os.environ.get('CARDIFY_METRICS_TOKEN')
+# Requests running longer than this many seconds get their stacks sampled
+# every interval seconds and logged when they finish (0 turns it off)
+app.config['SLOW_REQUEST_PROFILE_SECONDS'] = float(os.environ.get('CARDIFY_SLOW_REQUEST_PROFILE_SECONDS', '0'))
+app.config['SLOW_REQUEST_PROFILE_INTERVAL'] = float(os.environ.get('CARDIFY_SLOW_REQUEST_PROFILE_INTERVAL', '0.005'))
+
+password_hasher = PasswordHasher(
+    method=app.config['PASSWORD_HASH_METHOD'],
+    workers=app.config['PASSWORD_HASH_WORKERS'],
+    queue_limit=app.config['PASSWORD_HASH_QUEUE_LIMIT'],
+    timeout=app.config['PASSWORD_HASH_TIMEOUT'],
+)
+# The worker processes start on the first hash, in the process serving it
+atexit.register(password_hasher.close)
+
+# Per-process request metrics and counters updated on the hot paths
+request_metrics = RequestMetrics()
+analytics_events_recorded = LabeledCounter(
+    'cardify_analytics_events_total', 'Analytics events recorded by this process, by kind', ('kind',),
+)
+
+def log_slow_request(method, route, seconds, stacks):
+    samples = sum(stacks.values())
+    top = '\n'.join(f'  {count}/{samples} {stack}' for stack, count in stacks.most_common(3))
+    app.logger.warning('Slow request %s %s took %.3fs; most sampled stacks:\n%s', method, route, seconds, top)
+
+if app.config['METRICS_ENABLED'] and app.config['SLOW_REQUEST_PROFILE_SECONDS'] > 0:
+    slow_request_profiler = SlowRequestProfiler(
+        app.config['SLOW_REQUEST_PROFILE_SECONDS'],
+        log_slow_request,
+        interval=app.config['SLOW_REQUEST_PROFILE_INTERVAL'],
+    )
+    slow_request_profiler.start()
+    atexit.register(slow_request_profiler.close)
+else:
+    slow_request_profiler = None
+
+def password_hasher_busy_response():
+    response = jsonify({'message': 'Server is busy, please try again shortly'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+# Verified token -> claims, so repeat requests skip JWT parsing and HMAC checks
+token_cache = VerifiedTokenCache(max_entries=app.config['TOKEN_CACHE_SIZE'])
+
+# User and card stores. Both backends are safe to use from several threads;
+# only 'sqlite' shares state between worker processes.
+if app.config['STORAGE_BACKEND'] == 'sqlite':
+    database = SQLiteDatabase(app.config['DATABASE_PATH'])
+    user_store = SQLiteUserStore(database, case_insensitive=app.config['USER_LOOKUP_CASE_INSENSITIVE'])
+    card_store = SQLiteCardStore(database)
+else:
+    # In-memory stores (for demonstration purposes), indexed by email/username
+    # and by card id/slug/owner
+    user_store = UserStore(case_insensitive=app.config['USER_LOOKUP_CASE_INSENSITIVE'])
+    card_store = CardStore()
+
+# Per-card, per-day unique visitors, updated as views are recorded
+if app.config['UNIQUE_VISITORS_MODE'] == 'approx':
+    precision_for_error_rate(app.config['UNIQUE_VISITORS_ERROR_RATE'])  # Fail at startup on an unreachable rate
+
+    def visitor_counter_factory():
+        return HyperLogLog(error_rate=app.config['UNIQUE_VISITORS_ERROR_RATE'])
+else:
+    visitor_counter_factory = set
+
+if app.config['STORAGE_BACKEND'] == 'sqlite':
+    # Analytics tables in the same database, written in batches; queries run
+    # against the tables, so there is nothing to rebuild on startup
+    analytics_store = SQLiteAnalyticsStore(database, flush_interval=app.config['ANALYTICS_WRITE_INTERVAL'])
+    analytics_store.start()
+    atexit.register(analytics_store.close)
+else:
+    # In-memory analytics store (raw rows plus rollups)
+    analytics_store = AnalyticsStore(
+        VisitorRollups(visitor_counter_factory),
+        keep_visitor_rows=app.config['UNIQUE_VISITORS_MODE'] != 'approx',
+    )
+
+# Durable event log for the in-memory analytics store: replayed into it on
+# startup, then appended to in batches by a background writer
+if app.config['ANALYTICS_LOG_DIR'] and app.config['STORAGE_BACKEND'] != 'sqlite':
+    event_sink = AppendOnlyLogSink(
+        app.config['ANALYTICS_LOG_DIR'],
+        fold=lambda events: fold_events(events, visitor_counter_factory),
+        flush_interval=app.config['ANALYTICS_LOG_FLUSH_INTERVAL'],
+        segment_max_bytes=app.config['ANALYTICS_LOG_SEGMENT_MAX_BYTES'],
+        segment_max_age=app.config['ANALYTICS_LOG_SEGMENT_MAX_AGE'],
+        compact_after=app.config['ANALYTICS_LOG_COMPACT_AFTER'],
+    )
+    event_sink.replay(analytics_store.apply)
+    event_sink.start()
+    atexit.register(event_sink.close)
+else:
+    event_sink = NullSink()
+
+def record_event(kind, event):
+    analytics_store.apply(kind, event)
+    event_sink.emit(kind, event)
+    analytics_events_recorded.inc(kind)
 
 # Sample business card templates
 sample_templates = [
@@ -110,10 +272,29 @@ sample_templates = [
         "preview_image_url": "http://example.com/preview_template_3.png" # Placeholder
     }
 ]
+templates_by_id = {t['id']: t for t in sample_templates}
+
+def is_template_id(value):
+    # JSON arrays and objects are unhashable, and never a template's id
+    return not isinstance(value, (list, dict)) and value in templates_by_id
+
+if app.config['STORAGE_BACKEND'] == 'sqlite':
+    database.sync_templates(sample_templates)
+
+# Server-side rendering of public cards: each template is compiled once and
+# each card's rendered page is cached until the card or its template changes
+template_compiler = TemplateCompiler()
+rendered_cards = RenderedCardCache(max_entries=app.config['RENDERED_CARD_CACHE_SIZE'])
+# Public JSON projection of each card, serialized and gzipped once per version
+public_cards = PublicCardCache(
+    app.json.dumps,
+    max_entries=app.config['PUBLIC_CARD_CACHE_SIZE'],
+    max_misses=app.config['PUBLIC_CARD_MISS_CACHE_SIZE'],
+    miss_ttl=app.config['PUBLIC_CARD_MISS_TTL'],
+)
 
 @app.route('/register', methods=['POST'])
 def register():
-    global user_id_counter
     data = request.get_json()
 
     if not data or not data.get('username') or not data.get('email') or not data.get('password'):
@@ -123,22 +304,26 @@ def register():
     email = data['email']
     password = data['password']
 
-    if any(u['email'] == email for u in users.values()):
+    if not isinstance(username, str) or not isinstance(email, str):
+        return jsonify({'message': 'Username and email must be strings'}), 400
+
+    if user_store.email_exists(email):
         return jsonify({'message': 'Email already registered'}), 409
 
-    if any(u['username'] == username for u in users.values()):
+    if user_store.username_exists(username):
         return jsonify({'message': 'Username already taken'}), 409
 
-    password_hash = generate_password_hash(password)
-    
-    users[user_id_counter] = {
-        'id': user_id_counter,
-        'username': username,
-        'email': email,
-        'password_hash': password_hash,
-        'created_at': datetime.datetime.utcnow()
-    }
-    user_id_counter += 1
+    try:
+        password_hash = password_hasher.hash(password)
+    except PasswordHasherBusy:
+        return password_hasher_busy_response()
+
+    try:
+        user_store.add(username, email, password_hash, datetime.datetime.utcnow())
+    except DuplicateUserError as exc:
+        if exc.field == 'email':
+            return jsonify({'message': 'Email already registered'}), 409
+        return jsonify({'message': 'Username already taken'}), 409
 
     return jsonify({'message': 'User registered successfully'}), 201
 
@@ -152,15 +337,24 @@ def login():
     email = data['email']
     password = data['password']
 
-    user = None
-    for u in users.values():
-        if u['email'] == email:
-            user = u
-            break
-    
-    if not user or not check_password_hash(user['password_hash'], password):
+    if not isinstance(email, str):
         return jsonify({'message': 'Invalid email or password'}), 401
 
+    user = user_store.get_by_email(email)
+
+    try:
+        if not user or not password_hasher.verify(user['password_hash'], password):
+            return jsonify({'message': 'Invalid email or password'}), 401
+    except PasswordHasherBusy:
+        return password_hasher_busy_response()
+
+    # Upgrade hashes made with other cost parameters while we have the password
+    if password_hasher.needs_rehash(user['password_hash']):
+        try:
+            user_store.update_password_hash(user['id'], password_hasher.hash(password))
+        except PasswordHasherBusy:
+            pass  # Keep the old hash; it is upgraded on a later login
+
     payload = {
         'identity': user['id'], # Using 'identity' key for user_id as often standard
         'username': user['username'],
@@ -170,6 +364,37 @@ def login():
 
     return jsonify({'token': token}), 200
 
+def bulk_import_users(records):
+    """Hash passwords where needed and load ``records`` into the user store.
+
+    Records carry ``username``, ``email`` and either ``password`` or an
+    already computed ``password_hash``. Returns the store's
+    ``(imported, duplicates)`` result.
+    """
+    prepared = []
+    for record in records:
+        password_hash = record.get('password_hash') or generate_password_hash(
+            record['password'], app.config['PASSWORD_HASH_METHOD']
+        )
+        prepared.append({
+            'username': record['username'],
+            'email': record['email'],
+            'password_hash': password_hash,
+        })
+    return user_store.bulk_import(prepared, datetime.datetime.utcnow())
+
+@app.cli.command('import-users')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+def import_users_command(path):
+    """Bulk-load users from a JSON array of user records."""
+    with open(path, encoding='utf-8') as f:
+        records = json.load(f)
+
+    imported, duplicates = bulk_import_users(records)
+    click.echo(f'Imported {len(imported)} users, skipped {len(duplicates)} duplicates')
+    for index, field, value in duplicates:
+        click.echo(f'  record {index}: {field} {value!r} already exists')
+
 @app.route('/protected', methods=['GET'])
 def protected():
     auth_header = request.headers.get('Authorization')
@@ -180,7 +405,7 @@ def protected():
     token = auth_header.split(' ')[1]
 
     try:
-        payload = jwt.decode(token, app.config['SECRET_KEY'], algorithms=[app.config['JWT_ALGORITHM']])
+        payload = verify_token(token)
         # You can fetch user from DB here if needed using payload['identity']
         return jsonify({'message': f"Hello {payload['username']}! User ID: {payload['identity']}. This is a protected resource."}), 200
     except jwt.ExpiredSignatureError:
@@ -188,57 +413,101 @@ def protected():
     except jwt.InvalidTokenError:
         return jsonify({'message': 'Invalid token'}), 401
 
-# Helper function to get user_id from token
+# Helper function to decode and verify a token, consulting the cache first.
+# Raises jwt.ExpiredSignatureError / jwt.InvalidTokenError like jwt.decode.
+def verify_token(token):
+    now = time.time()
+    payload = token_cache.get(token, now)
+    if payload is not None:
+        return payload
+    payload = jwt.decode(token, app.config['SECRET_KEY'], algorithms=[app.config['JWT_ALGORITHM']])
+    token_cache.put(token, payload)
+    return payload
+
+# Helper function to get user_id from token (resolved once per request)
 def get_current_user_id_from_token():
+    if 'current_user_id' in g:
+        return g.current_user_id
+
+    g.current_user_id = None
     auth_header = request.headers.get('Authorization')
     if not auth_header or not auth_header.startswith('Bearer '):
         return None # Or raise an exception
 
     token = auth_header.split(' ')[1]
     try:
-        payload = jwt.decode(token, app.config['SECRET_KEY'], algorithms=[app.config['JWT_ALGORITHM']])
-        return payload.get('identity')
+        g.current_user_id = verify_token(token).get('identity')
     except (jwt.ExpiredSignatureError, jwt.InvalidTokenError):
-        return None # Or raise an exception
+        pass
+    return g.current_user_id
+
+# Decorator for endpoints that need an authenticated user; the user id is
+# available to the view as g.current_user_id
+def login_required(view):
+    @functools.wraps(view)
+    def wrapped_view(*args, **kwargs):
+        if not get_current_user_id_from_token():
+            return jsonify({'message': 'Authentication required'}), 401
+        return view(*args, **kwargs)
+    return wrapped_view
+
+# Decorator for the /admin endpoints: the caller must be signed in as one of
+# the users listed in ADMIN_USER_IDS
+def admin_required(view):
+    @functools.wraps(view)
+    def wrapped_view(*args, **kwargs):
+        user_id = get_current_user_id_from_token()
+        if not user_id:
+            return jsonify({'message': 'Authentication required'}), 401
+        if user_id not in app.config['ADMIN_USER_IDS']:
+            return jsonify({'message': 'Access forbidden: Administrators only'}), 403
+        return view(*args, **kwargs)
+    return wrapped_view
 
 @app.route('/templates', methods=['GET'])
 def get_templates():
     return jsonify(sample_templates), 200
 
-@app.route('/cards', methods=['POST'])
-def create_card():
-    global next_card_id
-    current_user_id = get_current_user_id_from_token()
-    if not current_user_id:
-        return jsonify({'message': 'Authentication required'}), 401
-
-    data = request.get_json()
-    if not data:
-        return jsonify({'message': 'Request body must be JSON'}), 400
-
+# Optional card fields holding text (full_name is required text)
+OPTIONAL_TEXT_CARD_FIELDS = (
+    'company_name', 'job_title', 'phone_number', 'email', 'website_url',
+    'address', 'business_description', 'custom_css',
+)
+
+# Helper function to check the types of a card payload's fields, so both
+# storage backends accept and refuse the same payloads; returns an error or None
+def card_field_type_error(data):
+    if 'full_name' in data and not isinstance(data['full_name'], str):
+        return 'full_name must be a string'
+    for field in OPTIONAL_TEXT_CARD_FIELDS:
+        if data.get(field) is not None and not isinstance(data[field], str):
+            return f'{field} must be a string or null'
+    if 'social_media_links' in data and not isinstance(data['social_media_links'], dict):
+        return 'social_media_links must be an object'
+    if 'is_active' in data and not isinstance(data['is_active'], bool):
+        return 'is_active must be true or false'
+    return None
+
+# Helper function to validate a new card's payload; returns (fields, error)
+def new_card_fields(data, now):
     required_fields = ['template_id', 'card_slug', 'full_name']
     for field in required_fields:
         if field not in data:
-            return jsonify({'message': f'Missing required field: {field}'}), 400
-
-    template_id = data['template_id']
-    card_slug = data['card_slug']
-    full_name = data['full_name']
+            return None, f'Missing required field: {field}'
 
     # Validate template_id
-    if not any(t['id'] == template_id for t in sample_templates):
-        return jsonify({'message': 'Invalid template_id'}), 400
-
-    # Validate uniqueness of card_slug
-    if any(c['card_slug'] == card_slug for c in user_cards):
-        return jsonify({'message': 'Card slug already exists'}), 409
-
-    new_card = {
-        'id': next_card_id,
-        'user_id': current_user_id,
-        'template_id': template_id,
-        'card_slug': card_slug,
-        'full_name': full_name,
+    if not is_template_id(data['template_id']):
+        return None, 'Invalid template_id'
+    if not isinstance(data['card_slug'], str):
+        return None, 'card_slug must be a string'
+    error = card_field_type_error(data)
+    if error:
+        return None, error
+
+    return {
+        'template_id': data['template_id'],
+        'card_slug': data['card_slug'],
+        'full_name': data['full_name'],
         'company_name': data.get('company_name'),
         'job_title': data.get('job_title'),
         'phone_number': data.get('phone_number'),
@@ -249,30 +518,50 @@ def create_card():
         'business_description': data.get('business_description'),
         'custom_css': data.get('custom_css'), # Assuming this might be added later
         'is_active': data.get('is_active', True),
-        'created_at': datetime.datetime.utcnow(),
-        'updated_at': datetime.datetime.utcnow()
-    }
-    user_cards.append(new_card)
-    next_card_id += 1
+        'created_at': now,
+        'updated_at': now
+    }, None
+
+@app.route('/cards', methods=['POST'])
+@login_required
+def create_card():
+    current_user_id = g.current_user_id
+
+    data = request.get_json()
+    if not data:
+        return jsonify({'message': 'Request body must be JSON'}), 400
+
+    fields, error = new_card_fields(data, datetime.datetime.utcnow())
+    if error:
+        return jsonify({'message': error}), 400
+    card_slug = fields['card_slug']
+
+    # Validate uniqueness of card_slug
+    if card_store.slug_exists(card_slug):
+        return jsonify({'message': 'Card slug already exists'}), 409
+
+    try:
+        new_card = card_store.add(current_user_id, fields)
+    except SlugConflictError:
+        return jsonify({'message': 'Card slug already exists'}), 409
+    public_cards.forget_missing(card_slug)
 
     return jsonify(new_card), 201
 
 @app.route('/cards', methods=['GET'])
+@login_required
 def get_user_cards():
-    current_user_id = get_current_user_id_from_token()
-    if not current_user_id:
-        return jsonify({'message': 'Authentication required'}), 401
+    current_user_id = g.current_user_id
 
-    cards_for_user = [card for card in user_cards if card['user_id'] == current_user_id]
+    cards_for_user = card_store.list_for_user(current_user_id)
     return jsonify(cards_for_user), 200
 
 @app.route('/cards/<int:card_id>', methods=['GET'])
+@login_required
 def get_specific_card(card_id):
-    current_user_id = get_current_user_id_from_token()
-    if not current_user_id:
-        return jsonify({'message': 'Authentication required'}), 401
+    current_user_id = g.current_user_id
 
-    card = next((card for card in user_cards if card['id'] == card_id), None)
+    card = card_store.get(card_id)
 
     if not card:
         return jsonify({'message': 'Card not found'}), 404
@@ -282,17 +571,38 @@ def get_specific_card(card_id):
 
     return jsonify(card), 200
 
+# Fields a card owner may change through PUT /cards/<card_id>
+UPDATABLE_CARD_FIELDS = (
+    'card_slug', 'template_id', 'full_name', 'company_name', 'job_title',
+    'phone_number', 'email', 'website_url', 'address', 'social_media_links',
+    'business_description', 'custom_css', 'is_active',
+)
+
+# Helper function to validate the changes to a card; returns (changes, error)
+def card_changes(data, now):
+    # Validate template_id if it's being changed
+    if 'template_id' in data and not is_template_id(data['template_id']):
+        return None, 'Invalid template_id'
+    if 'card_slug' in data and not isinstance(data['card_slug'], str):
+        return None, 'card_slug must be a string'
+    error = card_field_type_error(data)
+    if error:
+        return None, error
+
+    changes = {field: data[field] for field in UPDATABLE_CARD_FIELDS if field in data}
+    changes['updated_at'] = now
+    return changes, None
+
 @app.route('/cards/<int:card_id>', methods=['PUT'])
+@login_required
 def update_card(card_id):
-    current_user_id = get_current_user_id_from_token()
-    if not current_user_id:
-        return jsonify({'message': 'Authentication required'}), 401
+    current_user_id = g.current_user_id
 
     data = request.get_json()
     if not data:
         return jsonify({'message': 'Request body must be JSON'}), 400
 
-    card = next((card for card in user_cards if card['id'] == card_id), None)
+    card = card_store.get(card_id)
 
     if not card:
         return jsonify({'message': 'Card not found'}), 404
@@ -300,243 +610,708 @@ def update_card(card_id):
     if card['user_id'] != current_user_id:
         return jsonify({'message': 'Access forbidden: You do not own this card'}), 403
 
+    changes, error = card_changes(data, datetime.datetime.utcnow())
+    if error:
+        return jsonify({'message': error}), 400
+
     # Validate uniqueness of card_slug if it's being changed
     if 'card_slug' in data and data['card_slug'] != card['card_slug']:
-        if any(c['card_slug'] == data['card_slug'] for c in user_cards):
+        if card_store.slug_exists(data['card_slug']):
             return jsonify({'message': 'Card slug already exists'}), 409
-        card['card_slug'] = data['card_slug']
 
-    # Update fields
-    card['template_id'] = data.get('template_id', card['template_id'])
-    # Validate template_id if it's being changed
-    if 'template_id' in data and not any(t['id'] == card['template_id'] for t in sample_templates):
-        return jsonify({'message': 'Invalid template_id'}), 400
-
-    card['full_name'] = data.get('full_name', card['full_name'])
-    card['company_name'] = data.get('company_name', card['company_name'])
-    card['job_title'] = data.get('job_title', card['job_title'])
-    card['phone_number'] = data.get('phone_number', card['phone_number'])
-    card['email'] = data.get('email', card['email'])
-    card['website_url'] = data.get('website_url', card['website_url'])
-    card['address'] = data.get('address', card['address'])
-    card['social_media_links'] = data.get('social_media_links', card['social_media_links'])
-    card['business_description'] = data.get('business_description', card['business_description'])
-    card['custom_css'] = data.get('custom_css', card['custom_css'])
-    card['is_active'] = data.get('is_active', card['is_active'])
-    card['updated_at'] = datetime.datetime.utcnow()
+    try:
+        card = card_store.update(card_id, changes)
+    except SlugConflictError:
+        return jsonify({'message': 'Card slug already exists'}), 409
+    rendered_cards.invalidate(card_id)
+    public_cards.invalidate(card_id)
+
+    if not card: # Deleted while this request was in flight
+        return jsonify({'message': 'Card not found'}), 404
+    public_cards.forget_missing(card['card_slug']) # Renamed or reactivated
 
     return jsonify(card), 200
 
 @app.route('/cards/<int:card_id>', methods=['DELETE'])
+@login_required
 def delete_card(card_id):
-    global user_cards
-    current_user_id = get_current_user_id_from_token()
-    if not current_user_id:
-        return jsonify({'message': 'Authentication required'}), 401
+    current_user_id = g.current_user_id
 
-    card_index = -1
-    for i, card_item in enumerate(user_cards):
-        if card_item['id'] == card_id:
-            card_index = i
-            break
+    card = card_store.get(card_id)
 
-    if card_index == -1:
+    if not card:
         return jsonify({'message': 'Card not found'}), 404
 
-    if user_cards[card_index]['user_id'] != current_user_id:
+    if card['user_id'] != current_user_id:
         return jsonify({'message': 'Access forbidden: You do not own this card'}), 403
 
-    user_cards.pop(card_index)
+    card_store.delete(card_id)
+    rendered_cards.invalidate(card_id)
+    public_cards.invalidate(card_id)
     return jsonify({'message': 'Card deleted successfully'}), 200 # Or 204 No Content
 
+# Helper function to read a bulk request; returns (cards, atomic, error_response)
+def bulk_cards_payload():
+    data = request.get_json()
+    cards = data.get('cards') if isinstance(data, dict) else None
+    if not isinstance(cards, list):
+        return None, None, ('Request body must be a JSON object with a "cards" array', 400)
+    if len(cards) > app.config['BULK_CARDS_MAX_ITEMS']:
+        return None, None, (f"A request may contain at most {app.config['BULK_CARDS_MAX_ITEMS']} cards", 413)
+    atomic = data.get('atomic', True)
+    if not isinstance(atomic, bool):
+        return None, None, ("'atomic' must be true or false", 400)
+    return cards, atomic, None
+
+def bulk_cards_failure(results):
+    # An atomic batch changed nothing; list the items that stopped it
+    failed = [result for result in results if result is not None]
+    status = 409 if all(result['status'] == 409 for result in failed) else 400
+    return jsonify({'message': 'No cards were changed', 'failed': len(failed), 'results': failed}), status
+
+@app.route('/cards/bulk', methods=['POST'])
+@login_required
+def bulk_create_cards():
+    current_user_id = g.current_user_id
+
+    cards, atomic, error_response = bulk_cards_payload()
+    if error_response:
+        return jsonify({'message': error_response[0]}), error_response[1]
+
+    # Validate every card before touching the store; slugs are then checked
+    # against existing cards and each other in one pass
+    now = datetime.datetime.utcnow()
+    results = [None] * len(cards)
+    valid = [] # (index, fields)
+    for index, item in enumerate(cards):
+        fields, error = new_card_fields(item, now) if isinstance(item, dict) else (None, 'Each card must be a JSON object')
+        if error:
+            results[index] = {'index': index, 'status': 400, 'message': error}
+        else:
+            valid.append((index, fields))
+    if atomic and len(valid) < len(cards):
+        return bulk_cards_failure(results)
+
+    added, conflicts = card_store.bulk_add(current_user_id, [fields for _, fields in valid], atomic=atomic)
+    for position in conflicts:
+        index = valid[position][0]
+        results[index] = {'index': index, 'status': 409, 'message': 'Card slug already exists'}
+    if atomic and conflicts:
+        return bulk_cards_failure(results)
+
+    for position, card in added:
+        index = valid[position][0]
+        public_cards.forget_missing(card['card_slug'])
+        results[index] = {'index': index, 'status': 201, 'card': card}
+    return jsonify({'created': len(added), 'failed': len(cards) - len(added), 'results': results}), 201 if atomic else 200
+
+@app.route('/cards/bulk', methods=['PATCH'])
+@login_required
+def bulk_update_cards():
+    current_user_id = g.current_user_id
+
+    cards, atomic, error_response = bulk_cards_payload()
+    if error_response:
+        return jsonify({'message': error_response[0]}), error_response[1]
+
+    def card_id_of(item):
+        card_id = item.get('id') if isinstance(item, dict) else None
+        return card_id if isinstance(card_id, int) and not isinstance(card_id, bool) else None
+
+    existing = card_store.get_many([card_id for card_id in map(card_id_of, cards) if card_id is not None])
+    now = datetime.datetime.utcnow()
+    results = [None] * len(cards)
+    valid = [] # (index, card_id, changes)
+    seen = set()
+    for index, item in enumerate(cards):
+        card_id = card_id_of(item)
+        card = existing.get(card_id)
+        if card_id is None:
+            error, status = 'Each card must be a JSON object with an integer "id"', 400
+        elif card_id in seen:
+            error, status = 'Card listed more than once', 400
+        elif not card:
+            error, status = 'Card not found', 404
+        elif card['user_id'] != current_user_id:
+            error, status = 'Access forbidden: You do not own this card', 403
+        else:
+            changes, error = card_changes(item, now)
+            status = 400
+        seen.add(card_id)
+        if error:
+            results[index] = {'index': index, 'status': status, 'message': error}
+        else:
+            valid.append((index, card_id, changes))
+    if atomic and len(valid) < len(cards):
+        return bulk_cards_failure(results)
+
+    updated, conflicts, missing = card_store.bulk_update(
+        [(card_id, changes) for _, card_id, changes in valid], atomic=atomic,
+    )
+    for position in conflicts:
+        index = valid[position][0]
+        results[index] = {'index': index, 'status': 409, 'message': 'Card slug already exists'}
+    for position in missing: # Deleted while this request was in flight
+        index = valid[position][0]
+        results[index] = {'index': index, 'status': 404, 'message': 'Card not found'}
+    if atomic and (conflicts or missing):
+        return bulk_cards_failure(results)
+
+    for position, card in updated:
+        index = valid[position][0]
+        rendered_cards.invalidate(card['id'])
+        public_cards.invalidate(card['id'])
+        public_cards.forget_missing(card['card_slug']) # Renamed or reactivated
+        results[index] = {'index': index, 'status': 200, 'card': card}
+    return jsonify({'updated': len(updated), 'failed': len(cards) - len(updated), 'results': results}), 200
+
 @app.route('/cards/public/<string:card_slug>', methods=['GET'])
 def get_public_card_by_slug(card_slug):
-    card = next((card for card in user_cards if card['card_slug'] == card_slug and card['is_active']), None)
+    # Slugs that recently matched no active card skip the lookup
+    if public_cards.is_missing(card_slug):
+        return jsonify({'message': 'Card not found or not active'}), 404
+
+    card = get_card_by_slug(card_slug)
 
     if not card:
+        public_cards.remember_missing(card_slug)
         return jsonify({'message': 'Card not found or not active'}), 404
 
-    # For public view, we might want to filter out some sensitive data,
-    # but for now, returning all card data.
-    # Example:
-    # public_card_data = {k: v for k, v in card.items() if k not in ['user_id', 'custom_css']}
-    return jsonify(card), 200
+    # Browsers (or ?format=html) get the card rendered server-side
+    if wants_html():
+        return render_public_card(card)
+
+    return public_card_response(public_cards.get_or_build(card))
+
+def public_card_response(entry):
+    # The public fields only, as bytes serialized (and gzipped) once per
+    # version of the card. Headers are set in one go rather than through
+    # make_conditional, which costs more than the body on this hot path.
+    body, etag = entry.body, entry.etag
+    headers = {
+        'Vary': 'Accept-Encoding',
+        'Cache-Control': 'no-cache', # Revalidate with If-None-Match on each view
+    }
+    if entry.gzip_body is not None and request.accept_encodings['gzip']:
+        body, etag = entry.gzip_body, f'{etag}-gzip' # A strong ETag is per encoding
+        headers['Content-Encoding'] = 'gzip'
+    headers['ETag'] = f'"{etag}"'
+    if request.if_none_match.contains_weak(etag):
+        return Response(status=304, headers=headers)
+    return Response(body, headers=headers, mimetype='application/json')
+
+def wants_html():
+    if request.args.get('format') == 'html':
+        return True
+    if 'html' not in request.headers.get('Accept', ''):
+        return False # Skip parsing the header for API clients
+    best = request.accept_mimetypes.best_match(['application/json', 'text/html'])
+    return best == 'text/html' and request.accept_mimetypes[best] > request.accept_mimetypes['application/json']
+
+def render_public_card(card):
+    template = templates_by_id.get(card['template_id'])
+    if not template:
+        return jsonify({'message': 'Card template not found'}), 404
+
+    rendered = rendered_cards.get_or_render(card, template_compiler.get(template))
+    response = Response(rendered.body, mimetype='text/html')
+    response.set_etag(rendered.etag)
+    response.headers['Cache-Control'] = 'no-cache' # Revalidate with If-None-Match on each view
+    return response.make_conditional(request)
 
 # Helper function to get card by slug
 def get_card_by_slug(card_slug):
-    return next((card for card in user_cards if card['card_slug'] == card_slug and card['is_active']), None)
+    card = card_store.get_by_slug(card_slug)
+    if card and card['is_active']:
+        return card
+    return None
 
 # Helper function to get a card and verify ownership
 def get_card_and_verify_ownership(card_id, user_id):
-    card = next((card for card in user_cards if card['id'] == card_id), None)
+    card = card_store.get(card_id)
     if not card:
         return None, ('Card not found', 404)
     if card['user_id'] != user_id:
         return None, ('Access forbidden: You do not own this card', 403)
     return card, None
 
-@app.route('/cards/<string:card_slug>/view', methods=['POST'])
-def record_card_view(card_slug):
-    card = get_card_by_slug(card_slug)
-    if not card:
-        return jsonify({'message': 'Card not found or not active'}), 404
-
-    card_id = card['id']
-    visit_date = datetime.date.today().isoformat() # YYYY-MM-DD
-    
-    # Get and hash IP address
+# Per-request values shared by every tracking event recorded in that request
+def beacon_context():
     visitor_ip = request.remote_addr
-    ip_hash = hashlib.sha256(visitor_ip.encode('utf-8')).hexdigest()
-
-    analytics_visitors.append({
-        'card_id': card_id,
-        'visit_date': visit_date,
-        'visitor_ip_hash': ip_hash,
-        'timestamp': datetime.datetime.utcnow()
-    })
-    # print(f"Recorded view for card {card_id} from IP hash {ip_hash}") # For debugging
-    return jsonify({'message': 'View recorded'}), 200 # Or 204 No Content
+    now = datetime.datetime.utcnow()
+    return {
+        'visitor_ip_hash': hashlib.sha256(visitor_ip.encode('utf-8')).hexdigest(),
+        # YYYY-MM-DD in UTC, the day clicks, messages, appointments and the leaderboards use
+        'visit_date': now.date().isoformat(),
+        'now': now,
+    }
 
-@app.route('/cards/<string:card_slug>/message', methods=['POST'])
-def record_message(card_slug):
-    card = get_card_by_slug(card_slug)
-    if not card:
-        return jsonify({'message': 'Card not found or not active'}), 404
+# Helpers that validate a tracking payload and build the analytics event for it.
+# Each returns (event, None) or (None, error_message).
+def non_string_error(data, fields):
+    # Text fields are stored as they are, so anything else is refused here
+    for field in fields:
+        if data.get(field) is not None and not isinstance(data[field], str):
+            return f'{field} must be a string'
+    return None
+
+def build_view_event(card, data, beacon):
+    return {
+        'card_id': card['id'],
+        'visit_date': beacon['visit_date'],
+        'visitor_ip_hash': beacon['visitor_ip_hash'],
+        'timestamp': beacon['now']
+    }, None
 
-    data = request.get_json()
+def build_message_event(card, data, beacon):
     if not data or not data.get('message_content'):
-        return jsonify({'message': 'Missing message_content in request body'}), 400
-
-    analytics_messages.append({
+        return None, 'Missing message_content in request body'
+    error = non_string_error(data, ('sender_name', 'sender_email', 'message_content'))
+    if error:
+        return None, error
+    return {
         'card_id': card['id'],
         'sender_name': data.get('sender_name'),
         'sender_email': data.get('sender_email'),
         'message_content': data['message_content'],
-        'received_at': datetime.datetime.utcnow()
-    })
-    # print(f"Recorded message for card {card['id']}") # For debugging
-    return jsonify({'message': 'Message recorded'}), 200
+        'received_at': beacon['now']
+    }, None
 
-@app.route('/cards/<string:card_slug>/book-appointment', methods=['POST'])
-def record_appointment(card_slug):
-    card = get_card_by_slug(card_slug)
-    if not card:
-        return jsonify({'message': 'Card not found or not active'}), 404
-
-    data = request.get_json()
+def build_appointment_event(card, data, beacon):
     if not data or not data.get('requester_name') or not data.get('requester_email') or not data.get('proposed_time'):
-        return jsonify({'message': 'Missing requester_name, requester_email, or proposed_time in request body'}), 400
-
-    analytics_appointments.append({
+        return None, 'Missing requester_name, requester_email, or proposed_time in request body'
+    error = non_string_error(data, ('requester_name', 'requester_email', 'proposed_time'))
+    if error:
+        return None, error
+    return {
         'card_id': card['id'],
         'requester_name': data['requester_name'],
         'requester_email': data['requester_email'],
         'proposed_time': data['proposed_time'],
         # 'data': data, # Alternative: store the whole JSON
-        'created_at': datetime.datetime.utcnow()
-    })
-    # print(f"Recorded appointment for card {card['id']}") # For debugging
-    return jsonify({'message': 'Appointment request recorded'}), 200
-
-@app.route('/cards/<string:card_slug>/click-link', methods=['POST'])
-def record_link_click(card_slug):
-    card = get_card_by_slug(card_slug)
-    if not card:
-        return jsonify({'message': 'Card not found or not active'}), 404
+        'created_at': beacon['now']
+    }, None
 
-    data = request.get_json()
+def build_link_click_event(card, data, beacon):
     if not data or not data.get('link_type') or not data.get('link_url'):
-        return jsonify({'message': 'Missing link_type or link_url in request body'}), 400
-
-    analytics_link_clicks.append({
+        return None, 'Missing link_type or link_url in request body'
+    error = non_string_error(data, ('link_type', 'link_url'))
+    if error:
+        return None, error
+    return {
         'card_id': card['id'],
         'link_type': data['link_type'],
         'link_url': data['link_url'],
         # 'data': data, # Alternative if more fields come later
-        'clicked_at': datetime.datetime.utcnow()
-    })
-    # print(f"Recorded link click for card {card['id']}") # For debugging
-    return jsonify({'message': 'Link click recorded'}), 200
+        'clicked_at': beacon['now']
+    }, None
+
+# Event kind -> (event builder, success message)
+BEACON_EVENTS = {
+    'view': (build_view_event, 'View recorded'),
+    'message': (build_message_event, 'Message recorded'),
+    'appointment': (build_appointment_event, 'Appointment request recorded'),
+    'link_click': (build_link_click_event, 'Link click recorded'),
+}
+
+def record_single_beacon(kind, card_slug):
+    card = get_card_by_slug(card_slug)
+    if not card:
+        return jsonify({'message': 'Card not found or not active'}), 404
+
+    data = request.get_json() if kind != 'view' else None
+
+    build_event, success_message = BEACON_EVENTS[kind]
+    event, error = build_event(card, data, beacon_context())
+    if error:
+        return jsonify({'message': error}), 400
+
+    record_event(kind, event)
+    return jsonify({'message': success_message}), 200
+
+@app.route('/cards/<string:card_slug>/view', methods=['POST'])
+def record_card_view(card_slug):
+    return record_single_beacon('view', card_slug) # Or 204 No Content
+
+@app.route('/cards/<string:card_slug>/message', methods=['POST'])
+def record_message(card_slug):
+    return record_single_beacon('message', card_slug)
+
+@app.route('/cards/<string:card_slug>/book-appointment', methods=['POST'])
+def record_appointment(card_slug):
+    return record_single_beacon('appointment', card_slug)
+
+@app.route('/cards/<string:card_slug>/click-link', methods=['POST'])
+def record_link_click(card_slug):
+    return record_single_beacon('link_click', card_slug)
+
+@app.route('/events/batch', methods=['POST'])
+def record_beacon_batch():
+    data = request.get_json()
+    events = data.get('events') if isinstance(data, dict) else None
+    if not isinstance(events, list):
+        return jsonify({'message': 'Request body must be a JSON object with an "events" array'}), 400
+    if len(events) > app.config['BEACON_BATCH_MAX_EVENTS']:
+        return jsonify({'message': f"A batch may contain at most {app.config['BEACON_BATCH_MAX_EVENTS']} events"}), 413
+
+    beacon = beacon_context()
+    cards_by_slug = {} # Each slug is resolved once per batch
+    results = []
+    recorded = 0
+    for index, item in enumerate(events):
+        kind = item.get('type') if isinstance(item, dict) else None
+        if not isinstance(kind, str) or kind not in BEACON_EVENTS:
+            results.append({'index': index, 'status': 400, 'message': 'Event type must be one of: ' + ', '.join(BEACON_EVENTS)})
+            continue
+
+        card_slug = item.get('card_slug')
+        if not isinstance(card_slug, str):
+            results.append({'index': index, 'status': 400, 'message': 'card_slug must be a string'})
+            continue
+        if card_slug not in cards_by_slug:
+            cards_by_slug[card_slug] = get_card_by_slug(card_slug)
+        card = cards_by_slug[card_slug]
+        if not card:
+            results.append({'index': index, 'status': 404, 'message': 'Card not found or not active'})
+            continue
+
+        build_event, success_message = BEACON_EVENTS[kind]
+        event, error = build_event(card, item, beacon)
+        if error:
+            results.append({'index': index, 'status': 400, 'message': error})
+            continue
+
+        record_event(kind, event)
+        recorded += 1
+        results.append({'index': index, 'status': 200, 'message': success_message})
+
+    return jsonify({'recorded': recorded, 'failed': len(events) - recorded, 'results': results}), 200
 
 @app.route('/cards/<int:card_id>/analytics/visitors', methods=['GET'])
+@login_required
 def get_visitor_analytics(card_id):
-    user_id = get_current_user_id_from_token()
-    if not user_id:
-        return jsonify({'message': 'Authentication required'}), 401
+    user_id = g.current_user_id
 
     card, error_response = get_card_and_verify_ownership(card_id, user_id)
     if error_response:
         return jsonify({'message': error_response[0]}), error_response[1]
 
-    card_visits = [v for v in analytics_visitors if v['card_id'] == card_id]
+    date_from, date_to, error = parse_date_range(request.args)
+    if error:
+        return jsonify({'message': error}), 400
 
-    # Process data: group by visit_date and count unique visitor_ip_hash
-    daily_unique_visitors = defaultdict(set)
-    for visit in card_visits:
-        daily_unique_visitors[visit['visit_date']].add(visit['visitor_ip_hash'])
+    interval = request.args.get('interval', 'day')
+    if interval != 'day' and interval not in PERIOD_START:
+        return jsonify({'message': "Invalid 'interval', expected day, week or month"}), 400
 
-    processed_data = []
-    for visit_date, unique_ips in daily_unique_visitors.items():
-        processed_data.append({
-            "date": visit_date,
-            "unique_visitors": len(unique_ips)
-        })
-    
-    # Sort by date (optional, but good for consistency)
-    processed_data.sort(key=lambda x: x['date'])
+    # Unique visitors come pre-aggregated per day and sorted by date; weekly
+    # and monthly totals merge the daily counters of each period
+    if interval == 'day':
+        processed_data = analytics_store.daily_unique_visitors(card_id, date_from, date_to)
+    else:
+        processed_data = analytics_store.unique_visitors_by_period(card_id, interval, date_from, date_to)
 
     return jsonify(processed_data), 200
 
+def analytics_feed_page(kind, card_id):
+    """One newest-first page of a card's feed of ``kind`` events.
+
+    The body is the list of events. When there are older events, the
+    ``X-Next-Cursor`` header carries the cursor to pass back as ``cursor``
+    and ``Link`` the URL of the next page. A request with neither ``limit``
+    nor ``cursor`` gets the whole feed, as clients that do not page expect.
+    """
+    if 'limit' not in request.args and not request.args.get('cursor'):
+        page, _ = analytics_store.feed(kind, card_id, None)
+        return jsonify(page), 200
+
+    max_limit = app.config['ANALYTICS_FEED_MAX_LIMIT']
+    try:
+        limit = int(request.args.get('limit', app.config['ANALYTICS_FEED_DEFAULT_LIMIT']))
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= max_limit:
+        return jsonify({'message': f"'limit' must be an integer between 1 and {max_limit}"}), 400
+
+    before = None
+    if request.args.get('cursor'):
+        before, error = decode_feed_cursor(request.args['cursor'], card_id)
+        if error:
+            return jsonify({'message': error}), 400
+
+    page, next_before = analytics_store.feed(kind, card_id, limit, before)
+    response = jsonify(page)
+    if next_before is not None:
+        cursor = encode_feed_cursor(card_id, next_before)
+        response.headers['X-Next-Cursor'] = cursor
+        response.headers['Link'] = f'<{url_for(request.endpoint, card_id=card_id, limit=limit, cursor=cursor)}>; rel="next"'
+    return response, 200
+
 @app.route('/cards/<int:card_id>/analytics/messages', methods=['GET'])
+@login_required
 def get_message_analytics(card_id):
-    user_id = get_current_user_id_from_token()
-    if not user_id:
-        return jsonify({'message': 'Authentication required'}), 401
+    user_id = g.current_user_id
 
     card, error_response = get_card_and_verify_ownership(card_id, user_id)
     if error_response:
         return jsonify({'message': error_response[0]}), error_response[1]
 
-    card_messages = [m for m in analytics_messages if m['card_id'] == card_id]
-    
-    # Sort by received_at descending (newest first)
-    card_messages.sort(key=lambda x: x['received_at'], reverse=True)
-
-    return jsonify(card_messages), 200
+    return analytics_feed_page('message', card_id)
 
 @app.route('/cards/<int:card_id>/analytics/appointments', methods=['GET'])
+@login_required
 def get_appointment_analytics(card_id):
-    user_id = get_current_user_id_from_token()
-    if not user_id:
-        return jsonify({'message': 'Authentication required'}), 401
+    user_id = g.current_user_id
 
     card, error_response = get_card_and_verify_ownership(card_id, user_id)
     if error_response:
         return jsonify({'message': error_response[0]}), error_response[1]
 
-    card_appointments = [a for a in analytics_appointments if a['card_id'] == card_id]
-    
-    # Sort by created_at descending (newest first)
-    card_appointments.sort(key=lambda x: x['created_at'], reverse=True)
-
-    return jsonify(card_appointments), 200
+    return analytics_feed_page('appointment', card_id)
 
 @app.route('/cards/<int:card_id>/analytics/link_clicks', methods=['GET'])
+@login_required
 def get_link_click_analytics(card_id):
-    user_id = get_current_user_id_from_token()
-    if not user_id:
-        return jsonify({'message': 'Authentication required'}), 401
+    user_id = g.current_user_id
+
+    card, error_response = get_card_and_verify_ownership(card_id, user_id)
+    if error_response:
+        return jsonify({'message': error_response[0]}), error_response[1]
+
+    return analytics_feed_page('link_click', card_id)
+
+@app.route('/cards/<int:card_id>/analytics/link_clicks/summary', methods=['GET'])
+@login_required
+def get_link_click_summary(card_id):
+    user_id = g.current_user_id
 
     card, error_response = get_card_and_verify_ownership(card_id, user_id)
     if error_response:
         return jsonify({'message': error_response[0]}), error_response[1]
 
-    card_link_clicks = [lc for lc in analytics_link_clicks if lc['card_id'] == card_id]
-    
-    # Sort by clicked_at descending (newest first)
-    card_link_clicks.sort(key=lambda x: x['clicked_at'], reverse=True)
+    date_from, date_to, error = parse_date_range(request.args)
+    if error:
+        return jsonify({'message': error}), 400
+
+    top = request.args.get('top')
+    if top is not None:
+        try:
+            top = int(top)
+        except ValueError:
+            top = 0
+        if top < 1:
+            return jsonify({'message': "'top' must be a positive integer"}), 400
+
+    # Served from counters kept up to date as clicks are recorded
+    return jsonify(analytics_store.link_click_summary(card_id, date_from, date_to, top)), 200
+
+# Helper function for endpoints covering several cards: all of the user's
+# cards, or the ones listed in the 'card_ids' query parameter
+def get_requested_cards(user_id):
+    # One ownership check for every card: the caller's own cards
+    cards = card_store.list_for_user(user_id)
+    if not request.args.get('card_ids'):
+        return cards, None
+    try:
+        card_ids = [int(card_id) for card_id in request.args['card_ids'].split(',')]
+    except ValueError:
+        return None, ("'card_ids' must be a comma-separated list of card ids", 400)
+    owned = {card['id']: card for card in cards}
+    for card_id in card_ids:
+        if card_id not in owned:
+            if card_store.get(card_id) is None:
+                return None, (f'Card not found: {card_id}', 404)
+            return None, ('Access forbidden: You do not own this card', 403)
+    return [owned[card_id] for card_id in dict.fromkeys(card_ids)], None
+
+@app.route('/analytics/summary', methods=['GET'])
+@login_required
+def get_dashboard_summary():
+    """Headline analytics for all of the caller's cards, or the ones listed
+    in ``card_ids``, in one request."""
+    user_id = g.current_user_id
+
+    date_from, date_to, error = parse_date_range(request.args)
+    if error:
+        return jsonify({'message': error}), 400
+
+    cards, error_response = get_requested_cards(user_id)
+    if error_response:
+        return jsonify({'message': error_response[0]}), error_response[1]
+
+    summary = analytics_store.dashboard_summary([card['id'] for card in cards], date_from, date_to)
+
+    totals = {'unique_visitors': 0, 'messages': 0, 'appointments': 0, 'link_clicks': 0, 'link_clicks_by_type': {}}
+    card_summaries = []
+    for card in cards:
+        numbers = summary[card['id']]
+        link_clicks = sum(numbers['link_clicks_by_type'].values())
+        card_summaries.append({
+            'card_id': card['id'],
+            'card_slug': card['card_slug'],
+            'full_name': card['full_name'],
+            'unique_visitors': numbers['unique_visitors'],
+            'messages': numbers['messages'],
+            'appointments': numbers['appointments'],
+            'link_clicks': link_clicks,
+            'link_clicks_by_type': numbers['link_clicks_by_type'],
+        })
+        totals['unique_visitors'] += numbers['unique_visitors']
+        totals['messages'] += numbers['messages']
+        totals['appointments'] += numbers['appointments']
+        totals['link_clicks'] += link_clicks
+        for link_type, clicks in numbers['link_clicks_by_type'].items():
+            totals['link_clicks_by_type'][link_type] = totals['link_clicks_by_type'].get(link_type, 0) + clicks
+
+    return jsonify({'from': date_from, 'to': date_to, 'cards': card_summaries, 'totals': totals}), 200
+
+def analytics_export_response(export_type, card_ids, filename):
+    """Stream an export of ``export_type`` rows for the given cards as
+    NDJSON (default) or CSV, as chosen by the ``format`` query parameter.
+
+    The body is generated while it is sent, with chunked transfer encoding,
+    so memory use does not depend on the size of the export.
+    """
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_MIMETYPES:
+        return jsonify({'message': "Invalid 'format', expected ndjson or csv"}), 400
+
+    date_from, date_to, error = parse_date_range(request.args)
+    if error:
+        return jsonify({'message': error}), 400
+
+    rows = export_rows(analytics_store, export_type, card_ids, date_from, date_to)
+    if export_format == 'csv':
+        body = encode_csv(rows, export_fields(export_type))
+    else:
+        body = encode_ndjson(rows)
+    response = Response(body, mimetype=EXPORT_MIMETYPES[export_format])
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    return response
+
+@app.route('/cards/<int:card_id>/analytics/<any(visitors, messages, appointments, link_clicks):export_type>/export', methods=['GET'])
+@login_required
+def export_card_analytics(card_id, export_type):
+    user_id = g.current_user_id
+
+    card, error_response = get_card_and_verify_ownership(card_id, user_id)
+    if error_response:
+        return jsonify({'message': error_response[0]}), error_response[1]
+
+    return analytics_export_response(export_type, [card_id], f'card-{card_id}-{export_type}')
+
+@app.route('/analytics/<any(visitors, messages, appointments, link_clicks):export_type>/export', methods=['GET'])
+@login_required
+def export_user_analytics(export_type):
+    """Export for all of the caller's cards, or the ones listed in ``card_ids``."""
+    user_id = g.current_user_id
+
+    cards, error_response = get_requested_cards(user_id)
+    if error_response:
+        return jsonify({'message': error_response[0]}), error_response[1]
+
+    return analytics_export_response(export_type, [card['id'] for card in cards], export_type)
+
+# Helper function to read the 'window' and 'limit' of a leaderboard request;
+# returns (window, limit, error_message)
+def leaderboard_args():
+    window = request.args.get('window', 'week')
+    if window not in LEADERBOARD_WINDOWS:
+        return None, None, f"Invalid 'window', expected {', '.join(LEADERBOARD_WINDOWS)}"
+    max_limit = app.config['LEADERBOARD_MAX_LIMIT']
+    try:
+        limit = int(request.args.get('limit', app.config['LEADERBOARD_DEFAULT_LIMIT']))
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= max_limit:
+        return None, None, f"'limit' must be an integer between 1 and {max_limit}"
+    return window, limit, None
+
+def leaderboard_entries(ranked):
+    """Ranked ``(card_id, count)`` pairs with each card's slug, name and
+    owner; cards deleted since their events were recorded are left out."""
+    cards = card_store.get_many([card_id for card_id, _ in ranked])
+    entries = []
+    for card_id, count in ranked:
+        card = cards.get(card_id)
+        if card is None:
+            continue
+        entries.append({
+            'rank': len(entries) + 1,
+            'card_id': card_id,
+            'card_slug': card['card_slug'],
+            'full_name': card['full_name'],
+            'user_id': card['user_id'],
+            'count': count,
+        })
+    return entries
+
+@app.route('/admin/analytics/top-cards', methods=['GET'])
+@admin_required
+def get_top_cards():
+    """The cards with the highest count of one metric over a rolling
+    window, across all users. Served from leaderboards kept up to date as
+    events are recorded."""
+    metric = request.args.get('metric', 'unique_visitors')
+    if metric not in LEADERBOARD_METRICS:
+        return jsonify({'message': f"Invalid 'metric', expected {', '.join(LEADERBOARD_METRICS)}"}), 400
+    window, limit, error = leaderboard_args()
+    if error:
+        return jsonify({'message': error}), 400
+
+    date_from, date_to, ranked = analytics_store.top_cards(metric, window, limit)
+    return jsonify({
+        'metric': metric,
+        'window': window,
+        'from': date_from,
+        'to': date_to,
+        'cards': leaderboard_entries(ranked),
+    }), 200
+
+@app.route('/admin/analytics/leaderboards', methods=['GET'])
+@admin_required
+def get_leaderboards():
+    """The top cards by every metric over one rolling window."""
+    window, limit, error = leaderboard_args()
+    if error:
+        return jsonify({'message': error}), 400
+
+    leaderboards = {}
+    for metric in LEADERBOARD_METRICS:
+        date_from, date_to, ranked = analytics_store.top_cards(metric, window, limit)
+        leaderboards[metric] = leaderboard_entries(ranked)
+    return jsonify({'window': window, 'from': date_from, 'to': date_to, 'leaderboards': leaderboards}), 200
+
+def store_size_metrics():
+    cache_entries = {
+        ('public_cards',): len(public_cards),
+        ('rendered_cards',): len(rendered_cards),
+        ('verified_tokens',): len(token_cache),
+    }
+    return (
+        format_metric('cardify_users', 'gauge', 'Users in the user store', {(): len(user_store)})
+        + format_metric('cardify_cards', 'gauge', 'Cards in the card store', {(): len(card_store)})
+        + format_metric(
+            'cardify_analytics_rows', 'gauge', 'Raw analytics rows stored, by event kind',
+            {(kind,): count for kind, count in analytics_store.row_counts().items()}, ('kind',),
+        )
+        + format_metric(
+            'cardify_cache_entries', 'gauge', 'Entries in the in-process caches of this process',
+            cache_entries, ('cache',),
+        )
+    )
+
+def get_metrics():
+    token = app.config['METRICS_TOKEN']
+    if token and not hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode()):
+        return jsonify({'message': 'Authentication required'}), 401
+    body = request_metrics.render() + analytics_events_recorded.render() + store_size_metrics()
+    return Response(body, content_type=PROMETHEUS_CONTENT_TYPE)
 
-    return jsonify(card_link_clicks), 200
+# Every request is timed and labelled with its URL rule by WSGI middleware
+if app.config['METRICS_ENABLED']:
+    app.add_url_rule('/metrics', 'get_metrics', get_metrics, methods=['GET'])
+    app.wsgi_app = MetricsMiddleware(app.wsgi_app, request_metrics, slow_request_profiler)
 
 if __name__ == '__main__':
     # For development, Flask's built-in server is fine.
@@ -0,0 +1,98 @@
+"""Memory per analytics event: one dict per event versus the columnar store.
+
+Run from the backend directory:
+
+    python benchmarks/bench_analytics_memory.py
+    python benchmarks/bench_analytics_memory.py --events 1000000 --dict-events 100000
+
+For view and link click events (the high-volume kinds), builds ``--events``
+events in a ``columnar.EventColumns`` table, and ``--dict-events`` events as
+the dicts the tracking endpoints create, kept in a list as the analytics
+store used to. Reports the bytes per event of each: the dicts are measured
+with tracemalloc, the columnar table by the allocated size of its columns
+and interned strings. The dict cost per event does not depend on how many
+there are, so it is measured on fewer events by default: 10M views as dicts
+need more than 4 GB.
+"""
+import argparse
+import datetime
+import gc
+import hashlib
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import EVENT_SCHEMAS  # noqa: E402
+from columnar import EventColumns, SymbolTable  # noqa: E402
+
+STARTED = datetime.datetime(2024, 1, 1)
+LINK_TYPES = ('social', 'website', 'email', 'phone', 'qr_scan')
+
+
+def make_event(kind, i):
+    # Fresh objects for every event, as when decoded from a request
+    timestamp = STARTED + datetime.timedelta(seconds=i)
+    if kind == 'view':
+        return {
+            'card_id': i % 1000 + 1,
+            'visit_date': timestamp.strftime('%Y-%m-%d'),
+            'visitor_ip_hash': hashlib.sha256(f'10.{i % 65536}.{i % 251}.1'.encode()).hexdigest(),
+            'timestamp': timestamp,
+        }
+    link = i % 40
+    return {
+        'card_id': i % 1000 + 1,
+        'link_type': LINK_TYPES[link % len(LINK_TYPES)].encode().decode(),
+        'link_url': f'https://example.com/profile/{link}',
+        'clicked_at': timestamp,
+    }
+
+
+def dict_bytes_per_event(kind, count):
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    events = [make_event(kind, i) for i in range(count)]
+    used = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    del events
+    gc.collect()
+    return used / count
+
+
+def columnar_bytes_per_event(kind, count):
+    symbols = SymbolTable()
+    table = EventColumns(EVENT_SCHEMAS[kind], symbols)
+    started = time.perf_counter()
+    for i in range(count):
+        table.append(make_event(kind, i))
+    elapsed = time.perf_counter() - started
+
+    used = sys.getsizeof(table)
+    for _, column in table._columns:
+        used += sys.getsizeof(column.values)
+        if isinstance(column.values, list):
+            used += sum(sys.getsizeof(value) for value in column.values)
+    used += sys.getsizeof(symbols._ids) + sys.getsizeof(symbols._values)
+    used += sum(sys.getsizeof(value) for value in symbols._values)
+    return used / count, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=10_000_000)
+    parser.add_argument('--dict-events', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    print(f'{"kind":>10} {"dicts B/event":>14} {"columnar B/event":>17} {"ratio":>6}')
+    for kind in ('view', 'link_click'):
+        dict_bytes = dict_bytes_per_event(kind, args.dict_events)
+        column_bytes, elapsed = columnar_bytes_per_event(kind, args.events)
+        print(f'{kind:>10} {dict_bytes:>14,.1f} {column_bytes:>17,.1f} {dict_bytes / column_bytes:>5.1f}x'
+              f'   ({args.dict_events:,} dicts, {args.events:,} columnar events appended in {elapsed:.0f}s)')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Per-request cost of JWT authentication with and without the token cache.
+
+Run from the backend directory:
+
+    python benchmarks/bench_auth.py
+    python benchmarks/bench_auth.py --iterations 50000
+
+Reports the mean cost of resolving the current user from an
+``Authorization: Bearer`` header inside a request context (the work every
+authenticated endpoint does), and of a full GET /cards round trip through
+the Flask test client, first with the verified-token cache disabled and
+then with it enabled.
+"""
+import argparse
+import datetime
+import os
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jwt  # noqa: E402
+
+import app as cardify  # noqa: E402
+
+warnings.filterwarnings('ignore', module='jwt')
+
+
+def make_token():
+    payload = {
+        'identity': 1,
+        'username': 'bench',
+        'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=1),
+    }
+    return jwt.encode(payload, cardify.app.config['SECRET_KEY'], algorithm=cardify.app.config['JWT_ALGORITHM'])
+
+
+def bench_resolve(headers, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        with cardify.app.test_request_context('/cards', headers=headers):
+            assert cardify.get_current_user_id_from_token() == 1
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def bench_context_only(headers, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        with cardify.app.test_request_context('/cards', headers=headers):
+            pass
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def bench_http(headers, iterations):
+    client = cardify.app.test_client()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        assert client.get('/cards', headers=headers).status_code == 200
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args()
+
+    headers = {'Authorization': f'Bearer {make_token()}'}
+    baseline = bench_context_only(headers, args.iterations)
+    cache = cardify.token_cache
+    for label, max_entries in (('uncached', 0), ('cached', 10000)):
+        cache.max_entries = max_entries
+        cache.clear()
+        resolve_us = bench_resolve(headers, args.iterations) - baseline
+        http_us = bench_http(headers, args.iterations // 4)
+        print(f'{label:>9}: auth {resolve_us:6.1f} us/request   GET /cards {http_us:6.1f} us/request')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""Load benchmark: single-event beacons vs POST /events/batch.
+
+Run from the backend directory:
+
+    python benchmarks/bench_beacons.py
+    python benchmarks/bench_beacons.py --events 20000 --batch-sizes 10 50 200 --concurrency 8
+
+Starts the app on a local threaded WSGI server and sends the same mix of
+view / link-click / message events (spread over several cards) from
+``--concurrency`` client threads, first one event per POST to the
+per-type endpoints, then in batches. Reports events/sec for each mode.
+Use ``--client test`` to go through Flask's test client instead, which
+leaves out socket and HTTP parsing overhead.
+"""
+import argparse
+import datetime
+import http.client
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.serving import make_server  # noqa: E402
+
+import app as cardify  # noqa: E402
+
+CARDS = 50
+
+SINGLE_ROUTES = {
+    'view': '/cards/{slug}/view',
+    'link_click': '/cards/{slug}/click-link',
+    'message': '/cards/{slug}/message',
+}
+
+
+def make_events(count):
+    events = []
+    for i in range(count):
+        slug = f'beacon-card-{i % CARDS}'
+        if i % 10 < 7:
+            events.append({'type': 'view', 'card_slug': slug})
+        elif i % 10 < 9:
+            events.append({'type': 'link_click', 'card_slug': slug, 'link_type': 'website', 'link_url': 'https://example.com'})
+        else:
+            events.append({'type': 'message', 'card_slug': slug, 'message_content': 'Hello!'})
+    return events
+
+
+def seed_cards():
+    now = datetime.datetime.utcnow()
+    for i in range(CARDS):
+        slug = f'beacon-card-{i}'
+        if not cardify.card_store.slug_exists(slug):
+            cardify.card_store.add(1, {
+                'template_id': 1, 'card_slug': slug, 'full_name': f'Card {i}',
+                'is_active': True, 'created_at': now, 'updated_at': now,
+            })
+
+
+def single_requests(events):
+    for event in events:
+        body = {k: v for k, v in event.items() if k not in ('type', 'card_slug')}
+        yield SINGLE_ROUTES[event['type']].format(slug=event['card_slug']), body or None
+
+
+def batch_requests(events, batch_size):
+    for start in range(0, len(events), batch_size):
+        yield '/events/batch', {'events': events[start:start + batch_size]}
+
+
+class HttpClient:
+    def __init__(self, port):
+        self.connection = http.client.HTTPConnection('127.0.0.1', port)
+
+    def post(self, path, body):
+        headers = {}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        self.connection.request('POST', path, body=payload, headers=headers)
+        response = self.connection.getresponse()
+        response.read()
+        if response.will_close:
+            self.connection.close()
+        return response.status
+
+
+class TestClient:
+    def __init__(self):
+        self.client = cardify.app.test_client()
+
+    def post(self, path, body):
+        return self.client.post(path, json=body).status_code
+
+
+def run_load(make_client, requests, concurrency):
+    requests = list(requests)
+    chunks = [requests[i::concurrency] for i in range(concurrency)]
+    errors = []
+
+    def worker(chunk):
+        client = make_client()
+        for path, body in chunk:
+            status = client.post(path, body)
+            if status != 200:
+                errors.append(status)
+
+    threads = [threading.Thread(target=worker, args=(chunk,)) for chunk in chunks]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    if errors:
+        raise SystemExit(f'{len(errors)} requests failed, e.g. status {errors[0]}')
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=5000)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[10, 50, 200])
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--client', choices=['http', 'test'], default='http')
+    args = parser.parse_args()
+
+    seed_cards()
+    events = make_events(args.events)
+
+    server = None
+    if args.client == 'http':
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        server = make_server('127.0.0.1', 0, cardify.app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        make_client = lambda: HttpClient(server.server_port)  # noqa: E731
+    else:
+        make_client = TestClient
+
+    try:
+        elapsed = run_load(make_client, single_requests(events), args.concurrency)
+        print(f'{"single":>12}: {len(events) / elapsed:>10,.0f} events/sec  ({len(events)} requests)')
+        for batch_size in args.batch_sizes:
+            requests = list(batch_requests(events, batch_size))
+            elapsed = run_load(make_client, requests, args.concurrency)
+            print(f'{f"batch={batch_size}":>12}: {len(events) / elapsed:>10,.0f} events/sec  ({len(requests)} requests)')
+    finally:
+        if server is not None:
+            server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""Cards/sec of onboarding a team one card per request versus through /cards/bulk.
+
+Run from the backend directory:
+
+    python benchmarks/bench_bulk_cards.py
+    python benchmarks/bench_bulk_cards.py --backend sqlite --cards 1000 5000 10000
+
+For each team size N, creates N cards through the Flask test client with
+N POST /cards requests, then with one POST /cards/bulk (atomic, and with
+per-item results), and updates them with N PUT /cards/<id> requests
+versus one PATCH /cards/bulk that also renames every card. Every run uses
+fresh slugs in the same store, so later runs also check against the
+cards made before them.
+"""
+import argparse
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+warnings.filterwarnings('ignore', module='jwt')
+
+
+def make_token(cardify, user_id):
+    import jwt
+    payload = {
+        'identity': user_id,
+        'username': f'bench{user_id}',
+        'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=1),
+    }
+    return jwt.encode(payload, cardify.app.config['SECRET_KEY'], algorithm=cardify.app.config['JWT_ALGORITHM'])
+
+
+def team(prefix, size):
+    return [{
+        'template_id': n % 3 + 1, 'card_slug': f'{prefix}-{n}', 'full_name': f'Employee {n}',
+        'company_name': 'Example Ltd', 'job_title': 'Engineer', 'email': f'employee{n}@example.com',
+        'social_media_links': {'linkedin': f'https://linkedin.com/in/employee{n}'},
+    } for n in range(size)]
+
+
+def timed(function):
+    started = time.perf_counter()
+    function()
+    return time.perf_counter() - started
+
+
+def expect(response, status):
+    if response.status_code != status:
+        raise SystemExit(f'{response.request.method} {response.request.path} returned {response.status_code}')
+    return response
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backend', choices=['memory', 'sqlite'], default='memory')
+    parser.add_argument('--cards', type=int, nargs='+', default=[100, 1000, 5000])
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix='cardify-bench-')
+    os.environ['CARDIFY_STORAGE_BACKEND'] = args.backend
+    os.environ['CARDIFY_DATABASE_PATH'] = os.path.join(tmpdir, 'cardify.db')
+    os.environ['CARDIFY_BULK_CARDS_MAX_ITEMS'] = str(max(args.cards))
+    import app as cardify
+
+    try:
+        client = cardify.app.test_client()
+        headers = {'Authorization': f'Bearer {make_token(cardify, 1)}'}
+        print(f'{"cards":>7} {"POST each":>12} {"bulk atomic":>12} {"bulk per-item":>14} '
+              f'{"PUT each":>12} {"PATCH bulk":>12}   cards/sec ({args.backend})')
+        for size in args.cards:
+            rates = []
+            for prefix, atomic in (('each', None), ('atomic', True), ('items', False)):
+                cards = team(f'{prefix}-{size}', size)
+                if atomic is None:
+                    def create():
+                        for card in cards:
+                            expect(client.post('/cards', headers=headers, json=card), 201)
+                else:
+                    def create():
+                        expect(client.post('/cards/bulk', headers=headers, json={'cards': cards, 'atomic': atomic}),
+                               201 if atomic else 200)
+                rates.append(size / timed(create))
+
+            ids = [cardify.card_store.get_by_slug(f'each-{size}-{n}')['id'] for n in range(size)]
+
+            def put_each():
+                for n, card_id in enumerate(ids):
+                    expect(client.put(f'/cards/{card_id}', headers=headers, json={'job_title': f'Lead {n}'}), 200)
+
+            def patch_bulk():
+                # Every card takes a new slug too, checked across the batch
+                changes = [{'id': card_id, 'job_title': 'Manager', 'card_slug': f'renamed-{size}-{n}'}
+                           for n, card_id in enumerate(ids)]
+                expect(client.patch('/cards/bulk', headers=headers, json={'cards': changes}), 200)
+
+            rates.append(size / timed(put_each))
+            rates.append(size / timed(patch_bulk))
+            print(f'{size:>7,} {rates[0]:>12,.0f} {rates[1]:>12,.0f} {rates[2]:>14,.0f} {rates[3]:>12,.0f} {rates[4]:>12,.0f}')
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Lookup latency of the indexed card store as the number of cards grows.
+
+Run from the backend directory:
+
+    python benchmarks/bench_card_store.py
+    python benchmarks/bench_card_store.py --sizes 1000 10000 100000 500000
+
+For each size it reports the mean latency of a slug lookup, an id lookup and
+a per-user listing against the store, the same slug lookup done as a linear
+scan over a plain list (the old behaviour), and a full
+GET /cards/public/<slug> round trip through the Flask test client.
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as cardify  # noqa: E402
+from stores import CardStore  # noqa: E402
+
+
+def populate(store, count, users=1000):
+    now = datetime.datetime.utcnow()
+    for i in range(count):
+        store.add(i % users + 1, {
+            'template_id': 1,
+            'card_slug': f'card-{i}',
+            'full_name': f'Person {i}',
+            'is_active': True,
+            'created_at': now,
+            'updated_at': now,
+        })
+
+
+def per_call_us(stmt, number):
+    return min(timeit.repeat(stmt, number=number, repeat=3)) / number * 1e6
+
+
+def run(sizes, lookups):
+    print(f"{'cards':>10} {'slug (us)':>10} {'id (us)':>10} {'user (us)':>10} "
+          f"{'scan (us)':>10} {'http (us)':>10}")
+    for size in sizes:
+        store = CardStore()
+        populate(store, size)
+        slugs = [f'card-{random.randrange(size)}' for _ in range(lookups)]
+        ids = [random.randrange(1, size + 1) for _ in range(lookups)]
+        slug_iter = iter(slugs * 1000)
+        id_iter = iter(ids * 1000)
+
+        slug_us = per_call_us(lambda: store.get_by_slug(next(slug_iter)), lookups)
+        id_us = per_call_us(lambda: store.get(next(id_iter)), lookups)
+        user_us = per_call_us(lambda: store.list_for_user(1), lookups)
+
+        # The pre-index behaviour: a linear scan over a list of cards.
+        flat = list(store)
+
+        def scan(card_slug):
+            return next((c for c in flat if c['card_slug'] == card_slug), None)
+        scan_number = max(1, min(lookups, 2_000_000 // size))
+        scan_us = per_call_us(lambda: scan(next(slug_iter)), scan_number)
+
+        cardify.card_store = store
+        client = cardify.app.test_client()
+        http_number = min(lookups, 2000)
+        http_us = per_call_us(
+            lambda: client.get(f'/cards/public/{next(slug_iter)}'), http_number
+        )
+
+        print(f'{size:>10} {slug_us:>10.2f} {id_us:>10.2f} {user_us:>10.2f} '
+              f'{scan_us:>10.1f} {http_us:>10.1f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000, 300000])
+    parser.add_argument('--lookups', type=int, default=20000)
+    args = parser.parse_args()
+    run(args.sizes, args.lookups)
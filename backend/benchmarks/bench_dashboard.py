@@ -0,0 +1,113 @@
+"""Loading a user's analytics dashboard: per-card requests versus one summary.
+
+Run from the backend directory:
+
+    python benchmarks/bench_dashboard.py
+    python benchmarks/bench_dashboard.py --cards 5 20 100 --events-per-card 2000
+
+Creates a user with N cards, records views, messages, appointment requests
+and link clicks on each, and times loading the dashboard through the Flask
+test client in two ways: the four per-card analytics endpoints for every
+card (4 x N requests), and a single GET /analytics/summary.
+"""
+import argparse
+import datetime
+import hashlib
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+warnings.filterwarnings('ignore', module='jwt')
+
+ENDPOINTS = ('visitors', 'messages', 'appointments', 'link_clicks')
+
+
+def make_token(cardify, user_id):
+    import jwt
+    payload = {
+        'identity': user_id,
+        'username': f'bench{user_id}',
+        'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=1),
+    }
+    return jwt.encode(payload, cardify.app.config['SECRET_KEY'], algorithm=cardify.app.config['JWT_ALGORITHM'])
+
+
+def populate(cardify, user_id, cards, events_per_card, seed=0):
+    rng = random.Random(seed)
+    started = datetime.datetime(2024, 1, 1)
+    card_ids = []
+    for n in range(cards):
+        card = cardify.card_store.add(user_id, {
+            'template_id': 1, 'card_slug': f'bench-{user_id}-{n}', 'full_name': f'Bench {n}', 'is_active': True,
+            'social_media_links': {}, 'created_at': started, 'updated_at': started,
+        })
+        card_ids.append(card['id'])
+        for i in range(events_per_card):
+            now = started + datetime.timedelta(seconds=i * 600)
+            kind = rng.choice(('view', 'view', 'view', 'message', 'appointment', 'link_click', 'link_click'))
+            if kind == 'view':
+                event = {'card_id': card['id'], 'visit_date': now.date().isoformat(),
+                         'visitor_ip_hash': hashlib.sha256(str(rng.randrange(5000)).encode()).hexdigest(),
+                         'timestamp': now}
+            elif kind == 'message':
+                event = {'card_id': card['id'], 'sender_name': 'A', 'sender_email': 'a@example.com',
+                         'message_content': 'Hello', 'received_at': now}
+            elif kind == 'appointment':
+                event = {'card_id': card['id'], 'requester_name': 'A', 'requester_email': 'a@example.com',
+                         'proposed_time': '2024-06-01T10:00', 'created_at': now}
+            else:
+                event = {'card_id': card['id'], 'link_type': rng.choice(('social', 'website')),
+                         'link_url': f'https://example.com/{rng.randrange(10)}', 'clicked_at': now}
+            cardify.record_event(kind, event)
+    cardify.analytics_store.flush()
+    return card_ids
+
+
+def timed(fn, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backend', choices=['memory', 'sqlite'], default='memory')
+    parser.add_argument('--cards', type=int, nargs='+', default=[5, 20, 100])
+    parser.add_argument('--events-per-card', type=int, default=1000)
+    parser.add_argument('--iterations', type=int, default=10)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix='cardify-bench-')
+    os.environ['CARDIFY_STORAGE_BACKEND'] = args.backend
+    os.environ['CARDIFY_DATABASE_PATH'] = os.path.join(tmpdir, 'cardify.db')
+    import app as cardify
+
+    try:
+        client = cardify.app.test_client()
+        print(f'{"cards":>6} {"per-card requests":>18} {"summary":>9}   (milliseconds per dashboard load, {args.backend})')
+        for user_id, cards in enumerate(args.cards, start=1):
+            card_ids = populate(cardify, user_id, cards, args.events_per_card)
+            headers = {'Authorization': f'Bearer {make_token(cardify, user_id)}'}
+
+            def per_card():
+                for card_id in card_ids:
+                    for endpoint in ENDPOINTS:
+                        assert client.get(f'/cards/{card_id}/analytics/{endpoint}', headers=headers).status_code == 200
+
+            def summary():
+                assert client.get('/analytics/summary', headers=headers).status_code == 200
+
+            print(f'{cards:>6} {timed(per_card, args.iterations):>18,.1f} {timed(summary, args.iterations):>9,.1f}')
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Throughput of the durable analytics event log.
+
+Run from the backend directory:
+
+    python benchmarks/bench_event_log.py
+    python benchmarks/bench_event_log.py --events 1000000 --requests 20000
+
+Reports:
+  * raw ``emit`` throughput of the append-only log (events/sec), with the
+    number of fsync'd batches it took,
+  * POST /cards/<slug>/view throughput through the Flask test client with
+    the in-memory sink and with the durable log,
+  * how long replaying and compacting the written log takes.
+"""
+import argparse
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as cardify  # noqa: E402
+from analytics import AnalyticsStore, VisitorRollups, fold_events  # noqa: E402
+from event_log import AppendOnlyLogSink, NullSink  # noqa: E402
+
+
+def view_event(i):
+    return {
+        'card_id': i % 1000 + 1,
+        'visit_date': '2026-01-01',
+        'visitor_ip_hash': f'{i % 50000:064x}',
+        'timestamp': datetime.datetime.utcnow(),
+    }
+
+
+def bench_emit(directory, events):
+    sink = AppendOnlyLogSink(directory, segment_max_bytes=16 * 1024 * 1024)
+    sink.start()
+    fsyncs = 0
+    real_fsync = os.fsync
+
+    def counting_fsync(fd):
+        nonlocal fsyncs
+        fsyncs += 1
+        real_fsync(fd)
+
+    os.fsync = counting_fsync
+    try:
+        started = time.perf_counter()
+        for i in range(events):
+            sink.emit('view', view_event(i))
+        sink.close()
+        elapsed = time.perf_counter() - started
+    finally:
+        os.fsync = real_fsync
+    print(f'emit: {events / elapsed:,.0f} events/sec ({fsyncs} fsyncs for {events:,} events)')
+
+
+def bench_replay_and_compact(directory):
+    store = AnalyticsStore(VisitorRollups())
+    sink = AppendOnlyLogSink(directory, fold=lambda events: fold_events(events, set))
+    started = time.perf_counter()
+    sink.replay(store.apply)
+    print(f'replay: {len(store.visitors):,} events in {time.perf_counter() - started:.2f}s')
+
+    started = time.perf_counter()
+    sink.start()
+    sink.compact()
+    sink.close()
+    print(f'compact: {time.perf_counter() - started:.2f}s')
+
+    store = AnalyticsStore(VisitorRollups())
+    started = time.perf_counter()
+    AppendOnlyLogSink(directory).replay(store.apply)
+    print(f'replay after compaction: {time.perf_counter() - started:.2f}s')
+
+
+def bench_http(directory, requests):
+    now = datetime.datetime.utcnow()
+    cardify.card_store.add(1, {
+        'template_id': 1, 'card_slug': 'bench-card', 'full_name': 'Bench',
+        'is_active': True, 'created_at': now, 'updated_at': now,
+    })
+    client = cardify.app.test_client()
+    for label, sink in (('in-memory', NullSink()), ('durable log', AppendOnlyLogSink(directory))):
+        sink.start()
+        cardify.event_sink = sink
+        started = time.perf_counter()
+        for i in range(requests):
+            client.post('/cards/bench-card/view', environ_base={'REMOTE_ADDR': f'10.0.{i >> 8 & 255}.{i & 255}'})
+        sink.close()
+        elapsed = time.perf_counter() - started
+        print(f'POST /view ({label}): {requests / elapsed:,.0f} requests/sec')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=200000)
+    parser.add_argument('--requests', type=int, default=5000)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='cardify-event-log-')
+    try:
+        bench_emit(os.path.join(directory, 'emit'), args.events)
+        bench_replay_and_compact(os.path.join(directory, 'emit'))
+        bench_http(os.path.join(directory, 'http'), args.requests)
+    finally:
+        shutil.rmtree(directory)
@@ -0,0 +1,116 @@
+"""Exporting a card's messages: streamed NDJSON/CSV versus one JSON list.
+
+Run from the backend directory:
+
+    python benchmarks/bench_export.py
+    python benchmarks/bench_export.py --backend sqlite --messages 10000 100000 1000000
+
+Records N messages on one card, then reads them back through the Flask test
+client without buffering the response: from the streaming export endpoint
+as NDJSON and as CSV, and, for comparison, as the single ``jsonify``-ed list
+the per-type endpoints used to build. Reports the time to the first chunk,
+the total time, and the peak memory allocated while producing the body
+(measured with tracemalloc, which slows every run down by the same factor).
+"""
+import argparse
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+warnings.filterwarnings('ignore', module='jwt')
+
+
+def make_token(cardify, user_id):
+    import jwt
+    payload = {
+        'identity': user_id,
+        'username': f'bench{user_id}',
+        'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=1),
+    }
+    return jwt.encode(payload, cardify.app.config['SECRET_KEY'], algorithm=cardify.app.config['JWT_ALGORITHM'])
+
+
+def populate(cardify, user_id, messages):
+    started = datetime.datetime(2024, 1, 1)
+    card = cardify.card_store.add(user_id, {
+        'template_id': 1, 'card_slug': f'export-{user_id}', 'full_name': 'Export', 'is_active': True,
+        'social_media_links': {}, 'created_at': started, 'updated_at': started,
+    })
+    for i in range(messages):
+        cardify.record_event('message', {
+            'card_id': card['id'], 'sender_name': f'Sender {i}', 'sender_email': f'sender{i}@example.com',
+            'message_content': 'Hello, I would like to talk about your services.',
+            'received_at': started + datetime.timedelta(seconds=i * 60),
+        })
+    cardify.analytics_store.flush()
+    return card['id']
+
+
+def measure(produce):
+    """Time to first chunk, total time and peak traced bytes of a body."""
+    tracemalloc.start()
+    started = time.perf_counter()
+    first = None
+    size = 0
+    for chunk in produce():
+        if first is None:
+            first = time.perf_counter() - started
+        size += len(chunk)
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return first, elapsed, peak, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backend', choices=['memory', 'sqlite'], default='memory')
+    parser.add_argument('--messages', type=int, nargs='+', default=[10_000, 100_000])
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix='cardify-bench-')
+    os.environ['CARDIFY_STORAGE_BACKEND'] = args.backend
+    os.environ['CARDIFY_DATABASE_PATH'] = os.path.join(tmpdir, 'cardify.db')
+    import app as cardify
+    from flask import jsonify
+
+    try:
+        client = cardify.app.test_client()
+        print(f'{"messages":>9} {"mode":>10} {"first chunk ms":>15} {"total s":>8} {"peak MB":>8} {"body MB":>8}'
+              f'   ({args.backend})')
+        for user_id, messages in enumerate(args.messages, start=1):
+            card_id = populate(cardify, user_id, messages)
+            headers = {'Authorization': f'Bearer {make_token(cardify, user_id)}'}
+
+            def streamed(export_format):
+                def produce():
+                    response = client.get(f'/cards/{card_id}/analytics/messages/export?format={export_format}',
+                                          headers=headers, buffered=False)
+                    assert response.status_code == 200
+                    yield from response.response
+                    response.close()
+                return produce
+
+            def one_list():
+                # What the per-type endpoints did before they were paged
+                with cardify.app.app_context():
+                    events = list(cardify.analytics_store.export_events('message', card_id))
+                    yield jsonify(events).get_data()
+
+            for mode, produce in (('ndjson', streamed('ndjson')), ('csv', streamed('csv')), ('json list', one_list)):
+                first, elapsed, peak, size = measure(produce)
+                print(f'{messages:>9,} {mode:>10} {first * 1e3:>15,.1f} {elapsed:>8.2f} {peak / 2**20:>8.1f}'
+                      f' {size / 2**20:>8.1f}')
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Cost of reading a page of a card's message feed as the number of events grows.
+
+Run from the backend directory:
+
+    python benchmarks/bench_feeds.py
+    python benchmarks/bench_feeds.py --sizes 10000 100000 1000000 --cards 100
+
+Spreads N messages over ``--cards`` cards and reports the mean time to read
+the newest page and a page deep into one card's feed, for the in-memory and
+SQLite analytics stores, next to the old approach of filtering every message
+by card and sorting the result.
+"""
+import argparse
+import datetime
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import AnalyticsStore, VisitorRollups  # noqa: E402
+from sqlite_storage import SQLiteAnalyticsStore, SQLiteDatabase  # noqa: E402
+
+
+def make_messages(count, cards):
+    started = datetime.datetime(2024, 1, 1)
+    for i in range(count):
+        yield {
+            'card_id': i % cards + 1,
+            'sender_name': f'Sender {i}',
+            'sender_email': f'sender{i}@example.com',
+            'message_content': 'Hello there',
+            'received_at': started + datetime.timedelta(seconds=i),
+        }
+
+
+def timed(fn, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def deep_cursor(store, limit, pages):
+    before = None
+    for _ in range(pages):
+        _, before = store.feed('message', 1, limit, before)
+    return before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--cards', type=int, default=100)
+    parser.add_argument('--limit', type=int, default=50)
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    print(f'{"messages":>10} {"full scan+sort":>16} {"memory page":>12} {"memory deep":>12} '
+          f'{"sqlite page":>12} {"sqlite deep":>12}   (microseconds per read)')
+    with tempfile.TemporaryDirectory(prefix='cardify-bench-') as tmpdir:
+        for size in args.sizes:
+            messages = list(make_messages(size, args.cards))
+            memory = AnalyticsStore(VisitorRollups())
+            sqlite = SQLiteAnalyticsStore(SQLiteDatabase(os.path.join(tmpdir, f'{size}.db')), batch_size=10000)
+            for message in messages:
+                memory.apply('message', message)
+                sqlite.apply('message', message)
+            sqlite.flush()
+
+            def scan():
+                card_messages = [m for m in messages if m['card_id'] == 1]
+                card_messages.sort(key=lambda m: m['received_at'], reverse=True)
+                return card_messages[:args.limit]
+
+            # A cursor about halfway down card 1's feed
+            pages = max(1, size // args.cards // args.limit // 2)
+            memory_deep = deep_cursor(memory, args.limit, pages)
+            sqlite_deep = deep_cursor(sqlite, args.limit, pages)
+            results = [
+                timed(scan, max(1, args.iterations // 20)),
+                timed(lambda: memory.feed('message', 1, args.limit), args.iterations),
+                timed(lambda: memory.feed('message', 1, args.limit, memory_deep), args.iterations),
+                timed(lambda: sqlite.feed('message', 1, args.limit), args.iterations),
+                timed(lambda: sqlite.feed('message', 1, args.limit, sqlite_deep), args.iterations),
+            ]
+            print(f'{size:>10,} {results[0]:>16,.1f} ' + ' '.join(f'{value:>12,.1f}' for value in results[1:]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Accuracy and memory of approximate unique-visitor counting.
+
+Run from the backend directory:
+
+    python benchmarks/bench_hyperloglog.py
+    python benchmarks/bench_hyperloglog.py --error-rates 0.01 0.02 --max-visitors 100000
+
+Feeds the same synthetic visitor IP hashes into the exact (set based) and
+approximate (HyperLogLog based) visitor rollups, for single days and for
+weekly/monthly totals built by merging daily sketches, and compares the
+counts. Every estimate must lie within three standard errors of the exact
+count; the script exits non-zero if any does not.
+"""
+import argparse
+import datetime
+import hashlib
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import VisitorRollups  # noqa: E402
+from hyperloglog import HyperLogLog  # noqa: E402
+
+START = datetime.date(2026, 1, 5)  # a Monday
+
+
+def ip_hash(n):
+    return hashlib.sha256(f'10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}/{n}'.encode()).hexdigest()
+
+
+def set_bytes(visitors):
+    return sys.getsizeof(visitors) + sum(sys.getsizeof(v) for v in visitors)
+
+
+def sketch_bytes(sketch):
+    if sketch._registers is None:
+        return set_bytes(sketch._sparse)
+    return sys.getsizeof(sketch._registers)
+
+
+def check(label, exact, approx, bound, failures):
+    relative = (approx - exact) / exact if exact else 0.0
+    ok = abs(relative) <= 3 * bound
+    if not ok:
+        failures.append(label)
+    print(f'{label:<34} {exact:>10} {approx:>10} {relative:>+9.3%} {3 * bound:>8.2%}  {"ok" if ok else "FAIL"}')
+
+
+def run(error_rates, max_visitors):
+    failures = []
+    cardinalities = [c for c in (10, 100, 1000, 10000, 100000, 1000000) if c <= max_visitors]
+    print(f"{'case':<34} {'exact':>10} {'approx':>10} {'error':>9} {'bound':>8}")
+    for error_rate in error_rates:
+        bound = HyperLogLog(error_rate).error_rate
+        for card_id, count in enumerate(cardinalities, start=1):
+            exact = VisitorRollups()
+            approx = VisitorRollups(lambda: HyperLogLog(error_rate))
+            # 28 days; each day sees `count` visitors drawn from a pool of
+            # 3 * count, so weekly and monthly totals overlap between days.
+            for day in range(28):
+                visit_date = (START + datetime.timedelta(days=day)).isoformat()
+                first = day * count // 9
+                for n in range(first, first + count):
+                    hashed = ip_hash(n % (3 * count))
+                    exact.record(card_id, visit_date, hashed)
+                    approx.record(card_id, visit_date, hashed)
+
+            day_exact = exact.daily_unique_visitors(card_id)[0]['unique_visitors']
+            day_approx = approx.daily_unique_visitors(card_id)[0]['unique_visitors']
+            check(f'e={error_rate} day n={count}', day_exact, day_approx, bound, failures)
+            for interval in ('week', 'month'):
+                period_exact = exact.unique_visitors_by_period(card_id, interval)[0]['unique_visitors']
+                period_approx = approx.unique_visitors_by_period(card_id, interval)[0]['unique_visitors']
+                check(f'e={error_rate} {interval} n={count}', period_exact, period_approx, bound, failures)
+
+            first_day = START.isoformat()
+            print(f'{"":<34} memory per card-day: exact {set_bytes(exact._daily[card_id][first_day]):,} B, '
+                  f'approx {sketch_bytes(approx._daily[card_id][first_day]):,} B')
+
+    if failures:
+        print(f'{len(failures)} estimate(s) outside the error bound')
+        sys.exit(1)
+    print('all estimates within the configured error bound')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--error-rates', type=float, nargs='+', default=[0.01, 0.02, 0.05])
+    parser.add_argument('--max-visitors', type=int, default=10000)
+    args = parser.parse_args()
+    run(args.error_rates, args.max_visitors)
@@ -0,0 +1,166 @@
+"""Latency of platform-wide top-N card queries from the leaderboards versus grouping every card's data.
+
+Run from the backend directory:
+
+    python benchmarks/bench_leaderboards.py
+    python benchmarks/bench_leaderboards.py --backend sqlite --events 2000000 --cards 200000
+
+Loads ``--events`` events spread over ``--days`` days ending today into a
+fresh analytics store, across ``--cards`` cards with Zipf popularity, then
+times ``top_cards`` for every metric and rolling window. For comparison it
+times what the same answer costs without leaderboards: summing each card's
+daily rollups in memory, or a GROUP BY over the analytics tables in SQLite.
+"""
+import argparse
+import datetime
+import hashlib
+import heapq
+import itertools
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from analytics import AnalyticsStore, VisitorRollups  # noqa: E402
+from leaderboards import LEADERBOARD_METRICS, LEADERBOARD_WINDOWS  # noqa: E402
+from sqlite_storage import SQLiteAnalyticsStore, SQLiteDatabase  # noqa: E402
+
+# Event kind -> share of the events
+EVENT_MIX = {'view': 70, 'link_click': 20, 'message': 7, 'appointment': 3}
+VISITORS_PER_CARD = 200
+
+# Top cards over a window without leaderboards, for the SQLite store
+SQLITE_GROUP_BY = {
+    'unique_visitors': 'SELECT card_id, COUNT(*) AS n FROM analytics_visitors '
+                       'WHERE visit_date >= ? AND visit_date <= ? GROUP BY card_id ORDER BY n DESC, card_id LIMIT ?',
+    'link_clicks': 'SELECT card_id, SUM(clicks) AS n FROM analytics_link_click_counts '
+                   'WHERE click_date >= ? AND click_date <= ? GROUP BY card_id ORDER BY n DESC, card_id LIMIT ?',
+    'messages': 'SELECT card_id, COUNT(*) AS n FROM analytics_messages '
+                'WHERE substr(received_at, 1, 10) BETWEEN ? AND ? GROUP BY card_id ORDER BY n DESC, card_id LIMIT ?',
+    'appointments': 'SELECT card_id, COUNT(*) AS n FROM analytics_appointments '
+                    'WHERE substr(created_at, 1, 10) BETWEEN ? AND ? GROUP BY card_id ORDER BY n DESC, card_id LIMIT ?',
+}
+
+
+def make_event(rng, kind, card_id, now):
+    if kind == 'view':
+        visitor = rng.randrange(VISITORS_PER_CARD)
+        return {
+            'card_id': card_id, 'visit_date': now.date().isoformat(),
+            'visitor_ip_hash': hashlib.sha256(f'{card_id}-{visitor}'.encode()).hexdigest(), 'timestamp': now,
+        }
+    if kind == 'link_click':
+        return {'card_id': card_id, 'link_type': 'website', 'link_url': 'https://example.com', 'clicked_at': now}
+    if kind == 'message':
+        return {
+            'card_id': card_id, 'sender_name': 'Visitor', 'sender_email': 'visitor@example.com',
+            'message_content': 'Hello', 'received_at': now,
+        }
+    return {
+        'card_id': card_id, 'requester_name': 'Visitor', 'requester_email': 'visitor@example.com',
+        'proposed_time': '2024-06-01T10:00', 'created_at': now,
+    }
+
+
+def load(store, args, today):
+    rng = random.Random(args.seed)
+    cumulative = list(itertools.accumulate(1 / rank ** 1.1 for rank in range(1, args.cards + 1)))
+    kinds = list(itertools.chain.from_iterable([kind] * share for kind, share in EVENT_MIX.items()))
+    first = datetime.datetime.combine(datetime.date.fromisoformat(today), datetime.time()) - datetime.timedelta(
+        days=args.days - 1)
+    step = datetime.timedelta(days=args.days) / args.events
+    card_ids = rng.choices(range(1, args.cards + 1), cum_weights=cumulative, k=args.events)
+    for i, card_id in enumerate(card_ids):
+        kind = rng.choice(kinds)
+        store.apply(kind, make_event(rng, kind, card_id, first + step * i))
+        if i % 20000 == 19999:
+            store.flush()
+    store.flush()
+
+
+def rollup_top(store, metric, date_from, date_to, limit, card_count):
+    """Top cards from each card's daily rollups, as a query without the
+    leaderboards would have to find them."""
+    if metric == 'unique_visitors':
+        def count(card_id):
+            return sum(day['unique_visitors'] for day in store.daily_unique_visitors(card_id, date_from, date_to))
+    elif metric == 'link_clicks':
+        def count(card_id):
+            return sum(store.link_click_counters.clicks_by_type(card_id, date_from, date_to).values())
+    else:
+        counts = store.message_counts if metric == 'messages' else store.appointment_counts
+
+        def count(card_id):
+            return counts.total(card_id, date_from, date_to)
+    totals = ((card_id, count(card_id)) for card_id in range(1, card_count + 1))
+    return heapq.nlargest(limit, (item for item in totals if item[1]), key=lambda item: item[1])
+
+
+def timed(function, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - started)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backend', choices=['memory', 'sqlite'], default='memory')
+    parser.add_argument('--events', type=int, default=1000000)
+    parser.add_argument('--cards', type=int, default=100000)
+    parser.add_argument('--days', type=int, default=45, help='days the events are spread over, ending today')
+    parser.add_argument('--limit', type=int, default=100, help='cards per leaderboard')
+    parser.add_argument('--queries', type=int, default=20, help='timed queries per metric and window')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    today = datetime.datetime.utcnow().date().isoformat()
+    tmpdir = tempfile.mkdtemp(prefix='cardify-bench-')
+    if args.backend == 'sqlite':
+        store = SQLiteAnalyticsStore(SQLiteDatabase(os.path.join(tmpdir, 'cardify.db')), batch_size=20000)
+    else:
+        store = AnalyticsStore(VisitorRollups())
+
+    try:
+        started = time.perf_counter()
+        load(store, args, today)
+        seconds = time.perf_counter() - started
+        print(f'{args.events:,} events on {args.cards:,} cards over {args.days} days loaded in {seconds:.1f}s'
+              f' ({args.events / seconds:,.0f} events/s, {args.backend})')
+
+        print(f'{"metric":<16} {"window":<7} {"top p50 ms":>11} {"top max ms":>11} {"without ms":>11}')
+        for metric in LEADERBOARD_METRICS:
+            for window in LEADERBOARD_WINDOWS:
+                date_from, date_to, ranked = store.top_cards(metric, window, args.limit)
+                times = sorted(timed(lambda: store.top_cards(metric, window, args.limit), args.queries))
+                if args.backend == 'sqlite':
+                    connection = store.database.connection()
+
+                    def without():
+                        return connection.execute(
+                            SQLITE_GROUP_BY[metric], (date_from, date_to, args.limit),
+                        ).fetchall()
+                else:
+                    def without():
+                        return rollup_top(store, metric, date_from, date_to, args.limit, args.cards)
+                baseline = statistics.median(timed(without, 3))
+                expected = [count for _, count in without()]
+                if [count for _, count in ranked] != expected:
+                    raise SystemExit(f'{metric} over {window}: leaderboard counts differ from grouping the data')
+                print(f'{metric:<16} {window:<7} {times[len(times) // 2] * 1e3:>11.2f}'
+                      f' {times[-1] * 1e3:>11.2f} {baseline * 1e3:>11.1f}')
+    finally:
+        store.close()
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""Cost of the link click summary as the number of clicks on a card grows.
+
+Run from the backend directory:
+
+    python benchmarks/bench_link_clicks.py
+    python benchmarks/bench_link_clicks.py --sizes 100000 1000000 --links 50 --days 365
+
+Records N clicks on one card, spread over ``--links`` links and ``--days``
+days, and reports the mean time of an all-time summary and a 30-day summary
+(top 10 links) from the in-memory and SQLite analytics stores, next to
+aggregating the raw clicks on every read.
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import AnalyticsStore, VisitorRollups  # noqa: E402
+from sqlite_storage import SQLiteAnalyticsStore, SQLiteDatabase  # noqa: E402
+
+LINK_TYPES = ('social', 'website', 'email', 'phone', 'qr_scan')
+
+
+def make_clicks(count, links, days, seed=0):
+    rng = random.Random(seed)
+    started = datetime.datetime(2024, 1, 1)
+    for i in range(count):
+        link = rng.randrange(links)
+        yield {
+            'card_id': 1,
+            'link_type': LINK_TYPES[link % len(LINK_TYPES)],
+            'link_url': f'https://example.com/link/{link}',
+            'clicked_at': started + datetime.timedelta(seconds=i * days * 86400 // count),
+        }
+
+
+def scan_summary(clicks):
+    by_type = Counter()
+    by_url = Counter()
+    daily = Counter()
+    for click in clicks:
+        if click['card_id'] == 1:
+            by_type[click['link_type']] += 1
+            by_url[click['link_url']] += 1
+            daily[click['clicked_at'].date().isoformat()] += 1
+    return by_type.most_common(10), by_url.most_common(10), sorted(daily.items())
+
+
+def timed(fn, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--links', type=int, default=20)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--iterations', type=int, default=50)
+    args = parser.parse_args()
+
+    print(f'{"clicks":>10} {"raw scan":>10} {"memory all":>11} {"memory 30d":>11} '
+          f'{"sqlite all":>11} {"sqlite 30d":>11}   (milliseconds per summary)')
+    with tempfile.TemporaryDirectory(prefix='cardify-bench-') as tmpdir:
+        for size in args.sizes:
+            clicks = list(make_clicks(size, args.links, args.days))
+            memory = AnalyticsStore(VisitorRollups())
+            sqlite = SQLiteAnalyticsStore(SQLiteDatabase(os.path.join(tmpdir, f'{size}.db')), batch_size=10000)
+            for click in clicks:
+                memory.apply('link_click', click)
+                sqlite.apply('link_click', click)
+            sqlite.flush()
+
+            last_day = clicks[-1]['clicked_at'].date()
+            month = ((last_day - datetime.timedelta(days=29)).isoformat(), last_day.isoformat())
+            assert memory.link_click_summary(1, top=10) == sqlite.link_click_summary(1, top=10)
+            results = [
+                timed(lambda: scan_summary(clicks), max(1, args.iterations // 10)),
+                timed(lambda: memory.link_click_summary(1, top=10), args.iterations),
+                timed(lambda: memory.link_click_summary(1, *month, top=10), args.iterations),
+                timed(lambda: sqlite.link_click_summary(1, top=10), args.iterations),
+                timed(lambda: sqlite.link_click_summary(1, *month, top=10), args.iterations),
+            ]
+            print(f'{size:>10,} {results[0]:>10,.2f} ' + ' '.join(f'{value:>11,.2f}' for value in results[1:]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+"""Public endpoint latency while a login storm runs, with and without the hashing pool.
+
+Run from the backend directory:
+
+    python benchmarks/bench_login_storm.py
+    python benchmarks/bench_login_storm.py --duration 10 --login-threads 32 --workers 4
+
+Starts the app on a local threaded WSGI server, then for ``--duration``
+seconds has ``--login-threads`` clients log in back to back while one more
+client alternates GET /cards/public/<slug> and POST /cards/<slug>/view.
+This is done three times: without logins (baseline), with passwords checked
+on the request threads (``CARDIFY_PASSWORD_HASH_WORKERS=0``), and with the
+worker pool. Reports p50/p99 latency of the public requests, and how many
+logins succeeded or were turned away with 503.
+"""
+import argparse
+import datetime
+import http.client
+import json
+import logging
+import os
+import statistics
+import sys
+import threading
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings('ignore', module='jwt')
+# The benchmark installs its own hashers below
+os.environ['CARDIFY_PASSWORD_HASH_WORKERS'] = '0'
+
+from werkzeug.serving import make_server  # noqa: E402
+
+import app as cardify  # noqa: E402
+from password_hashing import PasswordHasher  # noqa: E402
+
+SLUG = 'storm-card'
+EMAIL = 'storm@example.com'
+PASSWORD = 'correct horse battery staple'
+
+
+def seed(hasher):
+    now = datetime.datetime.utcnow()
+    user = cardify.user_store.add('storm', EMAIL, hasher.hash(PASSWORD), now)
+    cardify.card_store.add(user['id'], {
+        'template_id': 1, 'card_slug': SLUG, 'full_name': 'Storm Card',
+        'is_active': True, 'created_at': now, 'updated_at': now,
+    })
+
+
+class HttpClient:
+    def __init__(self, port):
+        self.connection = http.client.HTTPConnection('127.0.0.1', port)
+
+    def request(self, method, path, body=None):
+        headers = {}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        self.connection.request(method, path, body=payload, headers=headers)
+        response = self.connection.getresponse()
+        response.read()
+        if response.will_close:
+            self.connection.close()
+        return response.status
+
+
+def run(port, duration, login_threads):
+    stop = threading.Event()
+    latencies = []
+    logins = {'ok': 0, 'busy': 0, 'other': 0}
+    lock = threading.Lock()
+
+    def login_client():
+        client = HttpClient(port)
+        while not stop.is_set():
+            status = client.request('POST', '/login', {'email': EMAIL, 'password': PASSWORD})
+            key = 'ok' if status == 200 else 'busy' if status == 503 else 'other'
+            with lock:
+                logins[key] += 1
+
+    def public_client():
+        client = HttpClient(port)
+        requests = [('GET', f'/cards/public/{SLUG}'), ('POST', f'/cards/{SLUG}/view')]
+        i = 0
+        while not stop.is_set():
+            method, path = requests[i % 2]
+            started = time.perf_counter()
+            status = client.request(method, path)
+            latencies.append(time.perf_counter() - started)
+            if status != 200:
+                raise SystemExit(f'{method} {path} returned {status}')
+            i += 1
+
+    threads = [threading.Thread(target=login_client) for _ in range(login_threads)]
+    threads.append(threading.Thread(target=public_client))
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return latencies, logins
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--login-threads', type=int, default=16)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--queue-limit', type=int, default=8)
+    args = parser.parse_args()
+
+    method = cardify.app.config['PASSWORD_HASH_METHOD']
+    inline = PasswordHasher(method=method, workers=0)
+    pool = PasswordHasher(method=method, workers=args.workers, queue_limit=args.queue_limit, timeout=5.0)
+    # Fork the workers before the server thread starts
+    pool.start()
+    seed(inline)
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, cardify.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    modes = [
+        ('no logins', inline, 0),
+        ('inline', inline, args.login_threads),
+        (f'pool={args.workers}', pool, args.login_threads),
+    ]
+    print(f'{"mode":>10} {"public p50 ms":>14} {"public p99 ms":>14} {"requests":>9} {"logins ok":>10} {"logins 503":>11}')
+    try:
+        for name, hasher, login_threads in modes:
+            cardify.password_hasher = hasher
+            latencies, logins = run(server.server_port, args.duration, login_threads)
+            if logins['other']:
+                raise SystemExit(f'{logins["other"]} logins failed with an unexpected status')
+            print(f'{name:>10} {statistics.median(latencies) * 1e3:>14.2f} {percentile(latencies, 0.99) * 1e3:>14.2f}'
+                  f' {len(latencies):>9,} {logins["ok"]:>10,} {logins["busy"]:>11,}')
+    finally:
+        server.shutdown()
+        pool.close()
+
+
+if __name__ == '__main__':
+    main()
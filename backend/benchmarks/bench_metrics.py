@@ -0,0 +1,152 @@
+"""Per-request cost of the request metrics hooks, and the time to serve GET /metrics.
+
+Run from the backend directory:
+
+    python benchmarks/bench_metrics.py
+    python benchmarks/bench_metrics.py --backend sqlite --requests 20000
+
+Calls the WSGI app directly with prepared requests (as
+``bench_public_card.py`` does) for a cached public card, a view beacon and
+an unknown URL, first with the metrics middleware taken off the app and
+then with it in place, with and without the slow-request profiler tracking
+each request, and the middleware on its own around an app that does
+nothing. Then loads ``--cards`` cards and ``--events`` view events and
+times scrapes of ``/metrics``, which count the stores. Each case reports
+the best of ``--rounds`` runs.
+"""
+import argparse
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+warnings.filterwarnings('ignore', module='jwt')
+
+from werkzeug.test import EnvironBuilder  # noqa: E402
+
+from metrics import MetricsMiddleware, RequestMetrics  # noqa: E402
+
+SLUG = 'card-0'
+
+
+def seed(cardify, cards, events):
+    now = datetime.datetime.utcnow()
+    first = len(cardify.card_store)
+    card_ids = [
+        cardify.card_store.add(1, {
+            'template_id': 1, 'card_slug': f'card-{n}', 'full_name': f'Person {n}',
+            'is_active': True, 'created_at': now, 'updated_at': now,
+        })['id']
+        for n in range(first, first + cards)
+    ]
+    for n in range(events):
+        cardify.record_event('view', {
+            'card_id': card_ids[n % cards], 'visit_date': now.date().isoformat(),
+            'visitor_ip_hash': f'{n:064x}', 'timestamp': now,
+        })
+    cardify.analytics_store.flush()
+
+
+def rate(app, method, path, requests, status):
+    environs = [EnvironBuilder(path, method=method, environ_base={'REMOTE_ADDR': '10.0.0.1'}).get_environ()
+                for _ in range(requests)]
+    statuses = []
+
+    def start_response(status_line, response_headers, exc_info=None):
+        statuses.append(status_line)
+
+    started = time.perf_counter()
+    for environ in environs:
+        response = app(environ, start_response)
+        for _ in response:
+            pass
+        response.close()  # Runs the teardown hooks, as a WSGI server does
+    elapsed = time.perf_counter() - started
+    assert all(line.startswith(str(status)) for line in statuses), (path, statuses[0])
+    return requests / elapsed
+
+
+def middleware_cost(profiler, requests):
+    """Microseconds the middleware adds around a WSGI app that does nothing,
+    which is steadier than the difference between two runs of the real app."""
+    def noop_app(environ, start_response):
+        start_response('200 OK', [])
+        return [b'']
+
+    def start_response(status_line, response_headers, exc_info=None):
+        pass
+
+    environ = EnvironBuilder('/').get_environ()
+    timings = []
+    for app in (noop_app, MetricsMiddleware(noop_app, RequestMetrics(), profiler)):
+        started = time.perf_counter()
+        for _ in range(requests):
+            app(environ, start_response)
+        timings.append((time.perf_counter() - started) / requests)
+    return (timings[1] - timings[0]) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backend', choices=['memory', 'sqlite'], default='memory')
+    parser.add_argument('--requests', type=int, default=10000)
+    parser.add_argument('--cards', type=int, default=10000)
+    parser.add_argument('--events', type=int, default=100000)
+    parser.add_argument('--rounds', type=int, default=5, help='best of this many runs per case')
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix='cardify-bench-')
+    os.environ['CARDIFY_STORAGE_BACKEND'] = args.backend
+    os.environ['CARDIFY_DATABASE_PATH'] = os.path.join(tmpdir, 'cardify.db')
+    os.environ['CARDIFY_METRICS_ENABLED'] = '1'
+    # Only requests slower than this are sampled; every request is tracked
+    os.environ['CARDIFY_SLOW_REQUEST_PROFILE_SECONDS'] = '1'
+    import app as cardify
+
+    try:
+        seed(cardify, 1, 0)
+        middleware = cardify.app.wsgi_app
+        profiler = middleware.profiler
+        paths = [
+            ('public card', 'GET', f'/cards/public/{SLUG}', 200),
+            ('view beacon', 'POST', f'/cards/{SLUG}/view', 200),
+            ('unknown URL', 'GET', '/no/such/page', 404),
+        ]
+        modes = [('no metrics', None, None), ('metrics', middleware, None), ('metrics + profiler', middleware, profiler)]
+        print(f'{"requests/sec":>14}' + ''.join(f'{mode:>20}' for mode, _, _ in modes) + f'   ({args.backend})')
+        for name, method, path, status in paths:
+            # Modes take turns in each round, so state that builds up (such
+            # as recorded views) weighs on all of them alike
+            rates = [0] * len(modes)
+            for _ in range(args.rounds):
+                for index, (_, mode_middleware, mode_profiler) in enumerate(modes):
+                    cardify.app.wsgi_app = mode_middleware or middleware.wsgi_app
+                    middleware.profiler = mode_profiler
+                    rates[index] = max(rates[index], rate(cardify.app, method, path, args.requests, status))
+            overhead = (1 / rates[1] - 1 / rates[0]) * 1e6
+            print(f'{name:>14}' + ''.join(f'{value:>20,.0f}' for value in rates) + f'   metrics add {overhead:.1f} us')
+
+        for mode, _, mode_profiler in modes[1:]:
+            cost = min(middleware_cost(mode_profiler, args.requests * 10) for _ in range(args.rounds))
+            print(f'{mode} middleware alone: {cost:.1f} us per request')
+
+        seed(cardify, args.cards, args.events)
+        client = cardify.app.test_client()
+        best = float('inf')
+        for _ in range(max(args.rounds, 5)):
+            started = time.perf_counter()
+            body = client.get('/metrics').get_data()
+            best = min(best, time.perf_counter() - started)
+        print(f'\nGET /metrics with {args.cards:,} cards and {args.events:,} view events: '
+              f'{best * 1e3:.2f} ms, {len(body):,} bytes')
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""Requests/sec of GET /cards/public/<slug> with the cached public projection.
+
+Run from the backend directory:
+
+    python benchmarks/bench_public_card.py
+    python benchmarks/bench_public_card.py --backend sqlite --requests 20000
+
+Creates one card and fetches it repeatedly by calling the WSGI app with a
+prepared request, so the Flask request handling is measured without
+client overhead: the way the endpoint used to answer (look the card up and
+``jsonify`` the whole internal dict on every hit, registered here under a
+benchmark-only route), then the cached public projection as plain JSON,
+gzipped, and as 304 revalidations with If-None-Match. Also times probes
+for slugs that do not exist, first as the old lookup, then with the miss
+cache. Each case reports the best of ``--rounds`` runs.
+"""
+import argparse
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+warnings.filterwarnings('ignore', module='jwt')
+
+from werkzeug.test import EnvironBuilder  # noqa: E402
+
+SLUG = 'hot-card'
+
+
+def seed(cardify):
+    now = datetime.datetime.utcnow()
+    cardify.card_store.add(1, {
+        'template_id': 1, 'card_slug': SLUG, 'full_name': 'Alex Example', 'company_name': 'Example Ltd',
+        'job_title': 'Founder', 'phone_number': '+1 555 0100', 'email': 'alex@example.com',
+        'website_url': 'https://example.com', 'address': '1 Example Street, Springfield',
+        'social_media_links': {'linkedin': 'https://linkedin.com/in/alex', 'twitter': 'https://twitter.com/alex'},
+        'business_description': 'We build example products for example customers. ' * 4,
+        'custom_css': None, 'is_active': True, 'created_at': now, 'updated_at': now,
+    })
+
+
+def add_baseline_route(cardify):
+    def old_public_card(card_slug):
+        card = cardify.get_card_by_slug(card_slug)
+        if not card:
+            return cardify.jsonify({'message': 'Card not found or not active'}), 404
+        if cardify.wants_html():
+            return cardify.render_public_card(card)
+        return cardify.jsonify(card), 200
+
+    cardify.app.add_url_rule('/bench/old-public/<string:card_slug>', 'bench_old_public', old_public_card)
+
+
+def rate(app, path, headers, requests, status):
+    # Unknown slugs vary, as when bots probe them
+    environs = [EnvironBuilder(path.format(i=i), headers=headers).get_environ() for i in range(requests)]
+    statuses = []
+    size = 0
+
+    def start_response(status_line, response_headers):
+        statuses.append(status_line)
+
+    started = time.perf_counter()
+    for environ in environs:
+        for chunk in app(environ, start_response):
+            size += len(chunk)
+    elapsed = time.perf_counter() - started
+    assert all(line.startswith(str(status)) for line in statuses), (path, statuses[0])
+    return requests / elapsed, size // requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backend', choices=['memory', 'sqlite'], default='memory')
+    parser.add_argument('--requests', type=int, default=10000)
+    parser.add_argument('--rounds', type=int, default=3, help='best of this many runs per case')
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix='cardify-bench-')
+    os.environ['CARDIFY_STORAGE_BACKEND'] = args.backend
+    os.environ['CARDIFY_DATABASE_PATH'] = os.path.join(tmpdir, 'cardify.db')
+    import app as cardify
+
+    try:
+        seed(cardify)
+        add_baseline_route(cardify)
+        client = cardify.app.test_client()
+        etag = client.get(f'/cards/public/{SLUG}').headers['ETag']
+        gzip_etag = client.get(f'/cards/public/{SLUG}', headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+        # The miss cache only helps with slugs seen before; warm it for the probes
+        for i in range(args.requests):
+            client.get(f'/cards/public/missing-{i}')
+
+        cases = [
+            ('old: jsonify card', f'/bench/old-public/{SLUG}', {}, 200),
+            ('cached JSON', f'/cards/public/{SLUG}', {}, 200),
+            ('cached gzip', f'/cards/public/{SLUG}', {'Accept-Encoding': 'gzip'}, 200),
+            ('304 revalidation', f'/cards/public/{SLUG}', {'If-None-Match': etag}, 304),
+            ('304 gzip', f'/cards/public/{SLUG}', {'Accept-Encoding': 'gzip', 'If-None-Match': gzip_etag}, 304),
+            ('old: unknown slug', '/bench/old-public/missing-{i}', {}, 404),
+            ('cached miss', '/cards/public/missing-{i}', {}, 404),
+        ]
+        print(f'{"case":>18} {"requests/sec":>13} {"body bytes":>11}   ({args.backend})')
+        for name, path, headers, status in cases:
+            per_second, size = max(rate(cardify.app, path, headers, args.requests, status) for _ in range(args.rounds))
+            print(f'{name:>18} {per_second:>13,.0f} {size:>11,}')
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
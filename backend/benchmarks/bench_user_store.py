@@ -0,0 +1,76 @@
+"""Uniqueness checks and bulk import cost of the indexed user store.
+
+Run from the backend directory:
+
+    python benchmarks/bench_user_store.py
+    python benchmarks/bench_user_store.py --sizes 10000 100000 1000000
+
+For each size it bulk-imports that many users (with ~1% duplicate records
+mixed in) and reports the import throughput, the number of duplicates found,
+and the mean cost of the email/username checks that register() and login()
+perform, next to the old linear scan over ``users.values()``.
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stores import UserStore  # noqa: E402
+
+# Password hashing is deliberately slow and not what is measured here.
+PASSWORD_HASH = 'pbkdf2:sha256:600000$benchmark$0000'
+
+
+def make_records(count):
+    records = [
+        {'username': f'user{i}', 'email': f'user{i}@example.com', 'password_hash': PASSWORD_HASH}
+        for i in range(count)
+    ]
+    for _ in range(count // 100):
+        records.append(dict(random.choice(records)))
+    random.shuffle(records)
+    return records
+
+
+def per_call_us(stmt, number):
+    return min(timeit.repeat(stmt, number=number, repeat=3)) / number * 1e6
+
+
+def run(sizes, lookups):
+    print(f"{'users':>10} {'import/s':>12} {'dupes':>8} {'email (us)':>11} "
+          f"{'username (us)':>14} {'scan (us)':>10}")
+    for size in sizes:
+        store = UserStore(case_insensitive=True)
+        records = make_records(size)
+
+        started = time.perf_counter()
+        imported, duplicates = store.bulk_import(records, datetime.datetime.utcnow())
+        elapsed = time.perf_counter() - started
+
+        emails = iter([f'USER{random.randrange(size)}@example.com' for _ in range(lookups)] * 100)
+        names = iter([f'user{random.randrange(size)}' for _ in range(lookups)] * 100)
+        email_us = per_call_us(lambda: store.get_by_email(next(emails)), lookups)
+        username_us = per_call_us(lambda: store.username_exists(next(names)), lookups)
+
+        # The pre-index behaviour: any(u['email'] == email for u in users.values())
+        users = {u['id']: u for u in imported}
+        scan_number = max(1, min(lookups, 1_000_000 // size))
+        def scan(email):
+            return any(u['email'] == email for u in users.values())
+        scan_us = per_call_us(lambda: scan(next(emails).lower()), scan_number)
+
+        print(f'{size:>10} {len(records) / elapsed:>12,.0f} {len(duplicates):>8} '
+              f'{email_us:>11.2f} {username_us:>14.2f} {scan_us:>10.1f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--lookups', type=int, default=20000)
+    args = parser.parse_args()
+    run(args.sizes, args.lookups)
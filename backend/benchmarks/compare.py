@@ -0,0 +1,94 @@
+"""Compare two benchmark suite result files, or show one file's scaling.
+
+Run from the backend directory:
+
+    python benchmarks/compare.py benchmarks/results/<before>.json benchmarks/results/<after>.json
+    python benchmarks/compare.py before.json after.json --metric p99_ms --threshold 1.5
+    python benchmarks/compare.py benchmarks/results/<run>.json
+
+With two files, prints every scenario and data size found in both with
+the chosen latency metric before and after and their ratio, and exits with
+status 1 if any ratio is above ``--threshold`` (a regression). With one
+file, prints each scenario's metric per data size and how much it grew
+from the smallest size to the largest, next to how much the data grew.
+"""
+import argparse
+import json
+import sys
+
+
+def load(path):
+    with open(path) as f:
+        run = json.load(f)
+    results = {}
+    for result in run['results']:
+        results[(result['scenario'], result['users'], result['cards'], result['events'])] = result
+    return run['meta'], results
+
+
+def size_label(key):
+    _, users, cards, events = key
+    return f'{users}/{cards}/{events}'
+
+
+def compare(before_path, after_path, metric, threshold):
+    before_meta, before = load(before_path)
+    after_meta, after = load(after_path)
+    print(f'{metric}: {before_meta["commit"]} ({before_meta["backend"]}) -> {after_meta["commit"]} ({after_meta["backend"]})')
+    print(f'{"scenario":<30} {"users/cards/events":>20} {"before":>10} {"after":>10} {"ratio":>7}')
+    regressions = 0
+    for key in before:
+        if key not in after:
+            continue
+        old, new = before[key][metric], after[key][metric]
+        ratio = new / old if old else float('inf')
+        flag = ''
+        if ratio > threshold:
+            flag = '  slower'
+            regressions += 1
+        elif ratio < 1 / threshold:
+            flag = '  faster'
+        print(f'{key[0]:<30} {size_label(key):>20} {old:>10.2f} {new:>10.2f} {ratio:>6.2f}x{flag}')
+    missing = sorted(set(before) ^ set(after))
+    if missing:
+        print(f'\n{len(missing)} scenario/size pairs are only in one of the files')
+    if regressions:
+        print(f'\n{regressions} results are more than {threshold}x slower')
+        return 1
+    return 0
+
+
+def scaling(path, metric):
+    meta, results = load(path)
+    sizes = sorted({key[1:] for key in results}, key=lambda size: size[2])
+    print(f'{metric} by users/cards/events ({meta["commit"]}, {meta["backend"]})')
+    print(f'{"scenario":<30}' + ''.join(f'{"/".join(map(str, size)):>20}' for size in sizes) + f'{"growth":>9}')
+    scenarios = dict.fromkeys(key[0] for key in results)
+    for scenario in scenarios:
+        values = [results.get((scenario,) + size, {}).get(metric) for size in sizes]
+        measured = [value for value in values if value is not None]
+        growth = f'{measured[-1] / measured[0]:>8.1f}x' if len(measured) > 1 and measured[0] else f'{"-":>9}'
+        print(f'{scenario:<30}' + ''.join(f'{value:>20.2f}' if value is not None else f'{"-":>20}' for value in values)
+              + growth)
+    if len(sizes) > 1:
+        print(f'\nData grew {sizes[-1][2] / sizes[0][2]:.0f}x in events and {sizes[-1][1] / sizes[0][1]:.0f}x in cards;'
+              ' a growth near 1x means the cost does not depend on the data size.')
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('files', nargs='+', metavar='RESULTS')
+    parser.add_argument('--metric', choices=['mean_ms', 'p50_ms', 'p95_ms', 'p99_ms'], default='p50_ms')
+    parser.add_argument('--threshold', type=float, default=1.25, help='ratio above which a result counts as slower')
+    args = parser.parse_args()
+
+    if len(args.files) == 1:
+        sys.exit(scaling(args.files[0], args.metric))
+    if len(args.files) != 2:
+        parser.error('expected one or two result files')
+    sys.exit(compare(args.files[0], args.files[1], args.metric, args.threshold))
+
+
+if __name__ == '__main__':
+    main()
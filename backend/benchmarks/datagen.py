@@ -0,0 +1,152 @@
+"""Synthetic data set for the benchmark suite: N users, M cards, K events.
+
+Run from the backend directory to time loading a data set on its own:
+
+    python benchmarks/datagen.py
+    python benchmarks/datagen.py --users 1000 --cards 2000 --events 100000 --backend sqlite
+
+``generate`` loads the data into the app's stores through the same
+functions the endpoints use (``bulk_import_users``, ``card_store.add`` and
+``record_event``). Everything is derived from ``seed``, and timestamps come
+from a fixed 90-day window rather than the clock, so the same arguments
+always produce the same data. Card popularity follows a Zipf distribution,
+so a few hot cards get most of the traffic, as on a real deployment.
+"""
+import argparse
+import datetime
+import hashlib
+import itertools
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+warnings.filterwarnings('ignore', module='jwt')
+
+PASSWORD = 'benchmark-password'
+FIRST_DAY = datetime.datetime(2024, 1, 1)
+DAYS = 90
+# Event kind -> share of the events
+EVENT_MIX = {'view': 70, 'link_click': 20, 'message': 7, 'appointment': 3}
+LINKS = [
+    ('website', 'https://example.com'), ('linkedin', 'https://linkedin.com/in/example'),
+    ('twitter', 'https://twitter.com/example'), ('email', 'mailto:hello@example.com'),
+]
+VISITORS_PER_CARD = 500
+
+
+class Dataset:
+    """What ``generate`` created: users (dicts with ``id`` and ``email``,
+    all with password ``PASSWORD``) and cards (dicts with ``id``,
+    ``user_id`` and ``card_slug``), most popular first."""
+
+    def __init__(self, users, cards):
+        self.users = users
+        self.cards = cards
+
+    @property
+    def hot_card(self):
+        return self.cards[0]
+
+    def cards_of(self, user_id):
+        return [card for card in self.cards if card['user_id'] == user_id]
+
+
+def make_token(cardify, user_id):
+    import jwt
+    payload = {
+        'identity': user_id,
+        'username': f'user{user_id}',
+        'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=1),
+    }
+    return jwt.encode(payload, cardify.app.config['SECRET_KEY'], algorithm=cardify.app.config['JWT_ALGORITHM'])
+
+
+def generate(cardify, users, cards, events, seed=0):
+    rng = random.Random(seed)
+    # One hash shared by every user: hashing is deliberately slow
+    password_hash = cardify.password_hasher.hash(PASSWORD)
+    imported, _ = cardify.bulk_import_users(
+        {'username': f'user{n}', 'email': f'user{n}@example.com', 'password_hash': password_hash}
+        for n in range(users)
+    )
+
+    created = []
+    for n in range(cards):
+        owner = imported[n % len(imported)]
+        card = cardify.card_store.add(owner['id'], {
+            'template_id': n % 3 + 1, 'card_slug': f'card-{n}', 'full_name': f'Person {n}',
+            'company_name': f'Company {n % 97}', 'job_title': 'Engineer', 'email': f'person{n}@example.com',
+            'website_url': 'https://example.com', 'social_media_links': {'linkedin': LINKS[1][1]},
+            'business_description': 'We make things. ' * 8, 'is_active': True,
+            'created_at': FIRST_DAY, 'updated_at': FIRST_DAY,
+        })
+        created.append({'id': card['id'], 'user_id': owner['id'], 'card_slug': card['card_slug']})
+
+    # Zipf(1.1) popularity, card 0 the most popular
+    cumulative = list(itertools.accumulate(1 / rank ** 1.1 for rank in range(1, cards + 1)))
+    kinds = list(itertools.chain.from_iterable([kind] * share for kind, share in EVENT_MIX.items()))
+    step = datetime.timedelta(days=DAYS) / max(events, 1)
+    for i in range(events):
+        card = created[rng.choices(range(cards), cum_weights=cumulative)[0]]
+        kind = rng.choice(kinds)
+        now = FIRST_DAY + step * i
+        cardify.record_event(kind, make_event(rng, kind, card['id'], now))
+    cardify.analytics_store.flush()
+    return Dataset(
+        [{'id': user['id'], 'email': user['email']} for user in imported],
+        created,
+    )
+
+
+def make_event(rng, kind, card_id, now):
+    if kind == 'view':
+        visitor = rng.randrange(VISITORS_PER_CARD)
+        return {
+            'card_id': card_id, 'visit_date': now.date().isoformat(),
+            'visitor_ip_hash': hashlib.sha256(f'{card_id}-{visitor}'.encode()).hexdigest(), 'timestamp': now,
+        }
+    if kind == 'link_click':
+        link_type, link_url = rng.choice(LINKS)
+        return {'card_id': card_id, 'link_type': link_type, 'link_url': link_url, 'clicked_at': now}
+    if kind == 'message':
+        return {
+            'card_id': card_id, 'sender_name': 'Visitor', 'sender_email': 'visitor@example.com',
+            'message_content': 'Hello, I would like to get in touch.', 'received_at': now,
+        }
+    return {
+        'card_id': card_id, 'requester_name': 'Visitor', 'requester_email': 'visitor@example.com',
+        'proposed_time': '2024-06-01T10:00', 'created_at': now,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backend', choices=['memory', 'sqlite'], default='memory')
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--cards', type=int, default=200)
+    parser.add_argument('--events', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix='cardify-bench-')
+    os.environ['CARDIFY_STORAGE_BACKEND'] = args.backend
+    os.environ['CARDIFY_DATABASE_PATH'] = os.path.join(tmpdir, 'cardify.db')
+    import app as cardify
+
+    try:
+        started = time.perf_counter()
+        data = generate(cardify, args.users, args.cards, args.events, args.seed)
+        print(f'{len(data.users):,} users, {len(data.cards):,} cards and {args.events:,} events'
+              f' loaded in {time.perf_counter() - started:.1f}s ({args.backend})')
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
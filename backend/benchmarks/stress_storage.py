@@ -0,0 +1,202 @@
+"""Concurrency stress test for the card/user storage backends.
+
+Run from the backend directory:
+
+    python benchmarks/stress_storage.py                               # in-memory store, threads
+    python benchmarks/stress_storage.py --backend sqlite --processes 4   # shared SQLite file, 4 workers
+
+Every worker thread (in every worker process) hammers the API through its
+own Flask test client with a random mix of card creates, updates (including
+slug renames), deletes, public fetches and view beacons. Slugs are drawn
+from a small pool so that conflicting writes are common. Afterwards the
+script checks that:
+
+  * no request failed with a 5xx status,
+  * every slug belongs to exactly one card and the slug index points at it,
+  * card ids are unique and per-user listings match the cards table,
+  * the number of cards equals successful creates minus successful deletes,
+  * every accepted view beacon was recorded (per process in memory, in total
+    with SQLite).
+
+It exits non-zero if any invariant does not hold.
+"""
+import argparse
+import collections
+import datetime
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import warnings
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+warnings.filterwarnings('ignore', module='jwt')
+
+
+def make_token(cardify, user_id):
+    import jwt
+    payload = {
+        'identity': user_id,
+        'username': f'stress{user_id}',
+        'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=1),
+    }
+    return jwt.encode(payload, cardify.app.config['SECRET_KEY'], algorithm=cardify.app.config['JWT_ALGORITHM'])
+
+
+def hammer(cardify, user_id, operations, slug_pool, seed, counts):
+    rng = random.Random(seed)
+    client = cardify.app.test_client()
+    headers = {'Authorization': f'Bearer {make_token(cardify, user_id)}'}
+    my_cards = []
+    for _ in range(operations):
+        op = rng.random()
+        slug = f'slug-{rng.randrange(slug_pool)}'
+        if op < 0.3:
+            response = client.post('/cards', json={'template_id': 1, 'card_slug': slug, 'full_name': 'Stress'}, headers=headers)
+            if response.status_code == 201:
+                my_cards.append(response.get_json()['id'])
+                counts['created'] += 1
+        elif op < 0.5 and my_cards:
+            card_id = rng.choice(my_cards)
+            response = client.put(f'/cards/{card_id}', json={'card_slug': slug, 'job_title': str(rng.random())}, headers=headers)
+        elif op < 0.6 and my_cards:
+            card_id = my_cards.pop(rng.randrange(len(my_cards)))
+            response = client.delete(f'/cards/{card_id}', headers=headers)
+            if response.status_code == 200:
+                counts['deleted'] += 1
+        elif op < 0.8:
+            response = client.get(f'/cards/public/{slug}')
+        else:
+            response = client.post(f'/cards/{slug}/view', environ_base={'REMOTE_ADDR': f'10.0.0.{rng.randrange(255)}'})
+            if response.status_code == 200:
+                counts['views'] += 1
+        counts[f'status_{response.status_code}'] += 1
+
+
+def run_worker(worker_index, threads, operations, slug_pool, result_queue):
+    import app as cardify
+
+    # Switch threads far more often than the default 5ms, to shake out races
+    sys.setswitchinterval(1e-5)
+
+    counts_per_thread = [collections.Counter() for _ in range(threads)]
+    workers = [
+        threading.Thread(
+            target=hammer,
+            args=(cardify, worker_index * threads + i + 1, operations, slug_pool,
+                  worker_index * 1000 + i, counts_per_thread[i]),
+        )
+        for i in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    counts = sum(counts_per_thread, collections.Counter())
+    problems = []
+    cardify.analytics_store.flush()
+    if cardify.app.config['STORAGE_BACKEND'] == 'memory':
+        recorded_views = cardify.analytics_store.view_count()
+        if recorded_views != counts['views']:
+            problems.append(f'worker {worker_index}: {counts["views"]} views accepted but {recorded_views} recorded')
+    if result_queue is None:
+        return counts, problems, cardify
+    result_queue.put((counts, problems))
+
+
+def check_store(card_store, users, counts):
+    problems = []
+    cards = list(card_store)
+    ids = [card['id'] for card in cards]
+    slugs = [card['card_slug'] for card in cards]
+    if len(ids) != len(set(ids)):
+        problems.append('duplicate card ids')
+    if len(slugs) != len(set(slugs)):
+        duplicated = [slug for slug, n in collections.Counter(slugs).items() if n > 1]
+        problems.append(f'duplicate slugs: {duplicated[:5]}')
+    for card in cards:
+        indexed = card_store.get_by_slug(card['card_slug'])
+        if indexed is None or indexed['id'] != card['id']:
+            problems.append(f"slug index for {card['card_slug']!r} does not point at card {card['id']}")
+    listed = sorted(card['id'] for user_id in users for card in card_store.list_for_user(user_id))
+    if listed != sorted(ids):
+        problems.append('per-user listings do not match the set of cards')
+    expected = counts['created'] - counts['deleted']
+    if len(cards) != expected:
+        problems.append(f'{len(cards)} cards stored, expected {expected} (creates - deletes)')
+    if hasattr(card_store, '_by_slug') and len(card_store._by_slug) != len(cards):
+        problems.append('slug index size does not match the number of cards')
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backend', choices=['memory', 'sqlite'], default='memory')
+    parser.add_argument('--processes', type=int, default=1)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--operations', type=int, default=2000, help='requests per thread')
+    parser.add_argument('--slug-pool', type=int, default=200)
+    args = parser.parse_args()
+
+    if args.backend == 'memory' and args.processes > 1:
+        parser.error('the in-memory backend is per process; use --backend sqlite with --processes')
+
+    tmpdir = tempfile.mkdtemp(prefix='cardify-stress-')
+    os.environ['CARDIFY_STORAGE_BACKEND'] = args.backend
+    os.environ['CARDIFY_DATABASE_PATH'] = os.path.join(tmpdir, 'cardify.db')
+    started = time.perf_counter()
+    try:
+        if args.processes == 1:
+            counts, problems, cardify = run_worker(0, args.threads, args.operations, args.slug_pool, None)
+            card_store = cardify.card_store
+            analytics_store = cardify.analytics_store
+        else:
+            context = multiprocessing.get_context('spawn')
+            queue = context.Queue()
+            processes = [
+                context.Process(target=run_worker, args=(i, args.threads, args.operations, args.slug_pool, queue))
+                for i in range(args.processes)
+            ]
+            for process in processes:
+                process.start()
+            results = [queue.get() for _ in processes]
+            for process in processes:
+                process.join()
+            counts = sum((c for c, _ in results), collections.Counter())
+            problems = [p for _, worker_problems in results for p in worker_problems]
+            from sqlite_storage import SQLiteAnalyticsStore, SQLiteCardStore, SQLiteDatabase
+            database = SQLiteDatabase(os.environ['CARDIFY_DATABASE_PATH'])
+            card_store = SQLiteCardStore(database)
+            analytics_store = SQLiteAnalyticsStore(database)
+
+        elapsed = time.perf_counter() - started
+        users = range(1, args.processes * args.threads + 1)
+        problems += check_store(card_store, users, counts)
+        if args.backend == 'sqlite' and analytics_store.view_count() != counts['views']:
+            problems.append(f'{counts["views"]} views accepted but {analytics_store.view_count()} recorded')
+        server_errors = sum(n for key, n in counts.items() if key.startswith('status_5'))
+        if server_errors:
+            problems.append(f'{server_errors} requests failed with a 5xx status')
+    finally:
+        shutil.rmtree(tmpdir)
+
+    total = sum(n for key, n in counts.items() if key.startswith('status_'))
+    statuses = ', '.join(f'{key[7:]}: {n}' for key, n in sorted(counts.items()) if key.startswith('status_'))
+    print(f'{args.backend}, {args.processes} process(es) x {args.threads} threads: '
+          f'{total} requests in {elapsed:.1f}s ({total / elapsed:,.0f}/s)')
+    print(f'statuses {statuses}; created {counts["created"]}, deleted {counts["deleted"]}, views {counts["views"]}')
+    if problems:
+        for problem in problems:
+            print('FAIL:', problem)
+        sys.exit(1)
+    print('all invariants hold')
+
+
+if __name__ == '__main__':
+    main()
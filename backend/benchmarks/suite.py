@@ -0,0 +1,252 @@
+"""Benchmark suite: latency and throughput of the API's hot paths across data sizes.
+
+Run from the backend directory:
+
+    python benchmarks/suite.py
+    python benchmarks/suite.py --backend sqlite --sizes 100:200:10000 1000:2000:100000 10000:20000:1000000
+    python benchmarks/compare.py benchmarks/results/<before>.json benchmarks/results/<after>.json
+
+Each size ``USERS:CARDS:EVENTS`` is loaded with ``datagen.generate`` into a
+fresh app (one subprocess per size), then every scenario sends
+``--requests`` requests through the Flask test client: public card
+fetches, tracking beacons, login, card CRUD and each analytics endpoint.
+Per scenario and size it records the mean, p50, p95 and p99 latency and
+the requests per second of the best of ``--rounds`` rounds.
+
+Results go to a JSON file (by default ``benchmarks/results/<commit>-<backend>.json``)
+together with the commit, Python version and arguments, so runs can be
+compared with ``compare.py``. The table printed at the end shows each
+scenario's p50 per size: a flat row is O(1) in the data size, a row that
+grows with it is O(n).
+"""
+import argparse
+import datetime
+import gc
+import itertools
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, BENCHMARKS_DIR)
+warnings.filterwarnings('ignore', module='jwt')
+
+import datagen  # noqa: E402
+
+DEFAULT_SIZES = ['100:200:10000', '1000:2000:100000']
+
+
+def scenarios(cardify, data):
+    """``(name, request)`` pairs, run in order. ``request(i)`` returns the
+    ``(method, path, options, expected_status)`` of the i-th request."""
+    hot = data.hot_card
+    slugs = [card['card_slug'] for card in data.cards[:10]]
+    owner = {'Authorization': f'Bearer {datagen.make_token(cardify, hot["user_id"])}'}
+    analytics = f'/cards/{hot["id"]}/analytics'
+    beacon = {'environ_base': {'REMOTE_ADDR': '10.1.2.3'}}
+    # Cards made by card_create (warm-up included), later deleted by card_delete
+    created = []
+    numbers = itertools.count()
+
+    def create(i):
+        slug = f'suite-card-{next(numbers)}'
+        created.append(slug)
+        body = {'template_id': 1, 'card_slug': slug, 'full_name': slug}
+        return 'POST', '/cards', {'headers': owner, 'json': body}, 201
+
+    def created_id(i):
+        if not created:  # card_create was left out with --only
+            _, path, options, _ = create(i)
+            cardify.app.test_client().post(path, **options)
+        return cardify.card_store.get_by_slug(created[i % len(created)])['id']
+
+    def delete(i):
+        card_id = created_id(-1)
+        created.pop()
+        return 'DELETE', f'/cards/{card_id}', {'headers': owner}, 200
+
+    return [
+        ('public_card', lambda i: ('GET', f'/cards/public/{slugs[i % len(slugs)]}', {}, 200)),
+        ('public_card_html', lambda i: ('GET', f'/cards/public/{slugs[i % len(slugs)]}?format=html', {}, 200)),
+        ('public_card_missing', lambda i: ('GET', f'/cards/public/missing-{i % 50}', {}, 404)),
+        ('beacon_view', lambda i: ('POST', f'/cards/{slugs[i % len(slugs)]}/view', beacon, 200)),
+        ('beacon_click', lambda i: ('POST', f'/cards/{slugs[i % len(slugs)]}/click-link', dict(
+            beacon, json={'link_type': 'website', 'link_url': 'https://example.com'}), 200)),
+        ('beacon_batch_50', lambda i: ('POST', '/events/batch', dict(beacon, json={'events': [
+            {'type': 'view', 'card_slug': slugs[(i + n) % len(slugs)]} for n in range(50)
+        ]}), 200)),
+        ('login', lambda i: ('POST', '/login', {'json': {
+            'email': data.users[i % len(data.users)]['email'], 'password': datagen.PASSWORD,
+        }}, 200)),
+        ('card_create', create),
+        ('card_get', lambda i: ('GET', f'/cards/{created_id(i)}', {'headers': owner}, 200)),
+        ('card_list', lambda i: ('GET', '/cards', {'headers': owner}, 200)),
+        ('card_update', lambda i: ('PUT', f'/cards/{created_id(i)}', {
+            'headers': owner, 'json': {'job_title': f'Title {i}'}}, 200)),
+        ('card_delete', delete),
+        ('analytics_visitors', lambda i: ('GET', f'{analytics}/visitors', {'headers': owner}, 200)),
+        ('analytics_visitors_month', lambda i: ('GET', f'{analytics}/visitors?interval=month', {'headers': owner}, 200)),
+        ('analytics_messages', lambda i: ('GET', f'{analytics}/messages', {'headers': owner}, 200)),
+        ('analytics_appointments', lambda i: ('GET', f'{analytics}/appointments', {'headers': owner}, 200)),
+        ('analytics_link_clicks', lambda i: ('GET', f'{analytics}/link_clicks', {'headers': owner}, 200)),
+        ('analytics_link_clicks_summary', lambda i: ('GET', f'{analytics}/link_clicks/summary', {'headers': owner}, 200)),
+        ('analytics_summary', lambda i: ('GET', '/analytics/summary', {'headers': owner}, 200)),
+        ('analytics_export_day', lambda i: ('GET', f'{analytics}/messages/export?from=2024-02-01&to=2024-02-01', {
+            'headers': owner}, 200)),
+    ]
+
+
+def run_scenario(client, request, count):
+    latencies = []
+    started = time.perf_counter()
+    for i in range(count):
+        method, path, options, expected = request(i)
+        before = time.perf_counter()
+        response = client.open(path, method=method, **options)
+        response.get_data()
+        latencies.append(time.perf_counter() - before)
+        if response.status_code != expected:
+            raise SystemExit(f'{method} {path} returned {response.status_code}, expected {expected}')
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+
+    def percentile(fraction):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] * 1e3
+
+    return {
+        'requests': count,
+        'mean_ms': statistics.fmean(latencies) * 1e3,
+        'p50_ms': percentile(0.50),
+        'p95_ms': percentile(0.95),
+        'p99_ms': percentile(0.99),
+        'requests_per_sec': count / elapsed,
+    }
+
+
+def run_size(args, size, output):
+    """Load one data size into this process's app and run every scenario."""
+    users, cards, events = (int(part) for part in size.split(':'))
+    tmpdir = tempfile.mkdtemp(prefix='cardify-bench-')
+    os.environ['CARDIFY_STORAGE_BACKEND'] = args.backend
+    os.environ['CARDIFY_DATABASE_PATH'] = os.path.join(tmpdir, 'cardify.db')
+    import app as cardify
+
+    started = time.perf_counter()
+    data = datagen.generate(cardify, users, cards, events, args.seed)
+    load_seconds = time.perf_counter() - started
+    client = cardify.app.test_client()
+    results = []
+    for name, request in scenarios(cardify, data):
+        if args.only and name not in args.only:
+            continue
+        count = args.login_requests if name == 'login' else args.requests
+        run_scenario(client, request, min(count, args.warmup))
+        # Best of several rounds, to filter out noise from the rest of the machine
+        rounds = []
+        for _ in range(args.rounds):
+            gc.collect()
+            rounds.append(run_scenario(client, request, count))
+        result = min(rounds, key=lambda round_result: round_result['p50_ms'])
+        results.append(dict(scenario=name, users=users, cards=cards, events=events, **result))
+        print(f'  {name:<30} p50 {result["p50_ms"]:>8.2f} ms  p99 {result["p99_ms"]:>8.2f} ms'
+              f'  {result["requests_per_sec"]:>8,.0f} req/s', file=sys.stderr)
+    with open(output, 'w') as f:
+        json.dump({'load_seconds': load_seconds, 'results': results}, f)
+    cardify.analytics_store.close()
+    shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def print_scaling(results, sizes):
+    labels = [size.replace(':', '/') for size in sizes]
+    print(f'\n{"p50 ms by users/cards/events":<30}' + ''.join(f'{label:>22}' for label in labels))
+    by_scenario = {}
+    for result in results:
+        key = f'{result["users"]}/{result["cards"]}/{result["events"]}'
+        by_scenario.setdefault(result['scenario'], {})[key] = result['p50_ms']
+    for scenario, values in by_scenario.items():
+        print(f'{scenario:<30}' + ''.join(
+            f'{values[label]:>22.2f}' if label in values else f'{"-":>22}' for label in labels
+        ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backend', choices=['memory', 'sqlite'], default='memory')
+    parser.add_argument('--sizes', nargs='+', default=DEFAULT_SIZES, metavar='USERS:CARDS:EVENTS')
+    parser.add_argument('--requests', type=int, default=200, help='measured requests per scenario')
+    parser.add_argument('--login-requests', type=int, default=20, help='measured logins (each hashes a password)')
+    parser.add_argument('--warmup', type=int, default=20, help='unmeasured requests before each scenario')
+    parser.add_argument('--rounds', type=int, default=3, help='report the round with the lowest p50 of this many')
+    parser.add_argument('--only', nargs='+', metavar='SCENARIO', help='run only these scenarios')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='results file (default benchmarks/results/<commit>-<backend>.json)')
+    parser.add_argument('--run-size', help=argparse.SUPPRESS)
+    parser.add_argument('--size-output', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_size:
+        run_size(args, args.run_size, args.size_output)
+        return
+
+    commit = git_commit()
+    output = args.output or os.path.join(BENCHMARKS_DIR, 'results', f'{commit}-{args.backend}.json')
+    results = []
+    load_seconds = {}
+    for size in args.sizes:
+        print(f'{size} (users:cards:events), {args.backend}', file=sys.stderr)
+        with tempfile.NamedTemporaryFile(suffix='.json') as size_output:
+            # Its own process, so every size starts from empty stores
+            command = [sys.executable, os.path.abspath(__file__), '--run-size', size, '--size-output', size_output.name]
+            for name in ('backend', 'requests', 'login_requests', 'warmup', 'rounds', 'seed'):
+                command += [f'--{name.replace("_", "-")}', str(getattr(args, name))]
+            if args.only:
+                command += ['--only', *args.only]
+            subprocess.run(command, check=True)
+            with open(size_output.name) as f:
+                size_results = json.load(f)
+        results += size_results['results']
+        load_seconds[size] = size_results['load_seconds']
+
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({
+            'meta': {
+                'commit': commit,
+                'created_at': datetime.datetime.utcnow().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpus': os.cpu_count(),
+                'backend': args.backend,
+                'sizes': args.sizes,
+                'requests': args.requests,
+                'login_requests': args.login_requests,
+                'rounds': args.rounds,
+                'seed': args.seed,
+                'load_seconds': load_seconds,
+            },
+            'results': results,
+        }, f, indent=1)
+    print_scaling(results, args.sizes)
+    print(f'\nResults written to {output}')
+
+
+if __name__ == '__main__':
+    main()
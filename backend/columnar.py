@@ -0,0 +1,172 @@
+import datetime
+import threading
+from array import array
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+_MICROSECOND = datetime.timedelta(microseconds=1)
+
+
+class SymbolTable:
+    """Interns repeated strings (link types, URLs, names) as small ints."""
+
+    def __init__(self):
+        self._ids = {}
+        self._values = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._values)
+
+    def id_for(self, value):
+        symbol = self._ids.get(value)
+        if symbol is None:
+            with self._lock:
+                symbol = self._ids.get(value)
+                if symbol is None:
+                    symbol = self._ids[value] = len(self._values)
+                    self._values.append(value)
+        return symbol
+
+    def value(self, symbol):
+        return self._values[symbol]
+
+
+class _Column:
+    """Ints in a packed array; the other column types override the storage
+    and how values are encoded and decoded."""
+
+    def __init__(self, symbols):
+        self.values = array('q')
+
+    def encode(self, value):
+        return value
+
+    def push(self, encoded):
+        self.values.append(encoded)
+
+    def get(self, index):
+        return self.values[index]
+
+
+class _DateColumn(_Column):
+    """``YYYY-MM-DD`` strings as day numbers."""
+
+    def __init__(self, symbols):
+        self.values = array('i')
+
+    def encode(self, value):
+        return datetime.date.fromisoformat(value).toordinal()
+
+    def get(self, index):
+        return datetime.date.fromordinal(self.values[index]).isoformat()
+
+
+class _DatetimeColumn(_Column):
+    """Naive (UTC) datetimes as microseconds since the epoch."""
+
+    def encode(self, value):
+        return (value - _EPOCH) // _MICROSECOND
+
+    def get(self, index):
+        return _EPOCH + datetime.timedelta(microseconds=self.values[index])
+
+
+class _DigestColumn:
+    """SHA-256 hex digests as 32 raw bytes each."""
+
+    width = 32
+
+    def __init__(self, symbols):
+        self.values = bytearray()
+
+    def encode(self, value):
+        digest = bytes.fromhex(value)
+        if len(digest) != self.width:
+            raise ValueError(f'Expected a {self.width}-byte hex digest, got {value!r}')
+        return digest
+
+    def push(self, encoded):
+        self.values += encoded
+
+    def get(self, index):
+        return self.values[index * self.width:(index + 1) * self.width].hex()
+
+
+class _SymbolColumn(_Column):
+    """Repeated strings (or None) as ids in a shared ``SymbolTable``."""
+
+    def __init__(self, symbols):
+        self.symbols = symbols
+        self.values = array('I')
+
+    def encode(self, value):
+        return self.symbols.id_for(value)
+
+    def get(self, index):
+        return self.symbols.value(self.values[index])
+
+
+class _TextColumn(_Column):
+    """Free text, such as message bodies, kept as is."""
+
+    def __init__(self, symbols):
+        self.values = []
+
+    def get(self, index):
+        return self.values[index]
+
+
+COLUMN_TYPES = {
+    'int': _Column,
+    'date': _DateColumn,
+    'datetime': _DatetimeColumn,
+    'digest': _DigestColumn,
+    'symbol': _SymbolColumn,
+    'text': _TextColumn,
+}
+
+
+class EventColumns:
+    """Append-only table of analytics events stored column by column.
+
+    ``schema`` is a sequence of ``(field, column_type)`` pairs, in the key
+    order of the event dicts. Ints, day numbers and timestamps are packed
+    into typed arrays, visitor IP hashes into 32-byte digests and repeated
+    strings into symbol ids, so an event costs tens of bytes instead of a
+    dict with its own keys, ``datetime`` and hex string. Rows are turned back
+    into dicts equal to the ones appended only when they are read.
+
+    Appends and reads take a lock, so a table can be shared between threads.
+    """
+
+    def __init__(self, schema, symbols=None):
+        self.schema = tuple(schema)
+        symbols = symbols if symbols is not None else SymbolTable()
+        self._columns = [(field, COLUMN_TYPES[column_type](symbols)) for field, column_type in self.schema]
+        self._length = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        # Rows appended while iterating are not included
+        length = self._length
+        for start in range(0, length, 1000):
+            yield from self.rows(start, min(start + 1000, length))
+
+    def append(self, event):
+        # Encode every field before storing any, so a bad value cannot leave
+        # the columns with different lengths
+        encoded = [column.encode(event[field]) for field, column in self._columns]
+        with self._lock:
+            for (_, column), value in zip(self._columns, encoded):
+                column.push(value)
+            self._length += 1
+
+    def row(self, index):
+        return {field: column.get(index) for field, column in self._columns}
+
+    def rows(self, start, end):
+        with self._lock:
+            return [self.row(index) for index in range(start, min(end, self._length))]
@@ -0,0 +1,273 @@
+import datetime
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+from analytics import EVENT_TIME_FIELDS
+
+logger = logging.getLogger(__name__)
+
+
+class EventSink:
+    """Destination for recorded analytics events.
+
+    The base class keeps nothing, which is the behaviour when no durable
+    log is configured: events only live in the in-memory analytics store.
+    """
+
+    def start(self):
+        pass
+
+    def emit(self, kind, event):
+        pass
+
+    def replay(self, apply):
+        pass
+
+    def flush(self):
+        pass
+
+    def compact(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class NullSink(EventSink):
+    pass
+
+
+_SEGMENT_RE = re.compile(r'^(segment|compacted)-(\d{10})\.log$')
+
+
+class AppendOnlyLogSink(EventSink):
+    """Durable, segmented, append-only log of analytics events.
+
+    ``emit`` only appends an encoded line to an in-memory buffer. A
+    background writer thread writes the buffer out in one batch and fsyncs
+    it, either every ``flush_interval`` seconds or as soon as ``batch_size``
+    events are waiting, so request threads never touch the disk.
+
+    Events go to ``segment-NNNNNNNNNN.log`` files. The active segment is
+    sealed and a new one started once it reaches ``segment_max_bytes`` or
+    is ``segment_max_age`` seconds old; every process start also begins a
+    new segment so a torn write at the end of an old one is never appended
+    to. ``compact`` folds all sealed segments, together with the previous
+    compacted file, into a single ``compacted-NNNNNNNNNN.log`` (numbered
+    after the last segment it covers) using the ``fold`` callable, and then
+    deletes them. With ``compact_after`` set this happens automatically
+    once that many sealed segments have piled up.
+
+    A log directory must be written by a single process.
+    """
+
+    def __init__(self, directory, fold=None, batch_size=1000, flush_interval=0.2,
+                 segment_max_bytes=64 * 1024 * 1024, segment_max_age=3600, compact_after=None):
+        self.directory = directory
+        self.fold = fold
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.segment_max_bytes = segment_max_bytes
+        self.segment_max_age = segment_max_age
+        self.compact_after = compact_after
+
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._pending = threading.Condition(self._lock)
+        self._buffer = []
+        self._closed = False
+        self._io_lock = threading.Lock()        # guards the active segment
+        self._compact_lock = threading.Lock()
+        self._file = None
+        self._active_seq = None
+        self._segment_bytes = 0
+        self._segment_opened_at = 0.0
+        self._sealed_since_compaction = 0
+        self._thread = None
+
+    # Files
+
+    def _path(self, prefix, seq):
+        return os.path.join(self.directory, f'{prefix}-{seq:010d}.log')
+
+    def _list_files(self):
+        segments, compacted = [], []
+        for name in os.listdir(self.directory):
+            match = _SEGMENT_RE.match(name)
+            if not match:
+                continue
+            entry = (int(match.group(2)), os.path.join(self.directory, name))
+            (segments if match.group(1) == 'segment' else compacted).append(entry)
+        return sorted(segments), sorted(compacted)
+
+    def _open_segment(self, seq):
+        self._file = open(self._path('segment', seq), 'ab')
+        self._active_seq = seq
+        self._segment_bytes = self._file.tell()
+        self._segment_opened_at = time.monotonic()
+
+    def _rotate(self):
+        self._file.close()
+        self._open_segment(self._active_seq + 1)
+        self._sealed_since_compaction += 1
+
+    # Encoding
+
+    @staticmethod
+    def _encode(kind, event):
+        line = json.dumps([kind, event], default=_encode_value, separators=(',', ':'))
+        return line.encode('utf-8') + b'\n'
+
+    @staticmethod
+    def _decode(line):
+        kind, event = json.loads(line)
+        time_field = EVENT_TIME_FIELDS.get(kind)
+        if time_field and event.get(time_field):
+            event[time_field] = datetime.datetime.fromisoformat(event[time_field])
+        return kind, event
+
+    def _read(self, path):
+        with open(path, 'rb') as f:
+            for line_number, line in enumerate(f, start=1):
+                try:
+                    yield self._decode(line)
+                except (ValueError, TypeError):
+                    # Most likely a write torn by a crash at the end of a segment
+                    logger.warning('Skipping unreadable analytics log line %s:%d', path, line_number)
+
+    # Lifecycle
+
+    def replay(self, apply):
+        """Feed every logged event, oldest first, to ``apply(kind, event)``."""
+        segments, compacted = self._list_files()
+        covered = 0
+        if compacted:
+            covered, path = compacted[-1]
+            for kind, event in self._read(path):
+                apply(kind, event)
+        for seq, path in segments:
+            if seq > covered and seq != self._active_seq:
+                for kind, event in self._read(path):
+                    apply(kind, event)
+
+    def start(self):
+        segments, compacted = self._list_files()
+        last_seq = max([seq for seq, _ in segments + compacted], default=0)
+        self._sealed_since_compaction = sum(
+            1 for seq, _ in segments if not compacted or seq > compacted[-1][0]
+        )
+        self._open_segment(last_seq + 1)
+        self._thread = threading.Thread(target=self._run, name='analytics-log-writer', daemon=True)
+        self._thread.start()
+
+    def emit(self, kind, event):
+        line = self._encode(kind, event)
+        with self._lock:
+            self._buffer.append(line)
+            if len(self._buffer) >= self.batch_size:
+                self._pending.notify()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                self._pending.wait_for(
+                    lambda: self._closed or len(self._buffer) >= self.batch_size,
+                    timeout=self.flush_interval,
+                )
+                closed = self._closed
+            try:
+                self.flush()
+                if self.compact_after and self._sealed_since_compaction >= self.compact_after:
+                    self.compact()
+            except Exception:
+                logger.exception('Analytics log writer failed')
+            if closed:
+                return
+
+    def flush(self):
+        with self._lock:
+            lines, self._buffer = self._buffer, []
+        with self._io_lock:
+            if self._file is None:
+                return
+            if lines:
+                data = b''.join(lines)
+                self._file.write(data)
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._segment_bytes += len(data)
+            if self._segment_bytes and (
+                self._segment_bytes >= self.segment_max_bytes
+                or time.monotonic() - self._segment_opened_at >= self.segment_max_age
+            ):
+                self._rotate()
+
+    def compact(self):
+        """Fold sealed segments into a new compacted file and delete them."""
+        if self.fold is None:
+            return
+        with self._compact_lock:
+            segments, compacted = self._list_files()
+            covered = compacted[-1][0] if compacted else 0
+            with self._io_lock:
+                active_seq = self._active_seq
+            sealed = [(seq, path) for seq, path in segments if covered < seq and seq != active_seq]
+            if not sealed:
+                return
+            sources = [path for _, path in compacted[-1:]] + [path for _, path in sealed]
+
+            def events():
+                for path in sources:
+                    yield from self._read(path)
+
+            target = self._path('compacted', sealed[-1][0])
+            tmp_path = target + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                for kind, event in self.fold(events()):
+                    f.write(self._encode(kind, event))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, target)
+            _fsync_directory(self.directory)
+
+            for _, path in compacted + sealed + [(seq, path) for seq, path in segments if seq <= covered]:
+                if path != target:
+                    os.remove(path)
+            self._sealed_since_compaction = max(0, self._sealed_since_compaction - len(sealed))
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._pending.notify()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+        with self._io_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                if not self._segment_bytes:
+                    os.remove(self._path('segment', self._active_seq))
+
+
+def _encode_value(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def _fsync_directory(directory):
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return  # Not supported on this platform (e.g. Windows)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
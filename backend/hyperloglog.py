@@ -0,0 +1,166 @@
+import hashlib
+import math
+
+
+class HyperLogLog:
+    """Fixed-size cardinality sketch for counting distinct values.
+
+    ``error_rate`` is the target relative standard error; the sketch uses
+    2**p one-byte registers with p chosen so that 1.04 / sqrt(2**p) is at
+    most ``error_rate``. Small sketches start out as an exact set of 64-bit
+    hashes and switch to registers once that set would outgrow them, so a
+    card with a handful of visitors a day does not pay for a full sketch.
+
+    The interface mirrors the parts of ``set`` the visitor rollups use:
+    ``add``, ``update`` (merge) and ``len``. The register sum the estimate
+    needs is kept up to date as registers change, so ``len`` is O(1) and can
+    be read after every ``add``.
+    """
+
+    __slots__ = ('p', '_registers', '_sparse', '_harmonic', '_zeros')
+
+    MIN_PRECISION = 4
+    MAX_PRECISION = 16
+
+    def __init__(self, error_rate=0.01, p=None):
+        if p is None:
+            p = precision_for_error_rate(error_rate)
+        if not self.MIN_PRECISION <= p <= self.MAX_PRECISION:
+            raise ValueError(f'precision must be between {self.MIN_PRECISION} and {self.MAX_PRECISION}')
+        self.p = p
+        self._registers = None
+        self._sparse = set()
+        self._harmonic = 0  # Sum of 2 ** (64 - register), i.e. 2 ** 64 * sum(2 ** -register)
+        self._zeros = 0     # Registers still at zero
+
+    @property
+    def error_rate(self):
+        return 1.04 / math.sqrt(1 << self.p)
+
+    def _sparse_limit(self):
+        # A set entry costs roughly 64 bytes, so beyond m/64 entries the
+        # dense registers (one byte each) are the smaller representation.
+        return max(16, (1 << self.p) >> 6)
+
+    def add(self, value):
+        if isinstance(value, str):
+            value = value.encode('utf-8')
+        hashed = int.from_bytes(hashlib.blake2b(value, digest_size=8).digest(), 'big')
+        if self._registers is None:
+            self._sparse.add(hashed)
+            if len(self._sparse) > self._sparse_limit():
+                self._densify()
+        else:
+            self._add_hash(hashed)
+
+    def _add_hash(self, hashed):
+        index = hashed >> (64 - self.p)
+        remaining_bits = 64 - self.p
+        rest = hashed & ((1 << remaining_bits) - 1)
+        rank = remaining_bits - rest.bit_length() + 1
+        current = self._registers[index]
+        if rank > current:
+            self._registers[index] = rank
+            self._harmonic += (1 << (64 - rank)) - (1 << (64 - current))
+            if current == 0:
+                self._zeros -= 1
+
+    def _recount(self):
+        self._harmonic = sum(1 << (64 - rank) for rank in self._registers)
+        self._zeros = self._registers.count(0)
+
+    def _densify(self):
+        self._registers = bytearray(1 << self.p)
+        self._harmonic = len(self._registers) << 64
+        self._zeros = len(self._registers)
+        for hashed in self._sparse:
+            self._add_hash(hashed)
+        self._sparse = None
+
+    def update(self, other):
+        """Merge ``other`` into this sketch (union of the counted values)."""
+        if other.p != self.p:
+            raise ValueError('cannot merge sketches with different precision')
+        if other._registers is None:
+            if self._registers is None:
+                self._sparse.update(other._sparse)
+                if len(self._sparse) > self._sparse_limit():
+                    self._densify()
+            else:
+                for hashed in other._sparse:
+                    self._add_hash(hashed)
+            return
+        if self._registers is None:
+            self._densify()
+        self._registers = bytearray(map(max, self._registers, other._registers))
+        self._recount()
+
+    def copy(self):
+        clone = HyperLogLog(p=self.p)
+        if self._registers is None:
+            clone._sparse = set(self._sparse)
+        else:
+            clone._registers = bytearray(self._registers)
+            clone._sparse = None
+            clone._harmonic = self._harmonic
+            clone._zeros = self._zeros
+        return clone
+
+    def count(self):
+        if self._registers is None:
+            return len(self._sparse)
+        m = 1 << self.p
+        estimate = _alpha(m) * m * m * (1 << 64) / self._harmonic
+        if estimate <= 2.5 * m and self._zeros:
+            # Linear counting is more accurate for small cardinalities.
+            estimate = m * math.log(m / self._zeros)
+        return int(round(estimate))
+
+    def __len__(self):
+        return self.count()
+
+    def to_bytes(self):
+        """Serialise to ``bytes`` (precision byte, mode byte, payload)."""
+        if self._registers is None:
+            payload = b''.join(h.to_bytes(8, 'big') for h in sorted(self._sparse))
+            return bytes((self.p, 0)) + payload
+        return bytes((self.p, 1)) + bytes(self._registers)
+
+    @classmethod
+    def from_bytes(cls, data):
+        sketch = cls(p=data[0])
+        if data[1] == 0:
+            sketch._sparse = {
+                int.from_bytes(data[i:i + 8], 'big') for i in range(2, len(data), 8)
+            }
+        else:
+            sketch._registers = bytearray(data[2:])
+            sketch._sparse = None
+            sketch._recount()
+        return sketch
+
+
+def precision_for_error_rate(error_rate):
+    """The smallest precision whose standard error is at most ``error_rate``.
+
+    Rates coarser than the smallest sketch get ``MIN_PRECISION``, which is
+    more accurate than asked; rates finer than the largest sketch can reach
+    raise ValueError rather than quietly running at a worse error rate.
+    """
+    if not 0 < error_rate < 1:
+        raise ValueError('error_rate must be between 0 and 1')
+    p = math.ceil(math.log2((1.04 / error_rate) ** 2))
+    if p > HyperLogLog.MAX_PRECISION:
+        finest = 1.04 / math.sqrt(1 << HyperLogLog.MAX_PRECISION)
+        raise ValueError(f'error_rate {error_rate} is below the finest supported, {finest:.4f}')
+    return max(p, HyperLogLog.MIN_PRECISION)
+
+
+def _alpha(m):
+    if m == 16:
+        return 0.673
+    if m == 32:
+        return 0.697
+    if m == 64:
+        return 0.709
+    return 0.7213 / (1 + 1.079 / m)
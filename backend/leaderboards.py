@@ -0,0 +1,131 @@
+import datetime
+import heapq
+import threading
+from collections import Counter, defaultdict
+
+# Metrics cards are ranked by. A card's unique visitors over a window are
+# its unique visitors per day summed over the days of the window (someone
+# visiting on three days counts three times): unlike visitors distinct over
+# the whole window, those can be added up as views arrive.
+LEADERBOARD_METRICS = ('unique_visitors', 'link_clicks', 'messages', 'appointments')
+
+# Rolling windows, by name: the number of days ending today (UTC)
+LEADERBOARD_WINDOWS = {'day': 1, 'week': 7, 'month': 30}
+
+# Event kind -> the metric each event of that kind adds one to (views only
+# count when they are a visitor's first of the day, see VisitorRollups.record)
+EVENT_METRICS = {'link_click': 'link_clicks', 'message': 'messages', 'appointment': 'appointments'}
+
+
+def utc_today():
+    return datetime.datetime.utcnow().date().isoformat()
+
+
+def shift_day(day, days):
+    return (datetime.date.fromisoformat(day) + datetime.timedelta(days=days)).isoformat()
+
+
+def window_start(as_of, days):
+    """First day of the window of ``days`` days ending on ``as_of``."""
+    return shift_day(as_of, 1 - days)
+
+
+def top_ranked(totals, limit):
+    """The ``limit`` cards with the highest counts in ``totals`` (``{card_id:
+    count}``) as ``(card_id, count)`` pairs, highest first and ties broken
+    by card id.
+
+    The threshold count comes from a heap selection over the counts alone,
+    so only the cards at or above it are sorted.
+    """
+    if not totals or limit < 1:
+        return []
+    threshold = max(heapq.nlargest(limit, totals.values())[-1], 1)
+    ranked = sorted((-count, card_id) for card_id, count in totals.items() if count >= threshold)
+    return [(card_id, -negated) for negated, card_id in ranked[:limit]]
+
+
+class Leaderboards:
+    """Every card's count of each metric over each rolling window, kept up
+    to date as events are recorded, for top-N queries across all cards.
+
+    Counts are kept per metric and day for the days of the longest window,
+    next to running totals per metric and window. Recording an event adds
+    to its day and to the totals of the windows it falls in. When the date
+    changes, the day entering each window is added to its totals and the
+    day leaving it subtracted, so moving on costs as much as the cards
+    active on those two days, whatever the length of the window. A top-N
+    query is a heap selection over the cards with a count in the window.
+
+    ``today`` returns the current date (YYYY-MM-DD); windows end on it.
+    Events dated before the longest window are ignored, and events dated
+    after today count from the day their date is reached. Safe to share
+    between threads.
+    """
+
+    def __init__(self, windows=LEADERBOARD_WINDOWS, today=utc_today):
+        self.windows = windows
+        self._today = today
+        self._span = max(windows.values())
+        self._lock = threading.Lock()
+        self._daily = defaultdict(Counter)  # (metric, date) -> Counter(card_id -> count)
+        self._totals = {(metric, window): Counter() for metric in LEADERBOARD_METRICS for window in windows}
+        self._as_of = None  # Day the windows end on
+        self._starts = {}   # window -> its first day
+        self._oldest = None  # First day of the longest window
+
+    def _advance(self):
+        today = self._today()
+        previous = self._as_of
+        if previous is not None and today <= previous:
+            return
+        self._as_of = today
+        self._starts = {window: window_start(today, days) for window, days in self.windows.items()}
+        oldest = self._oldest = window_start(today, self._span)
+
+        if previous is None or oldest > previous:
+            # Nothing counted so far is still in a window
+            for totals in self._totals.values():
+                totals.clear()
+            for (metric, day), counts in self._daily.items():
+                for window, start in self._starts.items():
+                    if start <= day <= today:
+                        self._totals[metric, window].update(counts)
+        else:
+            day = previous
+            while day < today:
+                day = shift_day(day, 1)
+                for window, days in self.windows.items():
+                    leaving = shift_day(day, -days)
+                    for metric in LEADERBOARD_METRICS:
+                        totals = self._totals[metric, window]
+                        totals.update(self._daily.get((metric, day), {}))
+                        for card_id, count in self._daily.get((metric, leaving), {}).items():
+                            remaining = totals[card_id] - count
+                            if remaining > 0:
+                                totals[card_id] = remaining
+                            else:
+                                del totals[card_id]
+
+        for key in [key for key in self._daily if key[1] < oldest]:
+            del self._daily[key]
+
+    def record(self, metric, card_id, day, count=1):
+        with self._lock:
+            if self._as_of is None or day > self._as_of:
+                self._advance()
+            if day < self._oldest:
+                return
+            self._daily[metric, day][card_id] += count
+            if day <= self._as_of:
+                for window, start in self._starts.items():
+                    if day >= start:
+                        self._totals[metric, window][card_id] += count
+
+    def top(self, metric, window, limit):
+        """``(date_from, date_to, ranked)``: the window's first and last day
+        and its ``limit`` cards with the highest counts as ``(card_id,
+        count)`` pairs, highest first."""
+        with self._lock:
+            self._advance()
+            return self._starts[window], self._as_of, top_ranked(self._totals[metric, window], limit)
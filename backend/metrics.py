@@ -0,0 +1,235 @@
+import bisect
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+# Upper bounds of the request latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Methods recorded under their own label; anything else counts as 'other'
+HTTP_METHODS = frozenset(('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+
+def format_metric(name, kind, help_text, samples, label_names=()):
+    """One metric family in the Prometheus text format.
+
+    ``samples`` maps tuples of label values (in ``label_names`` order) to
+    numbers; a metric without labels uses the empty tuple.
+    """
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+    for values, number in sorted(samples.items()):
+        lines.append(f'{name}{_labels(label_names, values)} {number}')
+    return '\n'.join(lines) + '\n'
+
+
+class LabeledCounter:
+    """A counter per combination of label values."""
+
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def inc(self, *values, amount=1):
+        with self._lock:
+            self._counts[values] += amount
+
+    def render(self):
+        with self._lock:
+            samples = dict(self._counts)
+        return format_metric(self.name, 'counter', self.help_text, samples, self.label_names)
+
+
+class _Histogram:
+    __slots__ = ('counts', 'total')
+
+    def __init__(self, buckets):
+        self.counts = [0] * (len(buckets) + 1)  # The last one is +Inf
+        self.total = 0.0
+
+
+class RequestMetrics:
+    """Per-route request latency histograms, response counts by status and
+    the number of requests in flight, for one process.
+
+    Requests are labelled with their method and URL rule (such as
+    ``/cards/<int:card_id>``), never the raw path, so the number of series
+    stays bounded; requests that matched no rule share the ``unmatched``
+    route. Recording a request is a bisect and one short critical section.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS, prefix='cardify'):
+        self.buckets = buckets
+        self.prefix = prefix
+        self.in_flight = 0
+        self._histograms = {}  # (method, route) -> _Histogram
+        self._responses = Counter()  # (method, route, status) -> count
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def finish(self, method, route, status, seconds):
+        bucket = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.in_flight -= 1
+            histogram = self._histograms.get((method, route))
+            if histogram is None:
+                histogram = self._histograms[method, route] = _Histogram(self.buckets)
+            histogram.counts[bucket] += 1
+            histogram.total += seconds
+            self._responses[method, route, status] += 1
+
+    def render(self):
+        with self._lock:
+            histograms = {key: (list(h.counts), h.total) for key, h in self._histograms.items()}
+            responses = dict(self._responses)
+            in_flight = self.in_flight
+
+        name = f'{self.prefix}_http_request_duration_seconds'
+        lines = [
+            f'# HELP {name} Time to build the response (a streamed body is not included), by route',
+            f'# TYPE {name} histogram',
+        ]
+        bounds = [repr(float(bound)) for bound in self.buckets] + ['+Inf']
+        for (method, route), (counts, total) in sorted(histograms.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels(("method", "route", "le"), (method, route, bound))} {cumulative}')
+            labels = _labels(('method', 'route'), (method, route))
+            lines.append(f'{name}_sum{labels} {total}')
+            lines.append(f'{name}_count{labels} {cumulative}')
+        return '\n'.join(lines) + '\n' + format_metric(
+            f'{self.prefix}_http_responses_total', 'counter', 'Responses sent, by route and status code',
+            responses, ('method', 'route', 'status'),
+        ) + format_metric(
+            f'{self.prefix}_http_requests_in_flight', 'gauge', 'Requests being handled right now',
+            {(): in_flight},
+        )
+
+
+class MetricsMiddleware:
+    """WSGI middleware recording every request of a Flask app in ``metrics``.
+
+    Wraps ``app.wsgi_app``, so a request costs two clock reads and the
+    ``RequestMetrics`` updates rather than a round of Flask request hooks.
+    The route is read from the request object Flask keeps in the environ
+    until the request context ends, so it is taken when the app starts the
+    response. The time runs until the app returns its response, before a
+    streamed body is sent. ``profiler``, if set, is a
+    ``SlowRequestProfiler`` told when each request starts and ends.
+    """
+
+    def __init__(self, wsgi_app, metrics, profiler=None):
+        self.wsgi_app = wsgi_app
+        self.metrics = metrics
+        self.profiler = profiler
+
+    def __call__(self, environ, start_response):
+        started = time.perf_counter()
+        profiler = self.profiler
+        self.metrics.start()
+        if profiler is not None:
+            profiler.begin(started)
+        responses = []  # (status line, Flask request) per start_response call
+
+        def record_status(status, headers, exc_info=None):
+            responses.append((status, environ.get('werkzeug.request')))
+            return start_response(status, headers, exc_info)
+
+        try:
+            return self.wsgi_app(environ, record_status)
+        finally:
+            seconds = time.perf_counter() - started
+            # No response means the app raised (as it does when exceptions propagate)
+            status, request = responses[-1] if responses else ('500', None)
+            rule = request.url_rule if request is not None else None
+            route = rule.rule if rule is not None else 'unmatched'
+            method = environ.get('REQUEST_METHOD')
+            if method not in HTTP_METHODS:
+                method = 'other'
+            self.metrics.finish(method, route, int(status[:3]), seconds)
+            if profiler is not None:
+                profiler.end(method, route, seconds)
+
+
+def collapse_stack(frame, max_depth=48):
+    """``frame``'s call stack as ``dir/file:function:line`` entries, outermost
+    first and separated by ``;`` (the collapsed format flame graph tools
+    read), keeping the innermost ``max_depth`` frames."""
+    entries = []
+    while frame is not None and len(entries) < max_depth:
+        code = frame.f_code
+        directory, filename = os.path.split(code.co_filename)
+        entries.append(f'{os.path.basename(directory)}/{filename}:{code.co_name}:{frame.f_lineno}')
+        frame = frame.f_back
+    entries.reverse()
+    return ';'.join(entries)
+
+
+class SlowRequestProfiler:
+    """Samples the stacks of requests that run longer than ``threshold``.
+
+    Each request registers its thread on start. A background thread wakes
+    every ``interval`` seconds and, for requests that have been running for
+    at least ``threshold`` seconds, records the thread's current stack, so
+    fast requests are never sampled and cost only a dict insert and delete.
+    When a sampled request finishes, ``on_profile(method, route, seconds,
+    stacks)`` is called with a Counter of collapsed stacks (see
+    ``collapse_stack``) and how many samples landed in each.
+    """
+
+    def __init__(self, threshold, on_profile, interval=0.005):
+        self.threshold = threshold
+        self.on_profile = on_profile
+        self.interval = interval
+        self._active = {}  # thread id -> (start time, Counter of stacks)
+        self._closed = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='slow-request-profiler', daemon=True)
+        self._thread.start()
+
+    def begin(self, started):
+        self._active[threading.get_ident()] = (started, Counter())
+
+    def end(self, method, route, seconds):
+        entry = self._active.pop(threading.get_ident(), None)
+        if entry is not None and entry[1] and seconds >= self.threshold:
+            self.on_profile(method, route, seconds, entry[1])
+
+    def _run(self):
+        while not self._closed.wait(self.interval):
+            deadline = time.perf_counter() - self.threshold
+            slow = [(ident, stacks) for ident, (started, stacks) in list(self._active.items()) if started <= deadline]
+            if not slow:
+                continue
+            frames = sys._current_frames()
+            for ident, stacks in slow:
+                frame = frames.get(ident)
+                if frame is not None:
+                    stacks[collapse_stack(frame)] += 1
+
+    def close(self):
+        self._closed.set()
+        if self._thread is not None:
+            self._thread.join()
@@ -0,0 +1,119 @@
+import multiprocessing
+import multiprocessing.util
+import os
+import threading
+import weakref
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing pool is full or a hash took too long."""
+
+
+class PasswordHasher:
+    """Password hashing and checking in a bounded pool of worker processes.
+
+    Key derivation is deliberately slow and holds the GIL, so running it on
+    request threads lets a burst of logins stall every other endpoint of the
+    worker. Here at most ``workers`` hashes run at once in separate
+    processes, and at most ``queue_limit`` more wait for one. Beyond that, or
+    when a result takes longer than ``timeout`` seconds, ``PasswordHasherBusy``
+    is raised right away so the caller can answer 503 instead of queueing.
+
+    ``method`` is a werkzeug hash method with its cost parameters, e.g.
+    ``scrypt:32768:8:1`` or ``pbkdf2:sha256:600000``. Hashes made with other
+    parameters still verify, and ``needs_rehash`` tells when to replace them.
+
+    With ``workers=0`` hashing runs inline on the calling thread. Otherwise
+    the pool is created on the first hash (or by ``start``) in the process
+    that uses it. A server that imports the app and then forks its workers
+    leaves each child without the parent's pool, and the child starts its
+    own. Where available the workers are forked from the thread that first
+    needs them. They only run the hashing functions, which take none of the
+    locks other threads may have held at the fork. Spawned workers would
+    re-run the server's ``__main__`` module.
+    """
+
+    def __init__(self, method='scrypt', workers=2, queue_limit=32, timeout=10.0):
+        self.method = method
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.timeout = timeout
+        # The method as written in the hashes it produces, cost parameters
+        # filled in (e.g. 'scrypt' -> 'scrypt:32768:8:1')
+        self.hash_prefix = _method_prefix(generate_password_hash('', method))
+        self._reset()
+        if hasattr(os, 'register_at_fork'):
+            # The pool's processes and threads belong to the parent: a forked
+            # child starts from nothing and makes its own pool when needed
+            reference = weakref.ref(self)
+            os.register_at_fork(after_in_child=lambda: _reset_after_fork(reference))
+
+    def _reset(self):
+        self._slots = threading.BoundedSemaphore(self.workers + self.queue_limit) if self.workers else None
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+                # Shut the pool down before multiprocessing joins this
+                # process's children at exit. atexit handlers run after that
+                # join (or, in a multiprocessing child, not at all), so the
+                # exit would otherwise wait forever on the idle workers. It
+                # must also run before the finalizers (priority 10) that stop
+                # the threads feeding the pool's queues.
+                multiprocessing.util.Finalize(None, self.close, exitpriority=100)
+            return self._executor
+
+    def start(self):
+        """Start the worker processes now rather than on the first hash."""
+        if self.workers:
+            self._pool().submit(_method_prefix, '').result()
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHasherBusy('Too many password hashes queued')
+        try:
+            future = self._pool().submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # The slot is freed when the work finishes, even if we stop waiting
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise PasswordHasherBusy('Password hashing timed out') from None
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        return _method_prefix(password_hash) != self.hash_prefix
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+                self._executor = None
+
+
+def _reset_after_fork(reference):
+    hasher = reference()
+    if hasher is not None:
+        hasher._reset()
+
+
+def _method_prefix(password_hash):
+    return password_hash.split('$', 1)[0]
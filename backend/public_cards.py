@@ -0,0 +1,109 @@
+import gzip
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+# Card fields shown on the public card endpoint; the owner's user_id, the
+# is_active flag and the created/updated timestamps stay internal
+PUBLIC_CARD_FIELDS = (
+    'id', 'card_slug', 'template_id', 'full_name', 'company_name', 'job_title',
+    'phone_number', 'email', 'website_url', 'address', 'social_media_links',
+    'business_description', 'custom_css',
+)
+
+
+def public_card_projection(card):
+    return {field: card.get(field) for field in PUBLIC_CARD_FIELDS}
+
+
+class PublicCard:
+    __slots__ = ('body', 'gzip_body', 'etag', 'updated_at')
+
+    def __init__(self, body, gzip_body, etag, updated_at):
+        self.body = body
+        self.gzip_body = gzip_body  # None when compressing does not help
+        self.etag = etag
+        self.updated_at = updated_at
+
+
+class PublicCardCache:
+    """Bounded LRU cache of public card JSON, serialized and gzipped once.
+
+    Cards are keyed by id and, like ``RenderedCardCache``, entries are
+    dropped when a card is updated or deleted and ignored once the card's
+    ``updated_at`` has moved, so processes sharing a database never serve a
+    stale card for long.
+
+    Slugs that matched no active card are remembered for ``miss_ttl``
+    seconds (at most ``max_misses`` of them), so probes for unknown slugs
+    skip the card store. Creating or renaming a card forgets its slug here;
+    a card created by another process shows up once the TTL runs out.
+    """
+
+    def __init__(self, dumps, max_entries=10000, max_misses=100000, miss_ttl=10.0):
+        self.dumps = dumps
+        self.max_entries = max_entries
+        self.max_misses = max_misses
+        self.miss_ttl = miss_ttl
+        self._entries = OrderedDict()
+        self._misses = OrderedDict()  # slug -> expiry time, oldest first
+        self._lock = threading.Lock()
+
+    def get_or_build(self, card):
+        card_id = card['id']
+        with self._lock:
+            entry = self._entries.get(card_id)
+            if entry is not None and entry.updated_at == card.get('updated_at'):
+                self._entries.move_to_end(card_id)
+                return entry
+
+        body = self.dumps(public_card_projection(card)).encode('utf-8')
+        # mtime=0 keeps the compressed bytes the same for the same card
+        gzip_body = gzip.compress(body, mtime=0)
+        entry = PublicCard(
+            body,
+            gzip_body if len(gzip_body) < len(body) else None,
+            hashlib.sha256(body).hexdigest()[:32],
+            card.get('updated_at'),
+        )
+        with self._lock:
+            self._entries[card_id] = entry
+            self._entries.move_to_end(card_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, card_id):
+        with self._lock:
+            self._entries.pop(card_id, None)
+
+    def is_missing(self, slug):
+        expires = self._misses.get(slug)
+        if expires is None:
+            return False
+        if expires > time.monotonic():
+            return True
+        self.forget_missing(slug)
+        return False
+
+    def remember_missing(self, slug):
+        if not self.max_misses:
+            return
+        with self._lock:
+            self._misses.pop(slug, None)
+            self._misses[slug] = time.monotonic() + self.miss_ttl
+            while len(self._misses) > self.max_misses:
+                self._misses.popitem(last=False)
+
+    def forget_missing(self, slug):
+        with self._lock:
+            self._misses.pop(slug, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._misses.clear()
+
+    def __len__(self):
+        return len(self._entries)
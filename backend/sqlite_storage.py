@@ -0,0 +1,1011 @@
+import datetime
+import json
+import logging
+import sqlite3
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from analytics import EVENT_TIME_FIELDS, click_date, event_date, summarize_link_clicks
+from leaderboards import EVENT_METRICS, LEADERBOARD_METRICS, LEADERBOARD_WINDOWS, shift_day, utc_today, window_start
+from stores import DuplicateUserError, SlugConflictError, rename_conflicts
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    username        TEXT NOT NULL,
+    email           TEXT NOT NULL,
+    -- Uniqueness keys: the values themselves, or casefolded when lookups
+    -- are case-insensitive
+    username_key    TEXT NOT NULL UNIQUE,
+    email_key       TEXT NOT NULL UNIQUE,
+    password_hash   TEXT NOT NULL,
+    created_at      TEXT NOT NULL,
+    updated_at      TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS templates (
+    id                   INTEGER PRIMARY KEY AUTOINCREMENT,
+    name                 TEXT NOT NULL,
+    structure_definition TEXT,
+    preview_image_url    TEXT,
+    created_at           TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS cards (
+    id                   INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id              INTEGER NOT NULL REFERENCES users(id),
+    template_id          INTEGER NOT NULL REFERENCES templates(id),
+    card_slug            TEXT NOT NULL UNIQUE,
+    logo_url             TEXT,
+    company_name         TEXT,
+    full_name            TEXT NOT NULL,
+    job_title            TEXT,
+    phone_number         TEXT,
+    email                TEXT,
+    website_url          TEXT,
+    address              TEXT,
+    social_media_links   TEXT NOT NULL DEFAULT '{}',
+    business_description TEXT,
+    custom_css           TEXT,
+    is_active            INTEGER NOT NULL DEFAULT 1,
+    created_at           TEXT NOT NULL,
+    updated_at           TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_cards_user_id ON cards (user_id, id);
+
+-- One row per visitor per card per day; the unique key doubles as the
+-- (card_id, visit_date) index for the unique-visitor queries
+CREATE TABLE IF NOT EXISTS analytics_visitors (
+    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    card_id         INTEGER NOT NULL REFERENCES cards(id),
+    visit_date      TEXT NOT NULL,
+    visitor_ip_hash TEXT NOT NULL,
+    user_agent      TEXT,
+    count           INTEGER NOT NULL DEFAULT 1,
+    UNIQUE (card_id, visit_date, visitor_ip_hash)
+);
+
+CREATE TABLE IF NOT EXISTS analytics_messages (
+    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    card_id         INTEGER NOT NULL REFERENCES cards(id),
+    sender_name     TEXT,
+    sender_email    TEXT,
+    message_content TEXT NOT NULL,
+    received_at     TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_analytics_messages_card ON analytics_messages (card_id, id);
+CREATE INDEX IF NOT EXISTS idx_analytics_messages_time ON analytics_messages (card_id, received_at);
+
+CREATE TABLE IF NOT EXISTS analytics_appointments (
+    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    card_id         INTEGER NOT NULL REFERENCES cards(id),
+    requester_name  TEXT NOT NULL,
+    requester_email TEXT NOT NULL,
+    proposed_time   TEXT NOT NULL,
+    status          TEXT NOT NULL DEFAULT 'pending',
+    created_at      TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_analytics_appointments_card ON analytics_appointments (card_id, id);
+CREATE INDEX IF NOT EXISTS idx_analytics_appointments_time ON analytics_appointments (card_id, created_at);
+
+CREATE TABLE IF NOT EXISTS analytics_link_clicks (
+    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    card_id         INTEGER NOT NULL REFERENCES cards(id),
+    link_type       TEXT,
+    link_url        TEXT NOT NULL,
+    clicked_at      TEXT NOT NULL,
+    visitor_ip_hash TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_analytics_link_clicks_card ON analytics_link_clicks (card_id, id);
+
+-- Link clicks counted per card, day and link as they are recorded
+CREATE TABLE IF NOT EXISTS analytics_link_click_counts (
+    card_id    INTEGER NOT NULL REFERENCES cards(id),
+    click_date TEXT NOT NULL,
+    link_type  TEXT NOT NULL,
+    link_url   TEXT NOT NULL,
+    clicks     INTEGER NOT NULL,
+    PRIMARY KEY (card_id, click_date, link_type, link_url)
+) WITHOUT ROWID;
+
+-- Leaderboard counts per metric, day and card, written in the same
+-- transaction as the events; only the days of the longest window are kept
+CREATE TABLE IF NOT EXISTS analytics_daily_totals (
+    metric  TEXT NOT NULL,
+    day     TEXT NOT NULL,
+    card_id INTEGER NOT NULL REFERENCES cards(id),
+    count   INTEGER NOT NULL,
+    PRIMARY KEY (metric, day, card_id)
+) WITHOUT ROWID;
+
+-- Each card's count per metric over the rolling window of the last `days`
+-- days ending on analytics_leaderboard_state.as_of
+CREATE TABLE IF NOT EXISTS analytics_leaderboards (
+    metric  TEXT NOT NULL,
+    days    INTEGER NOT NULL,
+    card_id INTEGER NOT NULL REFERENCES cards(id),
+    count   INTEGER NOT NULL,
+    PRIMARY KEY (metric, days, card_id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_analytics_leaderboards_rank ON analytics_leaderboards (metric, days, count DESC, card_id);
+
+CREATE TABLE IF NOT EXISTS analytics_leaderboard_state (
+    id    INTEGER PRIMARY KEY CHECK (id = 1),
+    as_of TEXT NOT NULL
+);
+
+-- Rows per table, kept up to date as rows are written so that reading the
+-- sizes never counts them: by these triggers for users and cards, and by the
+-- analytics writer for the analytics tables (rows there are never deleted)
+CREATE TABLE IF NOT EXISTS table_row_counts (
+    table_name TEXT PRIMARY KEY,
+    row_count  INTEGER NOT NULL
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS users_row_count_insert AFTER INSERT ON users BEGIN
+    UPDATE table_row_counts SET row_count = row_count + 1 WHERE table_name = 'users';
+END;
+CREATE TRIGGER IF NOT EXISTS users_row_count_delete AFTER DELETE ON users BEGIN
+    UPDATE table_row_counts SET row_count = row_count - 1 WHERE table_name = 'users';
+END;
+CREATE TRIGGER IF NOT EXISTS cards_row_count_insert AFTER INSERT ON cards BEGIN
+    UPDATE table_row_counts SET row_count = row_count + 1 WHERE table_name = 'cards';
+END;
+CREATE TRIGGER IF NOT EXISTS cards_row_count_delete AFTER DELETE ON cards BEGIN
+    UPDATE table_row_counts SET row_count = row_count - 1 WHERE table_name = 'cards';
+END;
+"""
+
+# Tables whose sizes are kept in table_row_counts
+COUNTED_TABLES = (
+    'users', 'cards', 'analytics_visitors', 'analytics_messages', 'analytics_appointments', 'analytics_link_clicks',
+)
+# OR IGNORE: another process may have counted the table first
+ROW_COUNT_SEED = "INSERT OR IGNORE INTO table_row_counts (table_name, row_count) SELECT '{table}', COUNT(*) FROM {table}"
+ROW_COUNT_ADD = 'UPDATE table_row_counts SET row_count = row_count + ? WHERE table_name = ?'
+ROW_COUNT_GET = 'SELECT row_count FROM table_row_counts WHERE table_name = ?'
+
+# Card fields exposed by the API, in the order of the in-memory card dicts
+CARD_FIELDS = (
+    'id', 'user_id', 'template_id', 'card_slug', 'full_name', 'company_name',
+    'job_title', 'phone_number', 'email', 'website_url', 'address',
+    'social_media_links', 'business_description', 'custom_css', 'is_active',
+    'created_at', 'updated_at',
+)
+CARD_COLUMNS = ', '.join(CARD_FIELDS)
+
+
+class SQLiteDatabase:
+    """A SQLite database file shared by every thread and worker process.
+
+    The database runs in WAL mode, so readers never block the single writer
+    and several processes can serve from the same file. Each thread reuses
+    one connection for its lifetime, and each connection keeps a cache of
+    compiled statements, so the fixed SQL strings used by the stores are
+    only prepared once per thread. Writes go through ``transaction()``,
+    which takes the write lock up front (``BEGIN IMMEDIATE``) and waits up
+    to ``timeout`` seconds for another writer to finish.
+    """
+
+    def __init__(self, path, timeout=30.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        connection = self.connection()
+        connection.executescript(SCHEMA)
+        # Counted once, when a database first gets its row counts; until then
+        # the triggers and the analytics writer find no row to update
+        counted = {row[0] for row in connection.execute('SELECT table_name FROM table_row_counts')}
+        for table in COUNTED_TABLES:
+            if table not in counted:
+                connection.execute(ROW_COUNT_SEED.format(table=table))
+
+    def connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None,
+                                         cached_statements=256)
+            connection.row_factory = sqlite3.Row
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    @contextmanager
+    def transaction(self):
+        connection = self.connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def sync_templates(self, templates):
+        """Insert or refresh the given templates, keyed by their ids."""
+        now = _to_text(datetime.datetime.utcnow())
+        with self.transaction() as connection:
+            connection.executemany(
+                'INSERT INTO templates (id, name, structure_definition, preview_image_url, created_at) '
+                'VALUES (:id, :name, :structure_definition, :preview_image_url, :created_at) '
+                'ON CONFLICT (id) DO UPDATE SET name = excluded.name, '
+                'structure_definition = excluded.structure_definition, '
+                'preview_image_url = excluded.preview_image_url',
+                [dict(template, preview_image_url=template.get('preview_image_url'), created_at=now)
+                 for template in templates],
+            )
+
+    def close(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+
+# Python types sqlite3 binds as parameters
+_SQL_TYPES = (str, int, float, bytes, type(None))
+
+
+def _to_text(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return value
+
+
+def _to_datetime(value):
+    return datetime.datetime.fromisoformat(value) if value else value
+
+
+def _next_day(day):
+    return (datetime.date.fromisoformat(day) + datetime.timedelta(days=1)).isoformat()
+
+
+def _card_from_row(row):
+    card = dict(zip(CARD_FIELDS, row))
+    card['social_media_links'] = json.loads(card['social_media_links'])
+    card['is_active'] = bool(card['is_active'])
+    card['created_at'] = _to_datetime(card['created_at'])
+    card['updated_at'] = _to_datetime(card['updated_at'])
+    return card
+
+
+def _card_params(fields):
+    params = {}
+    for field, value in fields.items():
+        if field == 'social_media_links':
+            value = json.dumps(value if value is not None else {})
+        elif field == 'is_active':
+            value = 1 if value else 0
+        params[field] = _to_text(value)
+    return params
+
+
+class SQLiteCardStore:
+    """Card repository backed by the ``cards`` table, with the same interface
+    as the in-memory ``stores.CardStore``.
+
+    The UNIQUE constraint on ``card_slug`` enforces slug uniqueness across all
+    workers, and AUTOINCREMENT ids are allocated inside the write transaction.
+    """
+
+    def __init__(self, database):
+        self.database = database
+
+    def _query(self, sql, params=()):
+        return self.database.connection().execute(sql, params).fetchall()
+
+    def __len__(self):
+        return self._query(ROW_COUNT_GET, ('cards',))[0][0]
+
+    def __iter__(self):
+        return iter([_card_from_row(row) for row in self._query(f'SELECT {CARD_COLUMNS} FROM cards ORDER BY id')])
+
+    def get(self, card_id):
+        rows = self._query(f'SELECT {CARD_COLUMNS} FROM cards WHERE id = ?', (card_id,))
+        return _card_from_row(rows[0]) if rows else None
+
+    def get_by_slug(self, card_slug):
+        rows = self._query(f'SELECT {CARD_COLUMNS} FROM cards WHERE card_slug = ?', (card_slug,))
+        return _card_from_row(rows[0]) if rows else None
+
+    def slug_exists(self, card_slug):
+        return bool(self._query('SELECT 1 FROM cards WHERE card_slug = ?', (card_slug,)))
+
+    def get_many(self, card_ids):
+        rows = self._query(
+            f'SELECT {CARD_COLUMNS} FROM cards WHERE id IN (SELECT value FROM json_each(?))', (json.dumps(card_ids),),
+        )
+        return {card['id']: card for card in map(_card_from_row, rows)}
+
+    def list_for_user(self, user_id):
+        rows = self._query(f'SELECT {CARD_COLUMNS} FROM cards WHERE user_id = ? ORDER BY id', (user_id,))
+        return [_card_from_row(row) for row in rows]
+
+    def add(self, user_id, fields):
+        params = _card_params(fields)
+        params['user_id'] = user_id
+        columns = ', '.join(params)
+        placeholders = ', '.join(f':{column}' for column in params)
+        try:
+            with self.database.transaction() as connection:
+                cursor = connection.execute(f'INSERT INTO cards ({columns}) VALUES ({placeholders})', params)
+                row = connection.execute(f'SELECT {CARD_COLUMNS} FROM cards WHERE id = ?', (cursor.lastrowid,)).fetchone()
+        except sqlite3.IntegrityError as exc:
+            if 'card_slug' in str(exc):
+                raise SlugConflictError(fields['card_slug']) from exc
+            raise
+        return _card_from_row(row)
+
+    def update(self, card_id, changes):
+        params = _card_params(changes)
+        assignments = ', '.join(f'{column} = :{column}' for column in params)
+        params['card_id'] = card_id
+        try:
+            with self.database.transaction() as connection:
+                if assignments:
+                    connection.execute(f'UPDATE cards SET {assignments} WHERE id = :card_id', params)
+                row = connection.execute(f'SELECT {CARD_COLUMNS} FROM cards WHERE id = ?', (card_id,)).fetchone()
+        except sqlite3.IntegrityError as exc:
+            if 'card_slug' in str(exc):
+                raise SlugConflictError(changes['card_slug']) from exc
+            raise
+        return _card_from_row(row) if row else None
+
+    def _rows_by_id(self, connection, card_ids):
+        rows = connection.execute(
+            f'SELECT {CARD_COLUMNS} FROM cards WHERE id IN (SELECT value FROM json_each(?))', (json.dumps(card_ids),),
+        ).fetchall()
+        return {row['id']: row for row in rows}
+
+    def _slug_holders(self, connection, slugs):
+        rows = connection.execute(
+            'SELECT card_slug, id FROM cards WHERE card_slug IN (SELECT value FROM json_each(?))', (json.dumps(slugs),),
+        ).fetchall()
+        return dict(rows)
+
+    def bulk_add(self, user_id, cards, atomic=False):
+        """Add many cards in one transaction; see ``stores.CardStore.bulk_add``."""
+        with self.database.transaction() as connection:
+            taken = self._slug_holders(connection, [fields['card_slug'] for fields in cards])
+            seen = set()
+            conflicts = []
+            for index, fields in enumerate(cards):
+                if fields['card_slug'] in taken or fields['card_slug'] in seen:
+                    conflicts.append(index)
+                seen.add(fields['card_slug'])
+            if atomic and conflicts:
+                return [], conflicts
+
+            skipped = set(conflicts)
+            inserted = []
+            for index, fields in enumerate(cards):
+                if index in skipped:
+                    continue
+                params = _card_params(fields)
+                params['user_id'] = user_id
+                columns = ', '.join(params)
+                placeholders = ', '.join(f':{column}' for column in params)
+                cursor = connection.execute(f'INSERT INTO cards ({columns}) VALUES ({placeholders})', params)
+                inserted.append((index, cursor.lastrowid))
+            rows = self._rows_by_id(connection, [card_id for _, card_id in inserted])
+        return [(index, _card_from_row(rows[card_id])) for index, card_id in inserted], conflicts
+
+    def bulk_update(self, updates, atomic=False):
+        """Update many cards in one transaction; see ``stores.CardStore.bulk_update``."""
+        with self.database.transaction() as connection:
+            current = self._rows_by_id(connection, [card_id for card_id, _ in updates])
+            missing = [index for index, (card_id, _) in enumerate(updates) if card_id not in current]
+            renames = {}
+            for card_id, changes in updates:
+                row = current.get(card_id)
+                if row is not None and changes.get('card_slug', row['card_slug']) != row['card_slug']:
+                    renames[card_id] = (row['card_slug'], changes['card_slug'])
+            holders = self._slug_holders(connection, [new_slug for _, new_slug in renames.values()])
+            failed = rename_conflicts(renames, holders.get)
+            conflicts = [index for index, (card_id, _) in enumerate(updates) if card_id in failed]
+            if atomic and (conflicts or missing):
+                return [], conflicts, missing
+
+            # The UNIQUE constraint is checked per statement, so cards giving
+            # up a slug another card claims first move to a placeholder slug
+            # no card can hold
+            claimed = {renames[card_id][1] for card_id in renames if card_id not in failed}
+            giving_up = [card_id for card_id in renames if card_id not in failed and renames[card_id][0] in claimed]
+            connection.executemany(
+                'UPDATE cards SET card_slug = char(0) || id WHERE id = ?', [(card_id,) for card_id in giving_up],
+            )
+            applied = []
+            for index, (card_id, changes) in enumerate(updates):
+                if card_id not in current or card_id in failed:
+                    continue
+                params = _card_params(changes)
+                assignments = ', '.join(f'{column} = :{column}' for column in params)
+                if assignments:
+                    params['card_id'] = card_id
+                    connection.execute(f'UPDATE cards SET {assignments} WHERE id = :card_id', params)
+                applied.append((index, card_id))
+            rows = self._rows_by_id(connection, [card_id for _, card_id in applied])
+        return [(index, _card_from_row(rows[card_id])) for index, card_id in applied], conflicts, missing
+
+    def delete(self, card_id):
+        with self.database.transaction() as connection:
+            row = connection.execute(f'SELECT {CARD_COLUMNS} FROM cards WHERE id = ?', (card_id,)).fetchone()
+            if row is None:
+                return None
+            connection.execute('DELETE FROM cards WHERE id = ?', (card_id,))
+        return _card_from_row(row)
+
+
+USER_COLUMNS = 'id, username, email, password_hash, created_at'
+
+
+def _user_from_row(row):
+    user = dict(row)
+    user['created_at'] = _to_datetime(user['created_at'])
+    return user
+
+
+class SQLiteUserStore:
+    """User repository backed by the ``users`` table, with the same interface
+    as the in-memory ``stores.UserStore``."""
+
+    def __init__(self, database, case_insensitive=False):
+        self.database = database
+        self.case_insensitive = case_insensitive
+
+    def _key(self, value):
+        return value.casefold() if self.case_insensitive else value
+
+    def _query(self, sql, params=()):
+        return self.database.connection().execute(sql, params).fetchall()
+
+    def __len__(self):
+        return self._query(ROW_COUNT_GET, ('users',))[0][0]
+
+    def get(self, user_id):
+        rows = self._query(f'SELECT {USER_COLUMNS} FROM users WHERE id = ?', (user_id,))
+        return _user_from_row(rows[0]) if rows else None
+
+    def get_by_email(self, email):
+        rows = self._query(f'SELECT {USER_COLUMNS} FROM users WHERE email_key = ?', (self._key(email),))
+        return _user_from_row(rows[0]) if rows else None
+
+    def get_by_username(self, username):
+        rows = self._query(f'SELECT {USER_COLUMNS} FROM users WHERE username_key = ?', (self._key(username),))
+        return _user_from_row(rows[0]) if rows else None
+
+    def email_exists(self, email):
+        return bool(self._query('SELECT 1 FROM users WHERE email_key = ?', (self._key(email),)))
+
+    def username_exists(self, username):
+        return bool(self._query('SELECT 1 FROM users WHERE username_key = ?', (self._key(username),)))
+
+    def _insert(self, connection, username, email, password_hash, created_at):
+        created_at = _to_text(created_at)
+        try:
+            cursor = connection.execute(
+                'INSERT INTO users (username, email, username_key, email_key, password_hash, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (username, email, self._key(username), self._key(email), password_hash, created_at, created_at),
+            )
+        except sqlite3.IntegrityError as exc:
+            if 'email_key' in str(exc):
+                raise DuplicateUserError('email', email) from exc
+            if 'username_key' in str(exc):
+                raise DuplicateUserError('username', username) from exc
+            raise
+        return {
+            'id': cursor.lastrowid,
+            'username': username,
+            'email': email,
+            'password_hash': password_hash,
+            'created_at': _to_datetime(created_at),
+        }
+
+    def add(self, username, email, password_hash, created_at):
+        with self.database.transaction() as connection:
+            return self._insert(connection, username, email, password_hash, created_at)
+
+    def update_password_hash(self, user_id, password_hash):
+        with self.database.transaction() as connection:
+            connection.execute(
+                'UPDATE users SET password_hash = ?, updated_at = ? WHERE id = ?',
+                (password_hash, _to_text(datetime.datetime.utcnow()), user_id),
+            )
+            row = connection.execute(f'SELECT {USER_COLUMNS} FROM users WHERE id = ?', (user_id,)).fetchone()
+        return _user_from_row(row) if row else None
+
+    def bulk_import(self, records, created_at):
+        """Add many users in one transaction; see ``stores.UserStore.bulk_import``."""
+        imported = []
+        duplicates = []
+        with self.database.transaction() as connection:
+            for index, record in enumerate(records):
+                try:
+                    user = self._insert(connection, record['username'], record['email'],
+                                        record['password_hash'], created_at)
+                except DuplicateUserError as exc:
+                    duplicates.append((index, exc.field, exc.value))
+                    continue
+                imported.append(user)
+        return imported, duplicates
+
+
+# Table holding each analytics event kind
+ANALYTICS_TABLES = {
+    'view': 'analytics_visitors',
+    'message': 'analytics_messages',
+    'appointment': 'analytics_appointments',
+    'link_click': 'analytics_link_clicks',
+}
+
+# Statements used to write each analytics event kind, with the event fields
+# bound to their parameters. Views are written once per visitor, card and
+# day in a batch, with the number of visits bound last.
+ANALYTICS_INSERTS = {
+    'view': (
+        'INSERT INTO analytics_visitors (card_id, visit_date, visitor_ip_hash, count) VALUES (?, ?, ?, ?) '
+        'ON CONFLICT (card_id, visit_date, visitor_ip_hash) DO UPDATE SET count = count + excluded.count',
+        ('card_id', 'visit_date', 'visitor_ip_hash'),
+    ),
+    'message': (
+        'INSERT INTO analytics_messages (card_id, sender_name, sender_email, message_content, received_at) '
+        'VALUES (?, ?, ?, ?, ?)',
+        ('card_id', 'sender_name', 'sender_email', 'message_content', 'received_at'),
+    ),
+    'appointment': (
+        'INSERT INTO analytics_appointments (card_id, requester_name, requester_email, proposed_time, created_at) '
+        'VALUES (?, ?, ?, ?, ?)',
+        ('card_id', 'requester_name', 'requester_email', 'proposed_time', 'created_at'),
+    ),
+    'link_click': (
+        'INSERT INTO analytics_link_clicks (card_id, link_type, link_url, clicked_at) VALUES (?, ?, ?, ?)',
+        ('card_id', 'link_type', 'link_url', 'clicked_at'),
+    ),
+}
+
+LINK_CLICK_COUNTS_UPSERT = (
+    'INSERT INTO analytics_link_click_counts (card_id, click_date, link_type, link_url, clicks) '
+    'VALUES (?, ?, ?, ?, ?) '
+    'ON CONFLICT (card_id, click_date, link_type, link_url) DO UPDATE SET clicks = clicks + excluded.clicks'
+)
+
+# Which of a batch of (card_id, visit_date, visitor_ip_hash) keys, bound as a
+# JSON array, already have a row: the others are new visitors that day
+VISITORS_SEEN = (
+    "SELECT visitors.card_id, visitors.visit_date, visitors.visitor_ip_hash FROM json_each(?) AS batch "
+    "JOIN analytics_visitors AS visitors ON visitors.card_id = json_extract(batch.value, '$[0]') "
+    "AND visitors.visit_date = json_extract(batch.value, '$[1]') "
+    "AND visitors.visitor_ip_hash = json_extract(batch.value, '$[2]')"
+)
+
+DAILY_TOTALS_UPSERT = (
+    'INSERT INTO analytics_daily_totals (metric, day, card_id, count) VALUES (?, ?, ?, ?) '
+    'ON CONFLICT (metric, day, card_id) DO UPDATE SET count = count + excluded.count'
+)
+
+LEADERBOARD_UPSERT = (
+    'INSERT INTO analytics_leaderboards (metric, days, card_id, count) VALUES (?, ?, ?, ?) '
+    'ON CONFLICT (metric, days, card_id) DO UPDATE SET count = count + excluded.count'
+)
+
+# Moving a window on by a day: the counts of the day entering it are added
+# and those of the day leaving it subtracted, then cards left at zero removed
+LEADERBOARD_ENTER = (
+    'INSERT INTO analytics_leaderboards (metric, days, card_id, count) '
+    'SELECT metric, :days, card_id, count FROM analytics_daily_totals WHERE metric = :metric AND day = :day '
+    'ON CONFLICT (metric, days, card_id) DO UPDATE SET count = count + excluded.count'
+)
+LEADERBOARD_LEAVE = (
+    'UPDATE analytics_leaderboards SET count = analytics_leaderboards.count - leaving.count '
+    'FROM (SELECT card_id, count FROM analytics_daily_totals WHERE metric = :metric AND day = :day) AS leaving '
+    'WHERE analytics_leaderboards.metric = :metric AND analytics_leaderboards.days = :days '
+    'AND analytics_leaderboards.card_id = leaving.card_id'
+)
+LEADERBOARD_PRUNE = 'DELETE FROM analytics_leaderboards WHERE metric = ? AND days = ? AND count <= 0'
+LEADERBOARD_REBUILD = (
+    'INSERT INTO analytics_leaderboards (metric, days, card_id, count) '
+    'SELECT metric, ?, card_id, SUM(count) FROM analytics_daily_totals '
+    'WHERE metric = ? AND day >= ? AND day <= ? GROUP BY card_id'
+)
+
+# Daily totals counted from the analytics tables for days from a given one,
+# for databases created before the leaderboards
+DAILY_TOTALS_BACKFILL = (
+    "INSERT INTO analytics_daily_totals (metric, day, card_id, count) "
+    "SELECT 'unique_visitors', visit_date, card_id, COUNT(*) FROM analytics_visitors "
+    "WHERE visit_date >= ? GROUP BY visit_date, card_id",
+    "INSERT INTO analytics_daily_totals (metric, day, card_id, count) "
+    "SELECT 'link_clicks', click_date, card_id, SUM(clicks) FROM analytics_link_click_counts "
+    "WHERE click_date >= ? GROUP BY click_date, card_id",
+    "INSERT INTO analytics_daily_totals (metric, day, card_id, count) "
+    "SELECT 'messages', substr(received_at, 1, 10), card_id, COUNT(*) FROM analytics_messages "
+    "WHERE received_at >= ? GROUP BY 2, card_id",
+    "INSERT INTO analytics_daily_totals (metric, day, card_id, count) "
+    "SELECT 'appointments', substr(created_at, 1, 10), card_id, COUNT(*) FROM analytics_appointments "
+    "WHERE created_at >= ? GROUP BY 2, card_id",
+)
+
+LEADERBOARD_TOP = (
+    'SELECT card_id, count FROM analytics_leaderboards WHERE metric = ? AND days = ? '
+    'ORDER BY count DESC, card_id LIMIT ?'
+)
+
+# Pages of the per-card analytics feeds, newest first. Row ids are the feed
+# sequence numbers.
+ANALYTICS_FEED_QUERIES = {
+    'message': 'SELECT id, card_id, sender_name, sender_email, message_content, received_at '
+               'FROM analytics_messages WHERE card_id = ? AND id < ? ORDER BY id DESC LIMIT ?',
+    'appointment': 'SELECT id, card_id, requester_name, requester_email, proposed_time, created_at '
+                   'FROM analytics_appointments WHERE card_id = ? AND id < ? ORDER BY id DESC LIMIT ?',
+    'link_click': 'SELECT id, card_id, link_type, link_url, clicked_at '
+                  'FROM analytics_link_clicks WHERE card_id = ? AND id < ? ORDER BY id DESC LIMIT ?',
+}
+
+# A batch of a card's events within a time range, oldest first after an id
+ANALYTICS_EXPORT_QUERIES = {
+    'message': 'SELECT id, card_id, sender_name, sender_email, message_content, received_at '
+               'FROM analytics_messages WHERE card_id = ? AND received_at >= ? AND received_at < ? '
+               'AND id > ? ORDER BY id LIMIT ?',
+    'appointment': 'SELECT id, card_id, requester_name, requester_email, proposed_time, created_at '
+                   'FROM analytics_appointments WHERE card_id = ? AND created_at >= ? AND created_at < ? '
+                   'AND id > ? ORDER BY id LIMIT ?',
+    'link_click': 'SELECT id, card_id, link_type, link_url, clicked_at '
+                  'FROM analytics_link_clicks WHERE card_id = ? AND clicked_at >= ? AND clicked_at < ? '
+                  'AND id > ? ORDER BY id LIMIT ?',
+}
+
+# Headline numbers for a set of cards (a JSON array bound to the first
+# parameter) over a date range, grouped by card
+DASHBOARD_QUERIES = {
+    'unique_visitors': 'SELECT card_id, COUNT(DISTINCT visitor_ip_hash) FROM analytics_visitors '
+                       'WHERE card_id IN (SELECT value FROM json_each(?)) AND visit_date >= ? AND visit_date <= ? '
+                       'GROUP BY card_id',
+    'messages': 'SELECT card_id, COUNT(*) FROM analytics_messages '
+                'WHERE card_id IN (SELECT value FROM json_each(?)) AND received_at >= ? AND received_at < ? '
+                'GROUP BY card_id',
+    'appointments': 'SELECT card_id, COUNT(*) FROM analytics_appointments '
+                    'WHERE card_id IN (SELECT value FROM json_each(?)) AND created_at >= ? AND created_at < ? '
+                    'GROUP BY card_id',
+    'link_clicks_by_type': 'SELECT card_id, link_type, SUM(clicks) FROM analytics_link_click_counts '
+                           'WHERE card_id IN (SELECT value FROM json_each(?)) AND click_date >= ? AND click_date <= ? '
+                           'GROUP BY card_id, link_type',
+}
+
+# First day of the week (Monday) or month containing visit_date
+ANALYTICS_PERIOD_EXPRESSIONS = {
+    'week': "date(visit_date, '-' || ((CAST(strftime('%w', visit_date) AS INTEGER) + 6) % 7) || ' days')",
+    'month': "substr(visit_date, 1, 8) || '01'",
+}
+ANALYTICS_PERIOD_QUERIES = {
+    interval: f'SELECT period, COUNT(DISTINCT visitor_ip_hash) FROM ('
+              f'SELECT {expression} AS period, visitor_ip_hash FROM analytics_visitors '
+              f'WHERE card_id = ? AND visit_date >= ? AND visit_date <= ?'
+              f') GROUP BY period ORDER BY period'
+    for interval, expression in ANALYTICS_PERIOD_EXPRESSIONS.items()
+}
+
+# Bounds standing in for an open-ended date range
+_FIRST_DATE = '0000-01-01'
+_LAST_DATE = '9999-12-31'
+_MAX_ROW_ID = 2 ** 63 - 1
+
+
+def _time_bounds(date_from, date_to):
+    # Timestamps are ISO text, so all of date_to sorts below the next day
+    return (date_from or _FIRST_DATE, _next_day(date_to) if date_to and date_to < _LAST_DATE else _LAST_DATE)
+
+
+class SQLiteAnalyticsStore:
+    """Analytics backed by the ``analytics_*`` tables, with the query
+    interface of the in-memory ``analytics.AnalyticsStore``.
+
+    ``apply`` only buffers the event. A background thread writes the buffer
+    with one ``executemany`` per event kind inside a single transaction,
+    every ``flush_interval`` seconds or as soon as ``batch_size`` events are
+    waiting. Queries flush first, so a process always sees its own events.
+
+    Views are stored as one row per visitor per card per day with a visit
+    count, which is all the unique-visitor queries need, and link clicks are
+    also counted per card, day and link in the same transaction. So are the
+    leaderboards: counts per metric, day and card, and per metric, rolling
+    window and card, moved on a day at a time by whichever process first
+    writes or reads them on a new date (see ``leaderboards.Leaderboards``
+    for the in-memory version). Nothing is loaded into memory at startup.
+    """
+
+    def __init__(self, database, batch_size=1000, flush_interval=0.2, leaderboard_windows=LEADERBOARD_WINDOWS,
+                 today=utc_today):
+        self.database = database
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.leaderboard_windows = leaderboard_windows
+        self._today = today
+        self._lock = threading.Lock()
+        self._pending = threading.Condition(self._lock)
+        self._buffer = []
+        self._flush_lock = threading.Lock()
+        self._closed = False
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='analytics-sqlite-writer', daemon=True)
+        self._thread.start()
+
+    def apply(self, kind, event):
+        if kind not in ANALYTICS_INSERTS:
+            raise ValueError(f'Unknown analytics event kind: {kind}')
+        with self._lock:
+            self._buffer.append((kind, event))
+            if len(self._buffer) >= self.batch_size:
+                self._pending.notify()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                self._pending.wait_for(
+                    lambda: self._closed or len(self._buffer) >= self.batch_size,
+                    timeout=self.flush_interval,
+                )
+                closed = self._closed
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Analytics writer failed')
+            if closed:
+                return
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                events, self._buffer = self._buffer, []
+            if not events:
+                return
+            params = {kind: [] for kind in ANALYTICS_INSERTS if kind != 'view'}
+            visits = Counter()
+            link_clicks = Counter()
+            leaderboard_counts = Counter()  # (metric, day, card_id) -> count
+            for kind, event in events:
+                fields = tuple(_to_text(event.get(field)) for field in ANALYTICS_INSERTS[kind][1])
+                if not all(isinstance(value, _SQL_TYPES) for value in fields):
+                    # Binding it would fail on every attempt and take the batch with it
+                    logger.error('Dropping an analytics %s event that cannot be stored: %r', kind, event)
+                    continue
+                if kind == 'view':
+                    visits[fields] += 1
+                    continue
+                params[kind].append(fields)
+                leaderboard_counts[EVENT_METRICS[kind], event_date(kind, event), event['card_id']] += 1
+                if kind == 'link_click':
+                    link_clicks[event['card_id'], click_date(event), event['link_type'], event['link_url']] += 1
+            try:
+                with self.database.transaction() as connection:
+                    # First, so a backfill does not count this batch as well
+                    as_of = self._advance_leaderboards(connection)
+                    added = {kind: len(rows) for kind, rows in params.items()}  # New rows per kind
+                    if visits:
+                        seen = {tuple(row) for row in connection.execute(VISITORS_SEEN, (json.dumps(list(visits)),))}
+                        new_visitors = visits.keys() - seen
+                        added['view'] = len(new_visitors)
+                        for card_id, visit_date, _ in new_visitors:
+                            leaderboard_counts['unique_visitors', visit_date, card_id] += 1
+                        connection.executemany(
+                            ANALYTICS_INSERTS['view'][0], [fields + (count,) for fields, count in visits.items()]
+                        )
+                    for kind, rows in params.items():
+                        if rows:
+                            connection.executemany(ANALYTICS_INSERTS[kind][0], rows)
+                    connection.executemany(
+                        ROW_COUNT_ADD, [(count, ANALYTICS_TABLES[kind]) for kind, count in added.items() if count],
+                    )
+                    if link_clicks:
+                        connection.executemany(
+                            LINK_CLICK_COUNTS_UPSERT, [key + (clicks,) for key, clicks in link_clicks.items()]
+                        )
+                    self._count_in_leaderboards(connection, as_of, leaderboard_counts)
+            except sqlite3.OperationalError:
+                # The database was locked, busy or out of space: try again later
+                with self._lock:
+                    self._buffer[:0] = events
+                raise
+            except Exception:
+                logger.error('Dropping %d analytics events that could not be written', len(events))
+                raise
+
+    def _advance_leaderboards(self, connection):
+        """Move the leaderboards on to today, if another process has not
+        already; returns the day they end on. Runs in a write transaction."""
+        today = self._today()
+        row = connection.execute('SELECT as_of FROM analytics_leaderboard_state').fetchone()
+        previous = row[0] if row else None
+        if previous is not None and today <= previous:
+            return previous
+        windows = sorted(set(self.leaderboard_windows.values()))
+        oldest = window_start(today, windows[-1])
+
+        if previous is None:
+            connection.execute('DELETE FROM analytics_daily_totals')
+            for statement in DAILY_TOTALS_BACKFILL:
+                connection.execute(statement, (oldest,))
+        if previous is None or oldest > previous:
+            # Nothing counted so far is still in a window
+            connection.execute('DELETE FROM analytics_leaderboards')
+            for days in windows:
+                for metric in LEADERBOARD_METRICS:
+                    connection.execute(LEADERBOARD_REBUILD, (days, metric, window_start(today, days), today))
+        else:
+            day = previous
+            while day < today:
+                day = shift_day(day, 1)
+                for days in windows:
+                    for metric in LEADERBOARD_METRICS:
+                        connection.execute(LEADERBOARD_ENTER, {'metric': metric, 'days': days, 'day': day})
+                        connection.execute(
+                            LEADERBOARD_LEAVE, {'metric': metric, 'days': days, 'day': shift_day(day, -days)},
+                        )
+            for days in windows:
+                for metric in LEADERBOARD_METRICS:
+                    connection.execute(LEADERBOARD_PRUNE, (metric, days))
+
+        for metric in LEADERBOARD_METRICS:
+            connection.execute('DELETE FROM analytics_daily_totals WHERE metric = ? AND day < ?', (metric, oldest))
+        connection.execute(
+            'INSERT INTO analytics_leaderboard_state (id, as_of) VALUES (1, ?) '
+            'ON CONFLICT (id) DO UPDATE SET as_of = excluded.as_of',
+            (today,),
+        )
+        return today
+
+    def _count_in_leaderboards(self, connection, as_of, counts):
+        starts = {days: window_start(as_of, days) for days in set(self.leaderboard_windows.values())}
+        oldest = min(starts.values())
+        daily = []
+        windowed = []
+        for (metric, day, card_id), count in counts.items():
+            # Days before the longest window are not counted; days after
+            # as_of count towards a window once they are reached
+            if day < oldest:
+                continue
+            daily.append((metric, day, card_id, count))
+            if day <= as_of:
+                windowed += [(metric, days, card_id, count) for days, start in starts.items() if day >= start]
+        connection.executemany(DAILY_TOTALS_UPSERT, daily)
+        connection.executemany(LEADERBOARD_UPSERT, windowed)
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._pending.notify()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+    # Queries
+
+    def _query(self, sql, params=()):
+        self.flush()
+        return self.database.connection().execute(sql, params).fetchall()
+
+    def daily_unique_visitors(self, card_id, date_from=None, date_to=None):
+        rows = self._query(
+            'SELECT visit_date, COUNT(*) FROM analytics_visitors '
+            'WHERE card_id = ? AND visit_date >= ? AND visit_date <= ? '
+            'GROUP BY visit_date ORDER BY visit_date',
+            (card_id, date_from or _FIRST_DATE, date_to or _LAST_DATE),
+        )
+        return [{'date': visit_date, 'unique_visitors': count} for visit_date, count in rows]
+
+    def unique_visitors_by_period(self, card_id, interval, date_from=None, date_to=None):
+        rows = self._query(
+            ANALYTICS_PERIOD_QUERIES[interval],
+            (card_id, date_from or _FIRST_DATE, date_to or _LAST_DATE),
+        )
+        return [{'date': period, 'unique_visitors': count} for period, count in rows]
+
+    def view_count(self):
+        return self._query('SELECT COALESCE(SUM(count), 0) FROM analytics_visitors')[0][0]
+
+    def row_counts(self):
+        """Rows per event kind; views are stored one row per visitor per card
+        per day. Read from the counts the writer keeps, without flushing, so
+        events still in the buffer are not included."""
+        connection = self.database.connection()
+        return {
+            kind: connection.execute(ROW_COUNT_GET, (table,)).fetchone()[0]
+            for kind, table in ANALYTICS_TABLES.items()
+        }
+
+    def link_click_summary(self, card_id, date_from=None, date_to=None, top=None):
+        params = (card_id, date_from or _FIRST_DATE, date_to or _LAST_DATE)
+        daily = self._query(
+            'SELECT click_date, SUM(clicks) FROM analytics_link_click_counts '
+            'WHERE card_id = ? AND click_date >= ? AND click_date <= ? '
+            'GROUP BY click_date ORDER BY click_date',
+            params,
+        )
+        links = self._query(
+            'SELECT link_type, link_url, SUM(clicks) FROM analytics_link_click_counts '
+            'WHERE card_id = ? AND click_date >= ? AND click_date <= ? '
+            'GROUP BY link_type, link_url',
+            params,
+        )
+        return summarize_link_clicks(
+            Counter({(link_type, link_url): clicks for link_type, link_url, clicks in links}),
+            [tuple(row) for row in daily],
+            top,
+        )
+
+    def dashboard_summary(self, card_ids, date_from=None, date_to=None):
+        """Headline numbers per card; see ``AnalyticsStore.dashboard_summary``."""
+        summary = {
+            card_id: {'unique_visitors': 0, 'messages': 0, 'appointments': 0, 'link_clicks_by_type': {}}
+            for card_id in card_ids
+        }
+        cards = json.dumps(list(summary))
+        days = (date_from or _FIRST_DATE, date_to or _LAST_DATE)
+        times = _time_bounds(date_from, date_to)
+        for field, bounds in (('unique_visitors', days), ('messages', times), ('appointments', times)):
+            for card_id, count in self._query(DASHBOARD_QUERIES[field], (cards,) + bounds):
+                summary[card_id][field] = count
+        for card_id, link_type, clicks in self._query(DASHBOARD_QUERIES['link_clicks_by_type'], (cards,) + days):
+            summary[card_id]['link_clicks_by_type'][link_type] = clicks
+        return summary
+
+    def top_cards(self, metric, window, limit):
+        """The cards with the highest ``metric`` over a rolling window; see
+        ``AnalyticsStore.top_cards``. Read from the rank index, so the cost
+        depends on ``limit``, not on the number of cards."""
+        self.flush()
+        row = self.database.connection().execute('SELECT as_of FROM analytics_leaderboard_state').fetchone()
+        if row is not None and row[0] >= self._today():
+            as_of = row[0]
+        else:
+            with self.database.transaction() as connection:
+                as_of = self._advance_leaderboards(connection)
+        days = self.leaderboard_windows[window]
+        rows = self._query(LEADERBOARD_TOP, (metric, days, limit))
+        return window_start(as_of, days), as_of, [tuple(row) for row in rows]
+
+    def feed(self, kind, card_id, limit, before=None):
+        """A page of a card's ``kind`` events; see ``AnalyticsStore.feed``."""
+        time_field = EVENT_TIME_FIELDS[kind]
+        # A negative LIMIT is no limit
+        rows = self._query(
+            ANALYTICS_FEED_QUERIES[kind], (card_id, before or _MAX_ROW_ID, -1 if limit is None else limit + 1),
+        )
+        page = []
+        for row in rows[:limit]:
+            event = dict(row)
+            del event['id']
+            event[time_field] = _to_datetime(event[time_field])
+            page.append(event)
+        return page, (rows[limit - 1]['id'] if limit is not None and len(rows) > limit else None)
+
+    def export_events(self, kind, card_id, date_from=None, date_to=None, batch_size=1000):
+        """A card's ``kind`` events in a date range, oldest first; see
+        ``AnalyticsStore.export_events``. Rows are read ``batch_size`` at a
+        time, each batch starting after the last id of the previous one."""
+        time_field = EVENT_TIME_FIELDS[kind]
+        times = _time_bounds(date_from, date_to)
+        after = 0
+        while True:
+            rows = self._query(ANALYTICS_EXPORT_QUERIES[kind], (card_id,) + times + (after, batch_size))
+            for row in rows:
+                event = dict(row)
+                del event['id']
+                event[time_field] = _to_datetime(event[time_field])
+                yield event
+            if len(rows) < batch_size:
+                return
+            after = rows[-1]['id']
@@ -0,0 +1,361 @@
+import threading
+from contextlib import contextmanager
+
+
+class SlugConflictError(Exception):
+    pass
+
+
+class DuplicateUserError(Exception):
+    def __init__(self, field, value):
+        super().__init__(f'{field} already exists: {value}')
+        self.field = field
+        self.value = value
+
+
+def rename_conflicts(renames, holder_of):
+    """Ids of the cards in a batch of slug renames that cannot be applied.
+
+    ``renames`` maps card ids, in batch order, to ``(old_slug, new_slug)``
+    for the cards whose slug changes; ``holder_of(slug)`` returns the id of
+    the card that holds a slug now, or None. A new slug is available if no
+    card holds it, or if its holder is in the batch and gives it up, so
+    cards can trade slugs; when several cards in the batch claim the same
+    slug, the first one gets it. A card whose rename fails keeps its slug,
+    which can make others fail in turn, so this runs until nothing changes.
+    """
+    conflicts = set()
+    while True:
+        claimed = set()
+        failed = set()
+        for card_id, (_, new_slug) in renames.items():
+            if card_id in conflicts:
+                continue
+            holder = holder_of(new_slug)
+            if new_slug in claimed or (holder is not None and (holder not in renames or holder in conflicts)):
+                failed.add(card_id)
+            else:
+                claimed.add(new_slug)
+        if not failed:
+            return conflicts
+        conflicts |= failed
+
+
+class StripedLocks:
+    """A fixed pool of locks; a key is guarded by the lock its hash maps to.
+
+    Operations touching several keys take all of their stripes at once, in
+    index order, so two operations can never wait on each other in a cycle.
+    """
+
+    def __init__(self, stripes=64):
+        self._locks = [threading.Lock() for _ in range(stripes)]
+
+    @contextmanager
+    def hold(self, *keys):
+        indexes = sorted({hash(key) % len(self._locks) for key in keys})
+        for index in indexes:
+            self._locks[index].acquire()
+        try:
+            yield
+        finally:
+            for index in reversed(indexes):
+                self._locks[index].release()
+
+
+class IdAllocator:
+    def __init__(self, start=1):
+        self._next_id = start
+        self._lock = threading.Lock()
+
+    def allocate(self):
+        with self._lock:
+            allocated = self._next_id
+            self._next_id += 1
+            return allocated
+
+
+class CardStore:
+    """In-memory card repository indexed by id, slug and owner.
+
+    Every lookup the API does (by id, by slug, by user) is a dict hit, and the
+    indexes are kept consistent on create, update (including slug renames)
+    and delete.
+
+    Safe to share between threads: writers take the lock stripes of the
+    card id, the slug(s) and the owner they touch, so writes to unrelated
+    cards proceed in parallel, and ids come from an atomic allocator. Cards
+    are replaced rather than mutated on update, so lock-free readers always
+    see a complete card.
+    """
+
+    def __init__(self, stripes=64):
+        self._cards = {}        # card_id -> card dict
+        self._by_slug = {}      # card_slug -> card_id
+        self._by_user = {}      # user_id -> {card_id: None}, insertion ordered
+        self._ids = IdAllocator()
+        self._locks = StripedLocks(stripes)
+
+    def __len__(self):
+        return len(self._cards)
+
+    def __iter__(self):
+        return iter(list(self._cards.copy().values()))
+
+    def get(self, card_id):
+        return self._cards.get(card_id)
+
+    def get_by_slug(self, card_slug):
+        card_id = self._by_slug.get(card_slug)
+        if card_id is None:
+            return None
+        return self._cards.get(card_id)
+
+    def slug_exists(self, card_slug):
+        return card_slug in self._by_slug
+
+    def get_many(self, card_ids):
+        """``{card_id: card}`` for those of ``card_ids`` that exist."""
+        cards = ((card_id, self._cards.get(card_id)) for card_id in card_ids)
+        return {card_id: card for card_id, card in cards if card is not None}
+
+    def list_for_user(self, user_id):
+        with self._locks.hold(('user', user_id)):
+            card_ids = list(self._by_user.get(user_id, ()))
+        cards = (self._cards.get(card_id) for card_id in card_ids)
+        return [card for card in cards if card is not None]
+
+    def add(self, user_id, fields):
+        card_slug = fields['card_slug']
+        with self._locks.hold(('slug', card_slug), ('user', user_id)):
+            if card_slug in self._by_slug:
+                raise SlugConflictError(card_slug)
+
+            card = {'id': self._ids.allocate(), 'user_id': user_id}
+            card.update(fields)
+            self._cards[card['id']] = card
+            self._by_user.setdefault(user_id, {})[card['id']] = None
+            self._by_slug[card_slug] = card['id']
+        return card
+
+    def update(self, card_id, changes):
+        while True:
+            card = self._cards.get(card_id)
+            if card is None:
+                return None
+            old_slug = card['card_slug']
+            new_slug = changes.get('card_slug', old_slug)
+            with self._locks.hold(('card', card_id), ('slug', old_slug), ('slug', new_slug)):
+                card = self._cards.get(card_id)
+                if card is None:
+                    return None
+                if card['card_slug'] != old_slug:
+                    continue  # Renamed by another thread meanwhile; retry with its slug
+                if new_slug != old_slug and new_slug in self._by_slug:
+                    raise SlugConflictError(new_slug)
+
+                updated = dict(card)
+                updated.update(changes)
+                self._cards[card_id] = updated
+                if new_slug != old_slug:
+                    self._by_slug[new_slug] = card_id
+                    del self._by_slug[old_slug]
+                return updated
+
+    def bulk_add(self, user_id, cards, atomic=False):
+        """Add many cards for one owner in one pass.
+
+        ``cards`` is a list of field dicts as for ``add``. Each slug is
+        checked against the existing cards and the cards before it in the
+        batch. Returns ``(added, conflicts)``: ``(index, card)`` pairs for
+        the cards added and the indexes of those whose slug is taken. With
+        ``atomic``, a single conflict means no card is added.
+        """
+        keys = [('slug', fields['card_slug']) for fields in cards]
+        with self._locks.hold(('user', user_id), *keys):
+            seen = set()
+            conflicts = []
+            for index, fields in enumerate(cards):
+                card_slug = fields['card_slug']
+                if card_slug in self._by_slug or card_slug in seen:
+                    conflicts.append(index)
+                seen.add(card_slug)
+            if atomic and conflicts:
+                return [], conflicts
+
+            added = []
+            skipped = set(conflicts)
+            owned = self._by_user.setdefault(user_id, {})
+            for index, fields in enumerate(cards):
+                if index in skipped:
+                    continue
+                card = {'id': self._ids.allocate(), 'user_id': user_id}
+                card.update(fields)
+                self._cards[card['id']] = card
+                owned[card['id']] = None
+                self._by_slug[card['card_slug']] = card['id']
+                added.append((index, card))
+            if not owned:
+                del self._by_user[user_id]
+        return added, conflicts
+
+    def bulk_update(self, updates, atomic=False):
+        """Apply ``changes`` to many cards in one pass.
+
+        ``updates`` is a list of ``(card_id, changes)`` pairs, one per card.
+        Slug renames are checked together (see ``rename_conflicts``), so
+        cards in the batch may trade slugs. Returns ``(updated, conflicts,
+        missing)``: ``(index, card)`` pairs for the cards updated, and the
+        indexes of those whose new slug is taken and of those that no longer
+        exist. With ``atomic``, any conflict or missing card means no card
+        is updated.
+        """
+        while True:
+            current = [self._cards.get(card_id) for card_id, _ in updates]
+            keys = [('card', card_id) for card_id, _ in updates]
+            for card, (_, changes) in zip(current, updates):
+                if card is not None:
+                    keys.append(('slug', card['card_slug']))
+                if 'card_slug' in changes:
+                    keys.append(('slug', changes['card_slug']))
+            with self._locks.hold(*keys):
+                if any(card is not None and self._cards.get(card['id']) is not card for card in current):
+                    continue  # Changed by another thread meanwhile; retry with its slugs
+
+                missing = [index for index, card in enumerate(current) if card is None]
+                renames = {}
+                for card, (card_id, changes) in zip(current, updates):
+                    if card is not None and changes.get('card_slug', card['card_slug']) != card['card_slug']:
+                        renames[card_id] = (card['card_slug'], changes['card_slug'])
+                failed = rename_conflicts(renames, self._by_slug.get)
+                conflicts = [index for index, (card_id, _) in enumerate(updates) if card_id in failed]
+                if atomic and (conflicts or missing):
+                    return [], conflicts, missing
+
+                updated = []
+                for index, (card, (card_id, changes)) in enumerate(zip(current, updates)):
+                    if card is None or card_id in failed:
+                        continue
+                    replacement = dict(card)
+                    replacement.update(changes)
+                    self._cards[card_id] = replacement
+                    updated.append((index, replacement))
+                # Release every given-up slug before claiming, so trades work
+                applied = [card_id for card_id in renames if card_id not in failed]
+                for card_id in applied:
+                    del self._by_slug[renames[card_id][0]]
+                for card_id in applied:
+                    self._by_slug[renames[card_id][1]] = card_id
+                return updated, conflicts, missing
+
+    def delete(self, card_id):
+        while True:
+            card = self._cards.get(card_id)
+            if card is None:
+                return None
+            with self._locks.hold(('card', card_id), ('slug', card['card_slug']), ('user', card['user_id'])):
+                if self._cards.get(card_id) is not card:
+                    continue  # Updated or deleted by another thread meanwhile
+                del self._cards[card_id]
+                del self._by_slug[card['card_slug']]
+                owned = self._by_user.get(card['user_id'])
+                if owned is not None:
+                    owned.pop(card_id, None)
+                    if not owned:
+                        del self._by_user[card['user_id']]
+                return card
+
+
+class UserStore:
+    """In-memory user repository with unique indexes on email and username.
+
+    With ``case_insensitive`` set, emails and usernames are compared after
+    ``str.casefold()`` so ``Alice@Example.com`` and ``alice@example.com`` are
+    the same account. The stored values keep the casing they were given.
+
+    Safe to share between threads: registering takes the lock stripes of
+    the email and username being claimed, and ids come from an atomic
+    allocator.
+    """
+
+    def __init__(self, case_insensitive=False, stripes=64):
+        self.case_insensitive = case_insensitive
+        self._users = {}        # user_id -> user dict
+        self._by_email = {}     # normalized email -> user_id
+        self._by_username = {}  # normalized username -> user_id
+        self._ids = IdAllocator()
+        self._locks = StripedLocks(stripes)
+
+    def __len__(self):
+        return len(self._users)
+
+    def _key(self, value):
+        return value.casefold() if self.case_insensitive else value
+
+    def get(self, user_id):
+        return self._users.get(user_id)
+
+    def get_by_email(self, email):
+        user_id = self._by_email.get(self._key(email))
+        return self._users.get(user_id) if user_id is not None else None
+
+    def get_by_username(self, username):
+        user_id = self._by_username.get(self._key(username))
+        return self._users.get(user_id) if user_id is not None else None
+
+    def email_exists(self, email):
+        return self._key(email) in self._by_email
+
+    def username_exists(self, username):
+        return self._key(username) in self._by_username
+
+    def add(self, username, email, password_hash, created_at):
+        email_key = self._key(email)
+        username_key = self._key(username)
+        with self._locks.hold(('email', email_key), ('username', username_key)):
+            if email_key in self._by_email:
+                raise DuplicateUserError('email', email)
+            if username_key in self._by_username:
+                raise DuplicateUserError('username', username)
+
+            user = {
+                'id': self._ids.allocate(),
+                'username': username,
+                'email': email,
+                'password_hash': password_hash,
+                'created_at': created_at,
+            }
+            self._users[user['id']] = user
+            self._by_email[email_key] = user['id']
+            self._by_username[username_key] = user['id']
+        return user
+
+    def update_password_hash(self, user_id, password_hash):
+        # Replaced rather than mutated, like cards, so readers see either hash
+        user = self._users.get(user_id)
+        if user is None:
+            return None
+        updated = dict(user, password_hash=password_hash)
+        self._users[user_id] = updated
+        return updated
+
+    def bulk_import(self, records, created_at):
+        """Add many users in one pass.
+
+        ``records`` is an iterable of dicts with ``username``, ``email`` and
+        ``password_hash``. Each record is checked against the existing users
+        and the records imported before it, so duplicates are found with one
+        hash probe per field. Returns ``(imported, duplicates)`` where
+        ``duplicates`` is a list of ``(index, field, value)`` tuples.
+        """
+        imported = []
+        duplicates = []
+        for index, record in enumerate(records):
+            try:
+                user = self.add(record['username'], record['email'],
+                                record['password_hash'], created_at)
+            except DuplicateUserError as exc:
+                duplicates.append((index, exc.field, exc.value))
+                continue
+            imported.append(user)
+        return imported, duplicates
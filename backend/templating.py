@@ -0,0 +1,158 @@
+import hashlib
+import html
+import re
+import threading
+from collections import OrderedDict
+
+PLACEHOLDER_RE = re.compile(r'{{([^{}]+)}}')
+# A placeholder whose literal prefix ends inside href="..." or src="..."
+URL_ATTRIBUTE_RE = re.compile(r'''\b(?:href|src)\s*=\s*["'][^"']*$''', re.IGNORECASE)
+SAFE_URL_RE = re.compile(r'^(?:https?:|mailto:|tel:|/|#|\?|[^:/?#]*(?:[/?#]|$))', re.IGNORECASE)
+
+
+class CompiledTemplate:
+    """A template's ``structure_definition`` split into literal text and fields.
+
+    ``segments`` alternates literal strings and ``(field, is_url)`` pairs, so
+    rendering is a single join with no regex work per render.
+    """
+
+    __slots__ = ('source', 'segments')
+
+    def __init__(self, source, segments):
+        self.source = source
+        self.segments = segments
+
+    def render(self, values):
+        parts = []
+        for segment in self.segments:
+            if isinstance(segment, str):
+                parts.append(segment)
+                continue
+            field, is_url = segment
+            value = values.get(field, '')
+            if is_url and not SAFE_URL_RE.match(value):
+                value = ''  # e.g. javascript: URLs
+            parts.append(html.escape(value, quote=True))
+        return ''.join(parts)
+
+
+def compile_template(source):
+    segments = []
+    position = 0
+    for match in PLACEHOLDER_RE.finditer(source):
+        literal = source[position:match.start()]
+        if literal:
+            segments.append(literal)
+        is_url = bool(URL_ATTRIBUTE_RE.search(source, 0, match.start()))
+        segments.append((match.group(1).strip(), is_url))
+        position = match.end()
+    if position < len(source):
+        segments.append(source[position:])
+    return CompiledTemplate(source, segments)
+
+
+def card_template_values(card):
+    """Placeholder values for a card, matching the frontend's renderTemplate.
+
+    Scalar card fields fill ``{{field}}``; each ``social_media_links`` entry
+    fills ``{{<network>_url}}``. Missing or empty values render as ''.
+    """
+    values = {}
+    for key, value in card.items():
+        if isinstance(value, (dict, list)):
+            continue
+        if value is True:
+            value = 'true'
+        values[key] = str(value) if value else ''
+    links = card.get('social_media_links')
+    if isinstance(links, dict):
+        for network, url in links.items():
+            values[f'{network}_url'] = str(url) if url else ''
+    return values
+
+
+class TemplateCompiler:
+    """Compiles each template once and recompiles it if its source changes."""
+
+    def __init__(self):
+        self._compiled = {}  # template_id -> CompiledTemplate
+        self._lock = threading.Lock()
+
+    def get(self, template):
+        source = template['structure_definition']
+        compiled = self._compiled.get(template['id'])
+        if compiled is None or compiled.source != source:
+            compiled = compile_template(source)
+            with self._lock:
+                self._compiled[template['id']] = compiled
+        return compiled
+
+
+class RenderedCard:
+    __slots__ = ('body', 'etag', 'compiled', 'updated_at')
+
+    def __init__(self, body, etag, compiled, updated_at):
+        self.body = body
+        self.etag = etag
+        self.compiled = compiled
+        self.updated_at = updated_at
+
+
+class RenderedCardCache:
+    """Bounded LRU cache of rendered public card pages, keyed by card id.
+
+    Entries are dropped explicitly when a card is updated or deleted, and
+    are ignored when the card's template has been recompiled (or the card's
+    ``updated_at`` has moved) since they were rendered.
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_render(self, card, compiled):
+        card_id = card['id']
+        with self._lock:
+            entry = self._entries.get(card_id)
+            if entry is not None and entry.compiled is compiled and entry.updated_at == card.get('updated_at'):
+                self._entries.move_to_end(card_id)
+                return entry
+
+        body = render_card_page(card, compiled).encode('utf-8')
+        entry = RenderedCard(body, hashlib.sha256(body).hexdigest()[:32], compiled, card.get('updated_at'))
+        with self._lock:
+            self._entries[card_id] = entry
+            self._entries.move_to_end(card_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, card_id):
+        with self._lock:
+            self._entries.pop(card_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def render_card_page(card, compiled):
+    title = html.escape(str(card.get('full_name') or 'Business card'))
+    return (
+        '<!DOCTYPE html>\n'
+        '<html lang="en">\n'
+        '<head>\n'
+        '<meta charset="utf-8">\n'
+        '<meta name="viewport" content="width=device-width, initial-scale=1">\n'
+        f'<title>{title}</title>\n'
+        '</head>\n'
+        '<body>\n'
+        f'{compiled.render(card_template_values(card))}\n'
+        '</body>\n'
+        '</html>\n'
+    )
@@ -0,0 +1,47 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class VerifiedTokenCache:
+    """Bounded LRU cache of JWTs whose signature has already been verified.
+
+    Maps the exact token string to its decoded claims, so a token presented
+    again skips parsing and HMAC verification. Entries are only served while
+    the token's ``exp`` claim is in the future; expired entries are dropped
+    on access. ``max_entries=0`` disables caching.
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # token -> claims
+        self._lock = threading.Lock()
+
+    def get(self, token, now=None):
+        if not self.max_entries:
+            return None
+        with self._lock:
+            claims = self._entries.get(token)
+            if claims is None:
+                return None
+            if claims.get('exp', 0) <= (now if now is not None else time.time()):
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return claims
+
+    def put(self, token, claims):
+        if not self.max_entries or 'exp' not in claims:
+            return  # Never cache tokens that do not expire
+        with self._lock:
+            self._entries[token] = claims
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
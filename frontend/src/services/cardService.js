@@ -65,6 +65,21 @@ const getLinkClickAnalytics = (cardId) => {
   });
 };
 
+// Headline numbers for all of the user's cards (or cardIds) in one request.
+// options: { cardIds, from, to } with dates as YYYY-MM-DD
+const getDashboardSummary = ({ cardIds, from, to } = {}) => {
+  const token = authService.getCurrentUserToken();
+  if (!token) return Promise.reject(new Error('No authentication token found.'));
+  const params = {};
+  if (cardIds && cardIds.length) params.card_ids = cardIds.join(',');
+  if (from) params.from = from;
+  if (to) params.to = to;
+  return axios.get(`${API_URL}/analytics/summary`, {
+    headers: { Authorization: `Bearer ${token}` },
+    params,
+  });
+};
+
 // Commenting out the old generic getCardAnalytics placeholder
 // const getCardAnalytics = (cardId, analyticType) => {
 //   const token = authService.getCurrentUserToken();
@@ -123,6 +138,7 @@ const cardService = {
   getMessageAnalytics,
   getAppointmentAnalytics,
   getLinkClickAnalytics,
+  getDashboardSummary,
   updateCard,
   deleteCard,
 };